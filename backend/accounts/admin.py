@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import User
-from .audit import AuditLog, LockedStatus
+from .audit import AuditLog, LockedStatus, AuditChainCheckpoint
 
 
 @admin.register(User)
@@ -36,7 +36,7 @@ class AuditLogAdmin(admin.ModelAdmin):
     list_display = ('id', 'action', 'content_type', 'object_label', 'user', 'timestamp')
     list_filter = ('action', 'content_type', 'timestamp', 'user')
     search_fields = ('object_label', 'reason', 'user__email')
-    readonly_fields = ('id', 'timestamp', 'user', 'action', 'content_type', 'object_id', 'object_label', 'field_changed', 'old_value', 'new_value', 'reason', 'ip_address')
+    readonly_fields = ('id', 'timestamp', 'user', 'action', 'content_type', 'object_id', 'object_label', 'field_changed', 'old_value', 'new_value', 'reason', 'ip_address', 'chain_key', 'prev_hash', 'row_hash')
     ordering = ('-timestamp',)
     
     def has_add_permission(self, request):
@@ -49,6 +49,19 @@ class AuditLogAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(AuditChainCheckpoint)
+class AuditChainCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('chain_key', 'last_id', 'rows_verified', 'verified_at')
+    search_fields = ('chain_key',)
+    readonly_fields = ('chain_key', 'last_id', 'last_hash', 'rows_verified', 'verified_at', 'signature')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(LockedStatus)
 class LockedStatusAdmin(admin.ModelAdmin):
     list_display = ('content_type', 'object_id', 'locked_status', 'locked_by', 'locked_at')
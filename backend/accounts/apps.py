@@ -8,4 +8,5 @@ class AccountsConfig(AppConfig):
     def ready(self):
         # Cette ligne permet d'importer le fichier signals.py 
         # dès que l'application 'accounts' est prête.
-        import accounts.signals
\ No newline at end of file
+        import accounts.signals
+        import accounts.lock_registry  # invalidation du registre des verrous
\ No newline at end of file
@@ -6,13 +6,18 @@ Trace toutes les modifications avec:
 - Horodatage exact
 - Avant/Après (versioning)
 - Raison de la modification (si fournie)
+- Empreinte chaînée (SHA-256) rendant toute altération détectable
 """
 
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.conf import settings
 import json
 
+from .audit_chain import (
+    GENESIS_HASH, HASHED_FIELDS, chain_key_for, compute_row_hash, lock_chain,
+)
+
 
 class AuditLog(models.Model):
     """
@@ -85,9 +90,10 @@ class AuditLog(models.Model):
         verbose_name="Raison"
     )
     
-    # Horodatage (immutable)
+    # Horodatage (immutable) — fixé avant l'insertion car couvert par l'empreinte
     timestamp = models.DateTimeField(
-        auto_now_add=True,  # Défini une seule fois
+        default=timezone.now,
+        editable=False,
         db_index=True,
         verbose_name="Date/Heure"
     )
@@ -98,6 +104,27 @@ class AuditLog(models.Model):
         verbose_name="Adresse IP"
     )
     
+    # Chaînage (preuve de non-altération, voir audit_chain)
+    chain_key = models.CharField(
+        max_length=120,
+        editable=False,
+        default='',
+        verbose_name="Chaîne",
+        help_text="Mois et type de contenu: '2026-02:report'"
+    )
+    prev_hash = models.CharField(
+        max_length=64,
+        editable=False,
+        default='',
+        verbose_name="Empreinte précédente"
+    )
+    row_hash = models.CharField(
+        max_length=64,
+        editable=False,
+        default='',
+        verbose_name="Empreinte"
+    )
+    
     class Meta:
         verbose_name = "Journal d'audit"
         verbose_name_plural = "Journaux d'audit"
@@ -106,11 +133,37 @@ class AuditLog(models.Model):
             models.Index(fields=['content_type', 'object_id']),
             models.Index(fields=['user', 'timestamp']),
             models.Index(fields=['action', 'timestamp']),
+            models.Index(fields=['chain_key', 'id']),
         ]
     
     def __str__(self):
         return f"{self.action} - {self.object_label} par {self.user.email} ({self.timestamp})"
     
+    def save(self, *args, **kwargs):
+        """Calculer l'empreinte chaînée à l'insertion"""
+        if not self._state.adding or self.row_hash:
+            return super().save(*args, **kwargs)
+        
+        if self.timestamp is None:
+            self.timestamp = timezone.now()
+        self.chain_key = chain_key_for(self.content_type, self.timestamp)
+        
+        with transaction.atomic():
+            # Verrou limité à la chaîne: le dernier maillon lu reste le dernier
+            lock_chain(self.chain_key)
+            self.prev_hash = (
+                AuditLog.objects.filter(chain_key=self.chain_key)
+                .order_by('-id')
+                .values_list('row_hash', flat=True)
+                .first()
+            ) or GENESIS_HASH
+            self.row_hash = compute_row_hash(self.prev_hash, self.hash_values())
+            return super().save(*args, **kwargs)
+    
+    def hash_values(self):
+        """Champs couverts par l'empreinte, tels que relus depuis la base"""
+        return {name: getattr(self, name) for name in HASHED_FIELDS}
+    
     @classmethod
     def log_action(cls, user, action, content_type, object_id, object_label, 
                    field_changed=None, old_value=None, new_value=None, reason=None, ip_address=None):
@@ -143,6 +196,35 @@ class AuditLog(models.Model):
             reason=reason,
             ip_address=ip_address
         )
+    
+    @classmethod
+    def log_bulk(cls, entries):
+        """
+        Enregistrer plusieurs entrées (instances non sauvegardées) en une
+        insertion groupée, chaînées dans l'ordre de la liste.
+        
+        Pour les écritures en masse (bulk_create) qui ne déclenchent pas
+        les signaux d'audit.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            last_hashes = {}
+            for entry in entries:
+                if entry.timestamp is None:
+                    entry.timestamp = now
+                entry.chain_key = chain_key_for(entry.content_type, entry.timestamp)
+                if entry.chain_key not in last_hashes:
+                    lock_chain(entry.chain_key)
+                    last_hashes[entry.chain_key] = (
+                        cls.objects.filter(chain_key=entry.chain_key)
+                        .order_by('-id')
+                        .values_list('row_hash', flat=True)
+                        .first()
+                    ) or GENESIS_HASH
+                entry.prev_hash = last_hashes[entry.chain_key]
+                entry.row_hash = compute_row_hash(entry.prev_hash, entry.hash_values())
+                last_hashes[entry.chain_key] = entry.row_hash
+            return cls.objects.bulk_create(entries, batch_size=1000)
 
 
 class LockedStatus(models.Model):
@@ -194,11 +276,9 @@ class LockedStatus(models.Model):
     
     @classmethod
     def is_locked(cls, content_type, object_id):
-        """Vérifier si un objet est verrouillé"""
-        return cls.objects.filter(
-            content_type=content_type,
-            object_id=object_id
-        ).exists()
+        """Vérifier si un objet est verrouillé (via le registre en cache)"""
+        from .lock_registry import is_locked
+        return is_locked(content_type, object_id)
     
     @classmethod
     def unlock(cls, content_type, object_id):
@@ -207,3 +287,30 @@ class LockedStatus(models.Model):
             content_type=content_type,
             object_id=object_id
         ).delete()
+
+
+class AuditChainCheckpoint(models.Model):
+    """
+    Point de contrôle signé (HMAC) de la vérification d'une chaîne d'audit
+
+    Permet de reprendre une vérification interrompue et de ne revérifier
+    que les lignes ajoutées depuis.
+    """
+    
+    chain_key = models.CharField(max_length=120, unique=True, verbose_name="Chaîne")
+    last_id = models.BigIntegerField(verbose_name="Dernière ligne vérifiée")
+    last_hash = models.CharField(max_length=64, verbose_name="Dernière empreinte")
+    rows_verified = models.BigIntegerField(default=0, verbose_name="Lignes vérifiées")
+    verified_at = models.DateTimeField(verbose_name="Vérifié le")
+    signature = models.CharField(max_length=64, verbose_name="Signature HMAC")
+    # Mois archivé (archive_audit_partitions): lignes retirées de la table
+    # active, couvert par la signature
+    archived = models.BooleanField(default=False, verbose_name="Archivée")
+    
+    class Meta:
+        verbose_name = "Point de contrôle d'audit"
+        verbose_name_plural = "Points de contrôle d'audit"
+        ordering = ['chain_key']
+    
+    def __str__(self):
+        return f"{self.chain_key} → #{self.last_id} ({self.verified_at})"
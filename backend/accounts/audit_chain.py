@@ -0,0 +1,238 @@
+"""
+Chaînage cryptographique du journal d'audit (preuve de non-altération)
+
+Chaque ligne d'audit porte `row_hash = SHA-256(prev_hash + contenu canonique)`.
+Les chaînes sont découpées par mois et par type de contenu (`chain_key`):
+deux écritures concurrentes sur des chaînes différentes ne s'attendent
+jamais, et une chaîne ne s'étend pas au-delà d'une partition mensuelle.
+
+La vérification parcourt la table en flux (curseur serveur sous PostgreSQL)
+et dépose des points de contrôle signés (HMAC) pour reprendre ou ne vérifier
+que les nouvelles lignes. L'archivage d'un mois marque ses points de
+contrôle (`archived`, signé): une chaîne dont les lignes ont disparu sans
+cette marque est signalée comme altérée.
+"""
+
+import hashlib
+import ipaddress
+import json
+from datetime import timezone as dt_timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+
+GENESIS_HASH = '0' * 64
+CHECKPOINT_SALT = 'accounts.audit_chain.checkpoint'
+
+# Champs couverts par l'empreinte (l'id est attribué après le calcul)
+HASHED_FIELDS = (
+    'user_id', 'action', 'content_type', 'object_id', 'object_label',
+    'field_changed', 'old_value', 'new_value', 'reason', 'timestamp', 'ip_address',
+)
+
+
+def chain_key_for(content_type, timestamp):
+    """Clé de chaîne: 'AAAA-MM:content_type' (mois local, aligné sur les partitions)"""
+    local = timezone.localtime(timestamp)
+    return f'{local.year:04d}-{local.month:02d}:{content_type}'[:120]
+
+
+def _normalize_ip(value):
+    if not value:
+        return None
+    try:
+        address = ipaddress.ip_address(value)
+    except ValueError:
+        return str(value)
+    if address.version == 6 and address.ipv4_mapped:
+        return str(address.ipv4_mapped)
+    return str(address)
+
+
+def _normalize_json(value):
+    # Aller-retour JSON: même représentation qu'à la relecture depuis la base
+    if value is None:
+        return None
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+def canonical_payload(values):
+    """Sérialisation déterministe des champs d'une ligne d'audit"""
+    timestamp = values['timestamp'].astimezone(dt_timezone.utc)
+    payload = {
+        'user_id': values['user_id'],
+        'action': values['action'],
+        'content_type': values['content_type'],
+        'object_id': values['object_id'],
+        'object_label': values['object_label'],
+        'field_changed': values['field_changed'],
+        'old_value': _normalize_json(values['old_value']),
+        'new_value': _normalize_json(values['new_value']),
+        'reason': values['reason'],
+        'timestamp': timestamp.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+        'ip_address': _normalize_ip(values['ip_address']),
+    }
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'),
+                      ensure_ascii=False, cls=DjangoJSONEncoder)
+
+
+def compute_row_hash(prev_hash, values):
+    digest = hashlib.sha256()
+    digest.update((prev_hash or GENESIS_HASH).encode('ascii'))
+    digest.update(b'\n')
+    digest.update(canonical_payload(values).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def lock_chain(chain_key):
+    """
+    Sérialiser les écritures d'une même chaîne jusqu'à la fin de la transaction.
+
+    PostgreSQL: verrou consultatif transactionnel par chaîne (pas de verrou
+    global). SQLite sérialise déjà toutes les écritures.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [chain_key])
+
+
+# ── Points de contrôle signés ──────────────────────────────────────────
+
+def sign_checkpoint(chain_key, last_id, last_hash, rows_verified, archived=False):
+    message = f'{chain_key}|{last_id}|{last_hash}|{rows_verified}'
+    if archived:
+        message += '|archived'
+    return salted_hmac(CHECKPOINT_SALT, message, algorithm='sha256').hexdigest()
+
+
+def checkpoint_is_valid(checkpoint):
+    expected = sign_checkpoint(
+        checkpoint.chain_key, checkpoint.last_id,
+        checkpoint.last_hash, checkpoint.rows_verified, checkpoint.archived,
+    )
+    return constant_time_compare(expected, checkpoint.signature)
+
+
+def _save_checkpoint(chain_key, last_id, last_hash, rows_verified):
+    from .audit import AuditChainCheckpoint
+
+    AuditChainCheckpoint.objects.update_or_create(
+        chain_key=chain_key,
+        defaults={
+            'last_id': last_id,
+            'last_hash': last_hash,
+            'rows_verified': rows_verified,
+            'verified_at': timezone.now(),
+            'signature': sign_checkpoint(chain_key, last_id, last_hash, rows_verified),
+            'archived': False,
+        },
+    )
+
+
+def mark_archived(chain_key):
+    """
+    Marquer une chaîne archivée avant le retrait de ses lignes.
+
+    Le point de contrôle doit couvrir la dernière ligne de la chaîne
+    (verify_chain juste avant); sinon ValueError.
+    """
+    from .audit import AuditChainCheckpoint, AuditLog
+
+    checkpoint = AuditChainCheckpoint.objects.filter(chain_key=chain_key).first()
+    last_id = (
+        AuditLog.objects.filter(chain_key=chain_key)
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+    if checkpoint is None or not checkpoint_is_valid(checkpoint) or checkpoint.last_id != last_id:
+        raise ValueError(f"Chaîne {chain_key}: point de contrôle absent ou en retard, archivage refusé")
+    AuditChainCheckpoint.objects.filter(pk=checkpoint.pk).update(
+        archived=True,
+        signature=sign_checkpoint(
+            chain_key, checkpoint.last_id, checkpoint.last_hash, checkpoint.rows_verified, archived=True,
+        ),
+    )
+
+
+def verify_chain(chain_key, full=False, checkpoint_every=10000, chunk_size=2000):
+    """
+    Vérifier une chaîne en flux, à partir de son dernier point de contrôle.
+
+    Retourne un dict: chain_key, rows (lignes vérifiées cette fois),
+    total (lignes couvertes par le point de contrôle), errors (liste).
+    """
+    from .audit import AuditChainCheckpoint, AuditLog
+
+    result = {'chain_key': chain_key, 'rows': 0, 'total': 0, 'errors': []}
+    rows = AuditLog.objects.filter(chain_key=chain_key)
+
+    prev_hash, last_id, total = GENESIS_HASH, None, 0
+    checkpoint = AuditChainCheckpoint.objects.filter(chain_key=chain_key).first()
+    if checkpoint is not None and not checkpoint_is_valid(checkpoint):
+        result['errors'].append('Signature du point de contrôle invalide: vérification complète')
+        checkpoint = None
+    if checkpoint is not None and not rows.exists():
+        if checkpoint.archived:
+            # Mois archivé (partition détachée): rien à revérifier
+            result['total'] = checkpoint.rows_verified
+            return result
+        result['errors'].append(
+            f'{checkpoint.rows_verified} ligne(s) vérifiée(s) disparue(s) sans archivage'
+        )
+        return result
+    if checkpoint is not None and not full:
+        anchor = rows.filter(pk=checkpoint.last_id).values_list('row_hash', flat=True).first()
+        if anchor != checkpoint.last_hash:
+            result['errors'].append(
+                f'Ligne #{checkpoint.last_id} du point de contrôle absente ou modifiée'
+            )
+        else:
+            prev_hash, last_id, total = checkpoint.last_hash, checkpoint.last_id, checkpoint.rows_verified
+            rows = rows.filter(pk__gt=last_id)
+
+    stream = rows.order_by('id').values('id', 'prev_hash', 'row_hash', *HASHED_FIELDS)
+    since_checkpoint = 0
+    for values in stream.iterator(chunk_size=chunk_size):
+        if values['prev_hash'] != prev_hash:
+            result['errors'].append(f'Ligne #{values["id"]}: rupture de chaînage (prev_hash)')
+        expected = compute_row_hash(values['prev_hash'], values)
+        if expected != values['row_hash']:
+            result['errors'].append(f'Ligne #{values["id"]}: contenu altéré (row_hash)')
+
+        prev_hash, last_id = values['row_hash'], values['id']
+        total += 1
+        result['rows'] += 1
+        since_checkpoint += 1
+        # Points de contrôle intermédiaires tant que la chaîne est saine
+        if since_checkpoint >= checkpoint_every and not result['errors']:
+            _save_checkpoint(chain_key, last_id, prev_hash, total)
+            since_checkpoint = 0
+
+    result['total'] = total
+    if last_id is not None and not result['errors']:
+        _save_checkpoint(chain_key, last_id, prev_hash, total)
+    return result
+
+
+def chain_keys(prefix=None):
+    """
+    Clés de chaîne connues: présentes dans le journal (parcours de l'index
+    chain_key, id) ou dotées d'un point de contrôle, une chaîne entièrement
+    supprimée restant ainsi vérifiée. `prefix`: 'AAAA-MM:' pour un mois.
+    """
+    from .audit import AuditChainCheckpoint, AuditLog
+
+    logged = AuditLog.objects.order_by('chain_key').values_list('chain_key', flat=True).distinct()
+    checkpointed = AuditChainCheckpoint.objects.values_list('chain_key', flat=True)
+    if prefix:
+        logged = logged.filter(chain_key__startswith=prefix)
+        checkpointed = checkpointed.filter(chain_key__startswith=prefix)
+    return sorted(set(logged) | set(checkpointed))
+
+
+def verify_all(full=False, checkpoint_every=10000, chunk_size=2000):
+    """Vérifier toutes les chaînes; générateur de résultats par chaîne"""
+    for key in chain_keys():
+        yield verify_chain(key, full=full, checkpoint_every=checkpoint_every, chunk_size=chunk_size)
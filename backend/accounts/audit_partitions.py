@@ -0,0 +1,273 @@
+"""
+Partitionnement mensuel et archivage du journal d'audit
+
+Sous PostgreSQL, la table accounts_auditlog est partitionnée par plage
+mensuelle sur `timestamp` (voir migration 0015). Chaque mois vit dans une
+partition `accounts_auditlog_pYYYY_MM`; une partition par défaut reçoit les
+lignes hors plage pour ne jamais bloquer une écriture d'audit.
+
+Sous SQLite (tests, développement), il n'y a pas de partition physique:
+les "partitions" sont les mois logiques présents dans la table et
+l'archivage supprime simplement les lignes exportées.
+"""
+
+import gzip
+import hashlib
+import json
+from datetime import date, datetime, time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .audit import AuditLog
+
+
+PARENT_TABLE = 'accounts_auditlog'
+DEFAULT_PARTITION = 'accounts_auditlog_default'
+
+
+def month_start(value):
+    """Premier jour du mois contenant `value` (date ou datetime)"""
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value.replace(day=1)
+
+
+def add_months(start, months):
+    """Décaler un premier-du-mois de `months` mois"""
+    index = start.year * 12 + (start.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(start):
+    """Bornes [début, fin[ du mois, en datetimes conscients du fuseau"""
+    start = month_start(start)
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(add_months(start, 1), time.min), tz),
+    )
+
+
+def partition_name(start):
+    """Nom de la partition physique d'un mois: accounts_auditlog_p2026_02"""
+    return f'{PARENT_TABLE}_p{start.year:04d}_{start.month:02d}'
+
+
+def is_partitioned():
+    """La table d'audit est-elle réellement partitionnée (PostgreSQL)?"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [PARENT_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def _create_partition(cursor, start):
+    """
+    Créer la partition d'un mois.
+
+    Si la partition par défaut contient déjà des lignes de ce mois, PostgreSQL
+    refuse la création: on détache la partition par défaut, on déplace les
+    lignes concernées puis on la rattache, le tout dans la même transaction.
+    """
+    qn = connection.ops.quote_name
+    name = partition_name(start)
+    lower, upper = month_bounds(start)
+
+    cursor.execute(
+        f'SELECT 1 FROM {qn(DEFAULT_PARTITION)} '
+        f'WHERE "timestamp" >= %s AND "timestamp" < %s LIMIT 1',
+        [lower, upper],
+    )
+    has_stray_rows = cursor.fetchone() is not None
+
+    if has_stray_rows:
+        cursor.execute(f'ALTER TABLE {qn(PARENT_TABLE)} DETACH PARTITION {qn(DEFAULT_PARTITION)}')
+
+    cursor.execute(
+        f'CREATE TABLE {qn(name)} PARTITION OF {qn(PARENT_TABLE)} '
+        f'FOR VALUES FROM (%s) TO (%s)',
+        [lower, upper],
+    )
+
+    if has_stray_rows:
+        cursor.execute(
+            f'INSERT INTO {qn(name)} SELECT * FROM {qn(DEFAULT_PARTITION)} '
+            f'WHERE "timestamp" >= %s AND "timestamp" < %s',
+            [lower, upper],
+        )
+        cursor.execute(
+            f'DELETE FROM {qn(DEFAULT_PARTITION)} '
+            f'WHERE "timestamp" >= %s AND "timestamp" < %s',
+            [lower, upper],
+        )
+        cursor.execute(
+            f'ALTER TABLE {qn(PARENT_TABLE)} ATTACH PARTITION {qn(DEFAULT_PARTITION)} DEFAULT'
+        )
+    return name
+
+
+def ensure_partitions(months_ahead=2, since=None):
+    """
+    Garantir l'existence des partitions du mois `since` (par défaut le mois
+    courant) jusqu'à `months_ahead` mois dans le futur.
+
+    Retourne la liste des partitions créées. Sans effet hors PostgreSQL.
+    """
+    if not is_partitioned():
+        return []
+
+    existing = {p['name'] for p in list_partitions()}
+    start = month_start(since or timezone.now())
+    end = add_months(month_start(timezone.now()), months_ahead)
+
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        current = start
+        while current <= end:
+            if partition_name(current) not in existing:
+                created.append(_create_partition(cursor, current))
+            current = add_months(current, 1)
+    return created
+
+
+def list_partitions():
+    """
+    Lister les partitions mensuelles, de la plus ancienne à la plus récente.
+
+    Chaque entrée: {'name', 'month' (date du 1er), 'rows' (estimation
+    PostgreSQL / comptage exact SQLite)}.
+    """
+    if is_partitioned():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname, c.reltuples::bigint FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = %s AND c.relname <> %s "
+                "ORDER BY c.relname",
+                [PARENT_TABLE, DEFAULT_PARTITION],
+            )
+            rows = cursor.fetchall()
+        partitions = []
+        prefix = f'{PARENT_TABLE}_p'
+        for name, estimate in rows:
+            if not name.startswith(prefix):
+                continue
+            year, month = name[len(prefix):].split('_')
+            partitions.append({
+                'name': name,
+                'month': date(int(year), int(month), 1),
+                'rows': max(estimate, 0),
+            })
+        return partitions
+
+    # Repli SQLite: partitions logiques déduites des données
+    months = (
+        AuditLog.objects.annotate(month=TruncMonth('timestamp'))
+        .values('month')
+        .order_by('month')
+        .distinct()
+    )
+    partitions = []
+    for entry in months:
+        start = month_start(entry['month'])
+        lower, upper = month_bounds(start)
+        partitions.append({
+            'name': partition_name(start),
+            'month': start,
+            'rows': AuditLog.objects.filter(timestamp__gte=lower, timestamp__lt=upper).count(),
+        })
+    return partitions
+
+
+def closed_partitions(retention_months):
+    """Partitions entièrement antérieures à la fenêtre de rétention"""
+    cutoff = add_months(month_start(timezone.now()), -retention_months)
+    return [p for p in list_partitions() if p['month'] < cutoff]
+
+
+def export_partition(start, directory):
+    """
+    Exporter un mois d'audit en JSONL compressé (gzip).
+
+    Écrit `<partition>.jsonl.gz` et un fichier `.sha256` au format sha256sum.
+    Retourne (chemin, nombre de lignes, empreinte hexadécimale).
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = partition_name(start)
+    path = directory / f'{name}.jsonl.gz'
+    lower, upper = month_bounds(start)
+
+    rows = (
+        AuditLog.objects.filter(timestamp__gte=lower, timestamp__lt=upper)
+        .order_by('id')
+        .values()
+    )
+    count = 0
+    # mtime=0: archive reproductible, même empreinte pour un même contenu
+    with open(path, 'wb') as raw, gzip.GzipFile(filename=f'{name}.jsonl', mode='wb', fileobj=raw, mtime=0) as gz:
+        for row in rows.iterator(chunk_size=2000):
+            gz.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+            gz.write(b'\n')
+            count += 1
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(block)
+    checksum = digest.hexdigest()
+    Path(f'{path}.sha256').write_text(f'{checksum}  {path.name}\n', encoding='utf-8')
+    return path, count, checksum
+
+
+def verify_archive(path):
+    """Vérifier une archive contre son fichier .sha256"""
+    path = Path(path)
+    expected = Path(f'{path}.sha256').read_text(encoding='utf-8').split()[0]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest() == expected
+
+
+def detach_partition(start, drop=False):
+    """
+    Retirer un mois archivé de la table active.
+
+    PostgreSQL: DETACH PARTITION (table conservée sauf si `drop`).
+    SQLite: suppression des lignes du mois.
+    """
+    qn = connection.ops.quote_name
+    name = partition_name(start)
+    if is_partitioned():
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {qn(PARENT_TABLE)} DETACH PARTITION {qn(name)}')
+            if drop:
+                cursor.execute(f'DROP TABLE {qn(name)}')
+        return name
+
+    lower, upper = month_bounds(start)
+    with transaction.atomic(), connection.cursor() as cursor:
+        # SQL brut: le journal est immuable côté ORM (pas de signaux de suppression)
+        cursor.execute(
+            f'DELETE FROM {qn(PARENT_TABLE)} WHERE "timestamp" >= %s AND "timestamp" < %s',
+            [lower, upper],
+        )
+    return name
+
+
+def default_archive_dir():
+    return getattr(settings, 'AUDIT_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archives' / 'audit')
@@ -3,7 +3,8 @@ Serializers pour audit logs
 """
 
 from rest_framework import serializers
-from .audit import AuditLog, LockedStatus
+from .audit import AuditLog, LockedStatus, AuditChainCheckpoint
+from .audit_chain import checkpoint_is_valid
 
 
 class AuditLogSerializer(serializers.ModelSerializer):
@@ -20,7 +21,8 @@ class AuditLogSerializer(serializers.ModelSerializer):
             'user', 'user_email', 'user_name',
             'content_type', 'object_id', 'object_label',
             'field_changed', 'old_value', 'new_value',
-            'reason', 'timestamp', 'ip_address'
+            'reason', 'timestamp', 'ip_address',
+            'chain_key', 'prev_hash', 'row_hash'
         ]
         read_only_fields = fields
 
@@ -40,3 +42,20 @@ class LockedStatusSerializer(serializers.ModelSerializer):
             'locked_at'
         ]
         read_only_fields = fields
+
+
+class AuditChainCheckpointSerializer(serializers.ModelSerializer):
+    """Serializer pour les points de contrôle de la chaîne d'audit"""
+    
+    signature_valid = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = AuditChainCheckpoint
+        fields = [
+            'chain_key', 'last_id', 'last_hash',
+            'rows_verified', 'verified_at', 'signature', 'signature_valid'
+        ]
+        read_only_fields = fields
+    
+    def get_signature_valid(self, obj):
+        return checkpoint_is_valid(obj)
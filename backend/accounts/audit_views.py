@@ -2,11 +2,20 @@
 API pour les audit logs - Accès MMG et ADMIN
 """
 
+from datetime import datetime, time, timedelta
+
 from rest_framework import viewsets, permissions, filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from .audit import AuditLog, LockedStatus
-from .audit_serializers import AuditLogSerializer, LockedStatusSerializer
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .audit import AuditLog, LockedStatus, AuditChainCheckpoint
+from .audit_partitions import month_bounds
+from .audit_serializers import (
+    AuditLogSerializer, LockedStatusSerializer, AuditChainCheckpointSerializer,
+)
 
 
 class IsMMGOrAdmin(permissions.BasePermission):
@@ -26,6 +35,10 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     Accès: MMG (audit) + ADMIN
     - MMG: Voir les audit logs de tous les sites
     - ADMIN: Voir tous les audit logs
+
+    Filtres temporels (?month=2026-02, ?date_from=..., ?date_to=...):
+    traduits en bornes sur `timestamp`, ce qui permet à PostgreSQL de
+    n'examiner que les partitions mensuelles concernées.
     """
     
     queryset = AuditLog.objects.select_related('user').all()
@@ -41,11 +54,77 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         """MMG voit uniquement ses sites, ADMIN voit tout"""
         if self.request.user.role == 'ADMIN':
-            return AuditLog.objects.select_related('user').all()
+            return self._filter_time_range(AuditLog.objects.select_related('user').all())
         
         # MMG: filtrer par sites assignés (si applicable)
         # Pour l'instant, on laisse MMG voir tous les logs (audit national)
-        return AuditLog.objects.select_related('user').all()
+        return self._filter_time_range(AuditLog.objects.select_related('user').all())
+
+    @action(detail=False, methods=['get'])
+    def integrity(self, request):
+        """
+        État de la preuve d'intégrité: derniers points de contrôle signés
+        par chaîne (la vérification elle-même: commande verify_audit_chain).
+        """
+        checkpoints = AuditChainCheckpoint.objects.all()
+        chain = request.query_params.get('chain')
+        if chain:
+            checkpoints = checkpoints.filter(chain_key__startswith=chain)
+        serializer = AuditChainCheckpointSerializer(checkpoints, many=True)
+        return Response({
+            'chains': serializer.data,
+            'all_signatures_valid': all(c['signature_valid'] for c in serializer.data),
+        })
+
+    def _filter_time_range(self, queryset):
+        """Restreindre à la plage demandée (élagage des partitions)"""
+        params = self.request.query_params
+
+        month = params.get('month')
+        if month:
+            try:
+                start = parse_date(f'{month}-01')
+            except ValueError:
+                start = None
+            if start is None:
+                raise ValidationError({'month': 'Format attendu: AAAA-MM'})
+            lower, upper = month_bounds(start)
+            queryset = queryset.filter(timestamp__gte=lower, timestamp__lt=upper)
+
+        date_from = params.get('date_from')
+        if date_from:
+            queryset = queryset.filter(timestamp__gte=self._parse_bound(date_from, 'date_from'))
+
+        date_to = params.get('date_to')
+        if date_to:
+            bound = self._parse_bound(date_to, 'date_to', end_of_day=True)
+            if parse_datetime(date_to) is None:
+                queryset = queryset.filter(timestamp__lt=bound)
+            else:
+                queryset = queryset.filter(timestamp__lte=bound)
+
+        return queryset
+
+    @staticmethod
+    def _parse_bound(value, name, end_of_day=False):
+        """
+        Accepte une date (AAAA-MM-JJ) ou une date/heure ISO 8601.
+        Une date seule en borne de fin inclut toute la journée.
+        """
+        try:
+            moment = parse_datetime(value)
+            day = parse_date(value) if moment is None else None
+        except ValueError:
+            raise ValidationError({name: 'Date invalide'})
+        if moment is None:
+            if day is None:
+                raise ValidationError({name: 'Date invalide'})
+            if end_of_day:
+                day = day + timedelta(days=1)
+            moment = datetime.combine(day, time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment, timezone.get_current_timezone())
+        return moment
 
 
 class LockedStatusViewSet(viewsets.ReadOnlyModelViewSet):
@@ -0,0 +1,133 @@
+"""
+Registre des verrous (LockedStatus) en cache partagé
+
+L'ensemble des object_id verrouillés est conservé par type de contenu dans
+le cache Django, sous une clé versionnée:
+
+    locks:ver:<content_type>          -> numéro de version
+    locks:set:<content_type>:<ver>    -> frozenset des object_id verrouillés
+
+Un verrouillage/déverrouillage incrémente la version après le commit: les
+lecteurs de tous les processus basculent sur une nouvelle clé et rechargent
+l'ensemble en une requête. Les anciennes clés expirent d'elles-mêmes.
+
+Les opérations en masse (queryset.update, bulk_create) ne déclenchent pas
+les signaux: appeler `invalidate(content_type)` après coup.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework import serializers
+from rest_framework.exceptions import PermissionDenied
+
+from .audit import LockedStatus
+
+
+SET_TIMEOUT = 60 * 60
+
+
+def content_type_label(model_or_instance):
+    """Libellé utilisé dans LockedStatus.content_type: 'reports.Report'"""
+    return model_or_instance._meta.label
+
+
+def _version_key(content_type):
+    return f'locks:ver:{content_type}'
+
+
+def _set_key(content_type, version):
+    return f'locks:set:{content_type}:{version}'
+
+
+def _current_version(content_type):
+    version = cache.get(_version_key(content_type))
+    if version is None:
+        # add() ne remplace pas une version posée entre-temps par un autre processus
+        cache.add(_version_key(content_type), 1, timeout=None)
+        version = cache.get(_version_key(content_type), 1)
+    return version
+
+
+def locked_set(content_type):
+    """Ensemble (frozenset) des object_id verrouillés pour un type de contenu"""
+    key = _set_key(content_type, _current_version(content_type))
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(
+            LockedStatus.objects.filter(content_type=content_type)
+            .values_list('object_id', flat=True)
+        )
+        cache.set(key, ids, timeout=SET_TIMEOUT)
+    return ids
+
+
+def is_locked(content_type, object_id):
+    return object_id in locked_set(content_type)
+
+
+def locked_ids(content_type, ids):
+    """Sous-ensemble verrouillé de `ids` (une seule lecture de cache)"""
+    return locked_set(content_type).intersection(ids)
+
+
+def invalidate(content_type):
+    """Forcer le rechargement du registre pour un type de contenu"""
+    try:
+        cache.incr(_version_key(content_type))
+    except ValueError:
+        # Clé absente (expirée ou cache vidé): repartir d'une version neuve
+        cache.set(_version_key(content_type), _current_version(content_type) + 1, timeout=None)
+
+
+@receiver(post_save, sender=LockedStatus)
+@receiver(post_delete, sender=LockedStatus)
+def _invalidate_on_change(sender, instance, **kwargs):
+    # Après commit: un lecteur ne doit pas recharger un état non encore visible
+    transaction.on_commit(lambda: invalidate(instance.content_type))
+
+
+class LockGuardMixin:
+    """
+    Refuse la modification/suppression d'un objet verrouillé (ViewSet).
+
+    À placer avant SiteScopedMixin dans les bases du ViewSet.
+    """
+
+    def _ensure_unlocked(self, instance):
+        if is_locked(content_type_label(instance), instance.pk):
+            raise PermissionDenied(
+                "Ce document est verrouillé (statut validé/publié) et ne peut plus être modifié."
+            )
+
+    def perform_update(self, serializer):
+        self._ensure_unlocked(serializer.instance)
+        super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        self._ensure_unlocked(instance)
+        super().perform_destroy(instance)
+
+
+class LockStatusSerializerMixin(serializers.Serializer):
+    """
+    Ajoute un champ `is_locked` calculé pour toute la page en une lecture.
+
+    En liste (many=True), les identifiants de la page sont lus sur le
+    ListSerializer parent; le résultat est partagé via le contexte.
+    """
+
+    is_locked = serializers.SerializerMethodField()
+
+    def get_is_locked(self, obj):
+        content_type = content_type_label(obj)
+        memo = self.context.setdefault('_locked_ids', {})
+        if content_type not in memo or obj.pk not in memo[content_type][0]:
+            if isinstance(self.parent, serializers.ListSerializer):
+                ids = {item.pk for item in self.parent.instance}
+            else:
+                ids = set()
+            ids.add(obj.pk)
+            memo[content_type] = (ids, locked_ids(content_type, ids))
+        return obj.pk in memo[content_type][1]
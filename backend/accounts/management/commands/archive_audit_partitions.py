@@ -0,0 +1,68 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.audit_chain import chain_keys, mark_archived, verify_chain
+from accounts.audit_partitions import (
+    closed_partitions, default_archive_dir, detach_partition,
+    export_partition, verify_archive,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive les mois clos du journal d'audit en JSONL compressé "
+        "(avec empreinte SHA-256), marque leurs chaînes archivées puis les "
+        "retire de la table active"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-months', type=int,
+            default=getattr(settings, 'AUDIT_RETENTION_MONTHS', 12),
+            help='Mois conservés en ligne, mois courant non compris (défaut: AUDIT_RETENTION_MONTHS)',
+        )
+        parser.add_argument('--output-dir', default=None,
+                            help="Dossier des archives (défaut: AUDIT_ARCHIVE_DIR)")
+        parser.add_argument('--drop', action='store_true',
+                            help='Supprimer la partition détachée après archivage (PostgreSQL)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Lister les partitions concernées sans rien modifier')
+
+    def handle(self, *args, **options):
+        if options['retention_months'] < 1:
+            raise CommandError("La rétention doit être d'au moins un mois.")
+
+        output_dir = Path(options['output_dir'] or default_archive_dir())
+        partitions = closed_partitions(options['retention_months'])
+        if not partitions:
+            self.stdout.write("Aucune partition à archiver.")
+            return
+
+        for partition in partitions:
+            if options['dry_run']:
+                self.stdout.write(f"[dry-run] {partition['name']} (~{partition['rows']} lignes)")
+                continue
+
+            # Chaînes du mois vérifiées jusqu'à leur dernière ligne avant archivage
+            keys = chain_keys(prefix=f"{partition['month']:%Y-%m}:")
+            for key in keys:
+                result = verify_chain(key)
+                if result['errors']:
+                    raise CommandError(
+                        f"Chaîne {key} compromise ({result['errors'][0]}): partition conservée."
+                    )
+
+            path, count, checksum = export_partition(partition['month'], output_dir)
+            if not verify_archive(path):
+                raise CommandError(f"Empreinte invalide pour {path}: partition conservée.")
+
+            with transaction.atomic():
+                for key in keys:
+                    mark_archived(key)
+                detach_partition(partition['month'], drop=options['drop'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{partition['name']}: {count} lignes -> {path.name} (sha256 {checksum[:12]}…)"
+            ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from accounts.audit_partitions import ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = "Crée à l'avance les partitions mensuelles du journal d'audit (PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=2,
+                            help='Nombre de mois futurs à préparer (défaut: 2)')
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            self.stdout.write(self.style.WARNING(
+                "Journal d'audit non partitionné (base non PostgreSQL): rien à faire."
+            ))
+            return
+
+        created = ensure_partitions(months_ahead=options['months_ahead'])
+        for name in created:
+            self.stdout.write(f"Partition créée: {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partition(s) créée(s)."))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.audit_chain import verify_all, verify_chain
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie le chaînage SHA-256 du journal d'audit en flux, "
+        "en reprenant depuis les points de contrôle signés"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chain', help="Ne vérifier qu'une chaîne (ex: 2026-02:report)")
+        parser.add_argument('--full', action='store_true',
+                            help='Ignorer les points de contrôle et tout revérifier')
+        parser.add_argument('--checkpoint-every', type=int, default=10000,
+                            help='Lignes entre deux points de contrôle (défaut: 10000)')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Taille des lots lus depuis le curseur (défaut: 2000)')
+
+    def handle(self, *args, **options):
+        kwargs = {
+            'full': options['full'],
+            'checkpoint_every': options['checkpoint_every'],
+            'chunk_size': options['chunk_size'],
+        }
+        if options['chain']:
+            results = [verify_chain(options['chain'], **kwargs)]
+        else:
+            results = verify_all(**kwargs)
+
+        broken = 0
+        for result in results:
+            if result['errors']:
+                broken += 1
+                self.stdout.write(self.style.ERROR(
+                    f"{result['chain_key']}: {len(result['errors'])} anomalie(s)"
+                ))
+                for error in result['errors'][:20]:
+                    self.stdout.write(f"  - {error}")
+            else:
+                self.stdout.write(
+                    f"{result['chain_key']}: OK ({result['rows']} nouvelle(s) ligne(s), {result['total']} au total)"
+                )
+
+        if broken:
+            raise CommandError(f"{broken} chaîne(s) d'audit compromise(s).")
+        self.stdout.write(self.style.SUCCESS("Journal d'audit intègre."))
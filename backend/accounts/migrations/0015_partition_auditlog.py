@@ -0,0 +1,129 @@
+# Partitionnement mensuel du journal d'audit (PostgreSQL uniquement)
+#
+# La table accounts_auditlog est recréée comme table partitionnée par plage
+# sur "timestamp". Les lignes existantes sont recopiées dans des partitions
+# mensuelles; une partition par défaut capte tout ce qui sort des plages
+# créées (la commande ensure_audit_partitions crée les mois à venir).
+#
+# L'état Django du modèle ne change pas: la clé primaire physique devient
+# (id, timestamp), exigence de PostgreSQL pour une table partitionnée, mais
+# `id` reste unique par construction (séquence/identité).
+
+from datetime import date, datetime, time
+
+from django.db import migrations
+from django.utils import timezone
+
+
+TABLE = 'accounts_auditlog'
+LEGACY = 'accounts_auditlog_legacy'
+DEFAULT = 'accounts_auditlog_default'
+BRIN_INDEX = 'accounts_auditlog_ts_brin'
+
+
+def _add_months(start, months):
+    index = start.year * 12 + (start.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def partition_auditlog(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [TABLE],
+        )
+        if cursor.fetchone():
+            return
+
+        # Définitions à reproduire sur la nouvelle table
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE tablename = %s AND schemaname = current_schema()",
+            [TABLE],
+        )
+        index_defs = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass",
+            [TABLE],
+        )
+        constraints = cursor.fetchall()
+        pk_names = {name for name, kind, _ in constraints if kind == 'p'}
+        foreign_keys = [(name, definition) for name, kind, definition in constraints if kind == 'f']
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute "
+            "WHERE attrelid = %s::regclass AND attname = 'id'",
+            [TABLE],
+        )
+        is_identity = cursor.fetchone()[0] in ('a', 'd')
+
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {LEGACY}')
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {LEGACY} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, "timestamp")')
+
+        # Une partition par mois depuis la plus ancienne ligne jusqu'à M+2
+        cursor.execute(f'SELECT MIN("timestamp") FROM {LEGACY}')
+        oldest = cursor.fetchone()[0] or timezone.now()
+        current = timezone.localtime(oldest).date().replace(day=1)
+        last = _add_months(timezone.localtime(timezone.now()).date().replace(day=1), 2)
+        while current <= last:
+            upper = _add_months(current, 1)
+            cursor.execute(
+                f'CREATE TABLE {TABLE}_p{current.year:04d}_{current.month:02d} '
+                f'PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)',
+                [_aware(current), _aware(upper)],
+            )
+            current = upper
+        cursor.execute(f'CREATE TABLE {DEFAULT} PARTITION OF {TABLE} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {LEGACY}')
+
+        if is_identity:
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {TABLE}), 0) + 1, false)"
+            )
+        else:
+            # Colonne serial: la séquence appartient encore à l'ancienne table
+            cursor.execute(f"SELECT pg_get_serial_sequence('{LEGACY}', 'id')")
+            sequence = cursor.fetchone()[0]
+            if sequence:
+                cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id')
+
+        cursor.execute(f'DROP TABLE {LEGACY}')
+
+        # Index et clés étrangères, sous leurs noms d'origine (l'état Django y fait référence)
+        for name, definition in index_defs:
+            if name in pk_names:
+                continue
+            # Définitions lues avant le renommage: elles visent déjà la nouvelle table
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+        # BRIN: quelques pages pour couvrir des mois de lignes insérées dans l'ordre
+        cursor.execute(f'CREATE INDEX {BRIN_INDEX} ON {TABLE} USING brin ("timestamp")')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_rename_accounts_aud_content_idx_accounts_au_content_4b4dd4_idx_and_more'),
+    ]
+
+    operations = [
+        # Irréversible en pratique: la table partitionnée reste compatible avec le modèle
+        migrations.RunPython(partition_auditlog, migrations.RunPython.noop),
+    ]
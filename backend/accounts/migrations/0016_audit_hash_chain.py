@@ -0,0 +1,143 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:13
+
+import hashlib
+import ipaddress
+import json
+from datetime import timezone as dt_timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+from django.utils import timezone
+import django.utils.timezone
+
+
+# Copie figée de accounts.audit_chain au moment de la migration: le
+# chaînage initial ne doit pas suivre les évolutions du code applicatif
+
+GENESIS_HASH = '0' * 64
+
+HASHED_FIELDS = (
+    'user_id', 'action', 'content_type', 'object_id', 'object_label',
+    'field_changed', 'old_value', 'new_value', 'reason', 'timestamp', 'ip_address',
+)
+
+
+def chain_key_for(content_type, timestamp):
+    local = timezone.localtime(timestamp)
+    return f'{local.year:04d}-{local.month:02d}:{content_type}'[:120]
+
+
+def _normalize_ip(value):
+    if not value:
+        return None
+    try:
+        address = ipaddress.ip_address(value)
+    except ValueError:
+        return str(value)
+    if address.version == 6 and address.ipv4_mapped:
+        return str(address.ipv4_mapped)
+    return str(address)
+
+
+def _normalize_json(value):
+    if value is None:
+        return None
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+def canonical_payload(values):
+    timestamp = values['timestamp'].astimezone(dt_timezone.utc)
+    payload = {
+        'user_id': values['user_id'],
+        'action': values['action'],
+        'content_type': values['content_type'],
+        'object_id': values['object_id'],
+        'object_label': values['object_label'],
+        'field_changed': values['field_changed'],
+        'old_value': _normalize_json(values['old_value']),
+        'new_value': _normalize_json(values['new_value']),
+        'reason': values['reason'],
+        'timestamp': timestamp.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+        'ip_address': _normalize_ip(values['ip_address']),
+    }
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'),
+                      ensure_ascii=False, cls=DjangoJSONEncoder)
+
+
+def compute_row_hash(prev_hash, values):
+    digest = hashlib.sha256()
+    digest.update((prev_hash or GENESIS_HASH).encode('ascii'))
+    digest.update(b'\n')
+    digest.update(canonical_payload(values).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def backfill_chain(apps, schema_editor):
+    """Chaîner les lignes existantes dans l'ordre d'insertion"""
+    AuditLog = apps.get_model('accounts', 'AuditLog')
+    heads = {}
+    batch = []
+    rows = AuditLog.objects.order_by('id').values('id', *HASHED_FIELDS)
+    for values in rows.iterator(chunk_size=2000):
+        key = chain_key_for(values['content_type'], values['timestamp'])
+        prev_hash = heads.get(key, GENESIS_HASH)
+        row_hash = compute_row_hash(prev_hash, values)
+        heads[key] = row_hash
+        batch.append(AuditLog(id=values['id'], chain_key=key, prev_hash=prev_hash, row_hash=row_hash))
+        if len(batch) >= 1000:
+            AuditLog.objects.bulk_update(batch, ['chain_key', 'prev_hash', 'row_hash'])
+            batch = []
+    if batch:
+        AuditLog.objects.bulk_update(batch, ['chain_key', 'prev_hash', 'row_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_partition_auditlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditChainCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chain_key', models.CharField(max_length=120, unique=True, verbose_name='Chaîne')),
+                ('last_id', models.BigIntegerField(verbose_name='Dernière ligne vérifiée')),
+                ('last_hash', models.CharField(max_length=64, verbose_name='Dernière empreinte')),
+                ('rows_verified', models.BigIntegerField(default=0, verbose_name='Lignes vérifiées')),
+                ('verified_at', models.DateTimeField(verbose_name='Vérifié le')),
+                ('signature', models.CharField(max_length=64, verbose_name='Signature HMAC')),
+            ],
+            options={
+                'verbose_name': "Point de contrôle d'audit",
+                'verbose_name_plural': "Points de contrôle d'audit",
+                'ordering': ['chain_key'],
+            },
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='chain_key',
+            field=models.CharField(default='', editable=False, help_text="Mois et type de contenu: '2026-02:report'", max_length=120, verbose_name='Chaîne'),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='prev_hash',
+            field=models.CharField(default='', editable=False, max_length=64, verbose_name='Empreinte précédente'),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='row_hash',
+            field=models.CharField(default='', editable=False, max_length=64, verbose_name='Empreinte'),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Date/Heure'),
+        ),
+        migrations.RunPython(backfill_chain, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['chain_key', 'id'], name='accounts_au_chain_k_9f5b51_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-19 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_audit_hash_chain'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditchaincheckpoint',
+            name='archived',
+            field=models.BooleanField(default=False, verbose_name='Archivée'),
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.db import models
-from .audit import AuditLog, LockedStatus
+from .audit import AuditLog, LockedStatus, AuditChainCheckpoint
 
 
 class UserManager(BaseUserManager):
@@ -1,7 +1,7 @@
 from django.db.models.signals import pre_delete, post_save
 from django.dispatch import receiver
 from crum import get_current_user
-from .audit import AuditLog  # Import de ton modèle
+from .audit import AuditLog, AuditChainCheckpoint  # Import de ton modèle
 
 @receiver(pre_delete)
 def audit_delete(sender, instance, **kwargs):
@@ -10,7 +10,7 @@ def audit_delete(sender, instance, **kwargs):
     Permet de garder une trace de ce qui a été supprimé.
     """
     # 1. On ignore les logs eux-mêmes
-    if sender == AuditLog:
+    if sender in (AuditLog, AuditChainCheckpoint):
         return
 
     # 2. On récupère l'utilisateur connecté via le middleware CRUM
@@ -38,7 +38,7 @@ def audit_create(sender, instance, created, **kwargs):
     """
     Se déclenche juste APRÈS la création d'un objet.
     """
-    if not created or sender == AuditLog:
+    if not created or sender in (AuditLog, AuditChainCheckpoint):
         return
 
     user = get_current_user()
@@ -1,3 +1,80 @@
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from .audit import AuditChainCheckpoint, AuditLog
+from .audit_chain import chain_keys, mark_archived, verify_all, verify_chain
+from .models import User
+
+
+class AuditChainTests(TestCase):
+    """Détection des altérations du journal d'audit chaîné"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='audit@example.com', password='secret')
+        self.entries = [
+            AuditLog.log_action(
+                user=self.user, action='UPDATE', content_type='tests.Chain', object_id=index,
+                object_label=f'Objet {index}', field_changed='status', old_value='A', new_value='B',
+            )
+            for index in range(5)
+        ]
+        self.chain_key = self.entries[0].chain_key
+
+    def delete_chain(self):
+        # SQL brut, comme le retrait d'une partition (pas de signaux)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM accounts_auditlog WHERE chain_key = %s', [self.chain_key])
+
+    def test_intact_chain_verifies_and_checkpoints(self):
+        result = verify_chain(self.chain_key)
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(result['total'], 5)
+        checkpoint = AuditChainCheckpoint.objects.get(chain_key=self.chain_key)
+        self.assertEqual(checkpoint.last_id, self.entries[-1].pk)
+
+    def test_altered_content_is_detected(self):
+        AuditLog.objects.filter(pk=self.entries[2].pk).update(new_value='C')
+        result = verify_chain(self.chain_key, full=True)
+        self.assertTrue(any('contenu altéré' in error for error in result['errors']))
+
+    def test_deleted_row_is_detected(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM accounts_auditlog WHERE id = %s', [self.entries[2].pk])
+        result = verify_chain(self.chain_key, full=True)
+        self.assertTrue(any('rupture de chaînage' in error for error in result['errors']))
+
+    def test_deleted_checkpoint_anchor_is_detected(self):
+        verify_chain(self.chain_key)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM accounts_auditlog WHERE id = %s', [self.entries[-1].pk])
+        result = verify_chain(self.chain_key)
+        self.assertTrue(any('absente ou modifiée' in error for error in result['errors']))
+
+    def test_forged_checkpoint_signature_is_detected(self):
+        verify_chain(self.chain_key)
+        AuditChainCheckpoint.objects.filter(chain_key=self.chain_key).update(archived=True)
+        result = verify_chain(self.chain_key)
+        self.assertTrue(any('Signature' in error for error in result['errors']))
+
+    def test_deleted_chain_without_archive_is_detected(self):
+        verify_chain(self.chain_key)
+        self.delete_chain()
+        self.assertIn(self.chain_key, chain_keys())
+        results = {result['chain_key']: result for result in verify_all()}
+        self.assertTrue(results[self.chain_key]['errors'])
+
+    def test_archived_chain_passes(self):
+        verify_chain(self.chain_key)
+        mark_archived(self.chain_key)
+        self.delete_chain()
+        result = verify_chain(self.chain_key)
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(result['total'], 5)
+
+    def test_archive_requires_up_to_date_checkpoint(self):
+        verify_chain(self.chain_key)
+        AuditLog.log_action(
+            user=self.user, action='UPDATE', content_type='tests.Chain', object_id=99, object_label='Tardif',
+        )
+        with self.assertRaises(ValueError):
+            mark_archived(self.chain_key)
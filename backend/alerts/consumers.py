@@ -170,6 +170,13 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'type': 'alert_dismissed',
             'alert_id': event['alert_id']
         })
+
+    async def export_progress(self, event):
+        """Progression d'un export en arrière-plan (application exports)"""
+        await self.send_json({
+            'type': 'export_progress',
+            'job': event['job']
+        })
     
     # ============ HELPERS BD ============
     
@@ -6,6 +6,7 @@ from django.dispatch import receiver
 from django.utils import timezone
 from datetime import timedelta
 from .models import Alert
+import hashlib
 import json
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
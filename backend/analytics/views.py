@@ -13,7 +13,7 @@ from accounts.permissions import CanManageAnalytics
 from accounts.mixins import SiteScopedMixin
 from mining_sites.models import MiningSite, DistributedNode
 from personnel.models import Personnel
-from equipment.models import Equipment
+from equipment.models import Equipment, HIGH_RISK_LEVELS
 from incidents.models import Incident
 from alerts.models import Alert
 from operations.models import Operation
@@ -441,6 +441,22 @@ class IndicatorViewSet(SiteScopedMixin, viewsets.ModelViewSet):
         total_incidents_all = Incident.objects.filter(**site_filter).count()
         last_critical = Incident.objects.filter(**site_filter, severity='CRITICAL').order_by('-date').first()
         
+        # Équipements à risque: scores prédictifs précalculés
+        # (score_equipment_health), ic = incidents des 30 derniers jours
+        equipment_at_risk = list(
+            Equipment.objects.filter(
+                **site_filter, status='OPERATIONAL', health_score__risk_level__in=HIGH_RISK_LEVELS,
+            )
+            .order_by('-health_score__failure_risk')
+            .values(
+                'id', 'name', 'site__name',
+                ic=F('health_score__incidents_30d'),
+                failure_risk=F('health_score__failure_risk'),
+                risk_level=F('health_score__risk_level'),
+                next_service_date=F('health_score__next_service_date'),
+            )[:5]
+        )
+        
         return Response({
             'site_risks': site_risks,
             'distributed_nodes': distributed_nodes,
@@ -461,7 +477,7 @@ class IndicatorViewSet(SiteScopedMixin, viewsets.ModelViewSet):
                 'trend_pct': incident_trend_pct,
                 'by_type': incidents_by_type,
             },
-            'equipment_at_risk': list(Equipment.objects.filter(**site_filter, status='OPERATIONAL').annotate(ic=Count('incidents', filter=Q(incidents__date__gte=last_30))).filter(ic__gte=2).values('id','name','ic')[:5]),
+            'equipment_at_risk': equipment_at_risk,
             'recommendations': recommendations,
             'kpis': {
                 'resolution_rate': round(resolved_incidents / total_incidents_all * 100, 1) if total_incidents_all > 0 else 100,
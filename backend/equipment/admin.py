@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Equipment, MaintenanceRecord
+from .models import Equipment, EquipmentHealthScore, GeofenceEvent, MaintenanceRecord
 
 
 @admin.register(Equipment)
@@ -16,3 +16,19 @@ class MaintenanceRecordAdmin(admin.ModelAdmin):
     list_filter = ('maintenance_type', 'status')
     search_fields = ('maintenance_code', 'description')
     ordering = ('-scheduled_date',)
+
+
+@admin.register(EquipmentHealthScore)
+class EquipmentHealthScoreAdmin(admin.ModelAdmin):
+    list_display = ('equipment', 'failure_risk', 'risk_level', 'next_service_date', 'computed_at')
+    list_filter = ('risk_level',)
+    search_fields = ('equipment__equipment_code', 'equipment__name')
+    ordering = ('-failure_risk',)
+
+
+@admin.register(GeofenceEvent)
+class GeofenceEventAdmin(admin.ModelAdmin):
+    list_display = ('equipment', 'event_type', 'site', 'work_zone', 'timestamp')
+    list_filter = ('event_type', 'site')
+    search_fields = ('equipment__equipment_code',)
+    ordering = ('-timestamp',)
@@ -0,0 +1,166 @@
+"""
+consumers.py - WebSocket des positions d'équipements en temps réel (ws/tracking/)
+"""
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.utils import timezone
+
+from mining_sites.models import MiningSite
+from .models import Equipment
+from .streaming import position_payload, site_group
+
+logger = logging.getLogger(__name__)
+
+
+class TrackingConsumer(AsyncWebsocketConsumer):
+    """
+    Consumer WebSocket de la carte en direct
+    - Un groupe par site (`tracking_site_<id>`), limité aux sites de l'utilisateur
+      (?site=<id> pour n'en suivre qu'un)
+    - Instantané des dernières positions à la connexion
+    - Positions reçues regroupées en une trame par intervalle
+      (la plus récente par équipement)
+    """
+
+    async def connect(self):
+        """Connexion du client"""
+        self.user = self.scope["user"]
+        self.site_ids = []
+        self.pending = {}
+        self.flush_task = None
+
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        query = parse_qs(self.scope.get('query_string', b'').decode('utf-8'))
+        requested = query.get('site', [None])[0]
+        self.site_ids = await self._allowed_sites(requested)
+        if not self.site_ids:
+            await self.close()
+            return
+
+        for site_id in self.site_ids:
+            await self.channel_layer.group_add(site_group(site_id), self.channel_name)
+
+        await self.accept()
+        logger.info(f"User {self.user.email} connected to tracking ({len(self.site_ids)} sites)")
+
+        await self.send_snapshot()
+
+    async def disconnect(self, close_code):
+        """Déconnexion du client"""
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+        for site_id in self.site_ids:
+            await self.channel_layer.group_discard(site_group(site_id), self.channel_name)
+
+    async def receive(self, text_data):
+        """Recevoir un message du client"""
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send_error("Format JSON invalide")
+            return
+
+        if data.get('action') == 'snapshot':
+            await self.send_snapshot()
+        else:
+            await self.send_error(f"Action inconnue: {data.get('action')}")
+
+    # ============ ÉVÉNEMENTS DU GROUPE ============
+
+    async def tracking_positions(self, event):
+        """Positions publiées pour un site: mises en attente de la prochaine trame"""
+        for position in event['positions']:
+            current = self.pending.get(position['id'])
+            if current is None or position['ts'] >= current['ts']:
+                self.pending[position['id']] = position
+        if self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(getattr(settings, 'TRACKING_STREAM_FRAME_SECONDS', 1.0))
+            positions, self.pending = list(self.pending.values()), {}
+            self.flush_task = None
+            if positions:
+                await self.send_json({
+                    'type': 'positions',
+                    'positions': positions,
+                    'timestamp': timezone.now().isoformat(),
+                })
+        except asyncio.CancelledError:
+            pass
+
+    # ============ HELPERS BD ============
+
+    @database_sync_to_async
+    def _allowed_sites(self, requested):
+        """Sites suivis: ceux de l'utilisateur, ou le site demandé s'il y a accès"""
+        allowed = self.user.get_site_ids()
+        if allowed is None:
+            allowed = list(MiningSite.objects.values_list('id', flat=True))
+        if requested is None:
+            return allowed
+        try:
+            requested = int(requested)
+        except ValueError:
+            return []
+        return [requested] if requested in allowed else []
+
+    @database_sync_to_async
+    def _get_snapshot(self):
+        """Dernière position connue des équipements des sites suivis"""
+        rows = (
+            Equipment.objects
+            .filter(site_id__in=self.site_ids, last_latitude__isnull=False, last_longitude__isnull=False)
+            .values(
+                'id', 'equipment_code', 'name', 'equipment_type', 'status', 'site_id',
+                'last_latitude', 'last_longitude', 'current_speed', 'last_position_update',
+            )
+        )
+        equipment = []
+        for row in rows:
+            position = position_payload(
+                row['id'], row['last_latitude'], row['last_longitude'],
+                row['current_speed'], row['last_position_update'] or timezone.now(),
+            )
+            position.update({
+                'code': row['equipment_code'],
+                'name': row['name'],
+                'equipment_type': row['equipment_type'],
+                'status': row['status'],
+                'site_id': row['site_id'],
+            })
+            equipment.append(position)
+        return equipment
+
+    # ============ ENVOI DE MESSAGES ============
+
+    async def send_snapshot(self):
+        """Envoyer l'instantané des positions"""
+        equipment = await self._get_snapshot()
+        await self.send_json({
+            'type': 'snapshot',
+            'equipment': equipment,
+            'count': len(equipment),
+            'timestamp': timezone.now().isoformat(),
+        })
+
+    async def send_json(self, data):
+        """Helper pour envoyer du JSON"""
+        await self.send(text_data=json.dumps(data))
+
+    async def send_error(self, message):
+        """Envoyer un message d'erreur"""
+        await self.send_json({
+            'type': 'error',
+            'message': message
+        })
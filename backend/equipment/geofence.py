@@ -0,0 +1,152 @@
+"""
+Contrôle des géofences sur les positions GPS
+
+Chaque lot de relevés (update_tracking, telemetry) est évalué par site
+contre les polygones compilés du registre (mining_sites.geofences): une
+opération vectorisée pour la concession, une par zone de chantier active.
+Les relevés de chaque équipement sont ensuite parcourus dans l'ordre
+chronologique et comparés à son dernier état connu (EquipmentGeofenceState):
+
+- seul un changement d'état produit un GeofenceEvent (entrée/sortie);
+- une sortie de concession lève aussi une alerte;
+- le premier relevé d'un équipement fixe son état sans événement, sauf
+  s'il est déjà hors de sa concession (sortie signalée).
+
+Un relevé antérieur au dernier relevé évalué est ignoré.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+
+from alerts.models import Alert
+from mining_sites.geofences import registry
+
+from .models import Equipment, EquipmentGeofenceState, GeofenceEvent
+
+
+def _zone_membership(zones, lats, lons):
+    """Zone de chaque point (0: aucune); la première zone (par code) l'emporte"""
+    zone_of = np.zeros(len(lats), dtype=np.int64)
+    for zone_id, polygon in zones:
+        free = zone_of == 0
+        if not free.any():
+            break
+        hits = np.zeros(len(lats), dtype=bool)
+        hits[free] = polygon.contains(lats[free], lons[free])
+        zone_of[hits] = zone_id
+    return zone_of
+
+
+def _exit_alert(event, equipment_codes):
+    code = equipment_codes.get(event.equipment_id, f"#{event.equipment_id}")
+    return Alert.objects.create(
+        alert_type=Alert.AlertType.EQUIPMENT,
+        category=Alert.Category.SAFETY,
+        severity=Alert.Severity.HIGH,
+        site_id=event.site_id,
+        related_equipment_id=event.equipment_id,
+        title=f"Sortie de concession: {code}",
+        message=(
+            f"L'équipement {code} a quitté le périmètre de la concession "
+            f"({event.latitude}, {event.longitude}) le {event.timestamp:%d/%m/%Y %H:%M}."
+        ),
+        dedupe_key=f"geofence:{event.equipment_id}:{event.timestamp.isoformat()}",
+    )
+
+
+def evaluate_fixes(fixes, site_ids):
+    """
+    Évaluer des relevés EquipmentTracking (un lot, tous équipements).
+
+    `site_ids`: {equipment_id: site_id}. Les états sont verrouillés
+    (select_for_update) jusqu'à la fin de la transaction de la saisie.
+    Retourne la liste des GeofenceEvent créés.
+    """
+    with transaction.atomic():
+        return _evaluate(fixes, site_ids)
+
+
+def _evaluate(fixes, site_ids):
+    fences = registry()
+    by_site = defaultdict(list)
+    for fix in fixes:
+        site_id = site_ids.get(fix.equipment_id)
+        if site_id and (fences.site(site_id) or fences.site_zones(site_id)):
+            by_site[site_id].append(fix)
+    if not by_site:
+        return []
+
+    equipment_ids = {fix.equipment_id for site_fixes in by_site.values() for fix in site_fixes}
+    # États manquants créés vides avant verrouillage: deux lots concurrents
+    # sur le premier relevé d'un équipement se sérialisent sur la même ligne
+    # au lieu d'évaluer chacun un état neuf
+    EquipmentGeofenceState.objects.bulk_create(
+        [EquipmentGeofenceState(equipment_id=equipment_id) for equipment_id in equipment_ids],
+        ignore_conflicts=True,
+    )
+    states = {
+        state.equipment_id: state
+        for state in EquipmentGeofenceState.objects.select_for_update().filter(equipment_id__in=equipment_ids)
+    }
+    changed_states = {}
+    events = []
+
+    for site_id, site_fixes in by_site.items():
+        site_fixes.sort(key=lambda fix: (fix.equipment_id, fix.timestamp))
+        lats = np.array([float(fix.latitude) for fix in site_fixes])
+        lons = np.array([float(fix.longitude) for fix in site_fixes])
+        concession = fences.site(site_id)
+        inside = concession.contains(lats, lons) if concession else None
+        zone_of = _zone_membership(fences.site_zones(site_id), lats, lons)
+
+        for index, fix in enumerate(site_fixes):
+            state = states[fix.equipment_id]
+            is_new = state.last_fix_at is None
+            if not is_new and fix.timestamp <= state.last_fix_at:
+                continue
+
+            def event(event_type, work_zone_id=None):
+                events.append(GeofenceEvent(
+                    equipment_id=fix.equipment_id, event_type=event_type, site_id=site_id,
+                    work_zone_id=work_zone_id, latitude=fix.latitude, longitude=fix.longitude,
+                    timestamp=fix.timestamp,
+                ))
+
+            if inside is not None:
+                now_inside = bool(inside[index])
+                if now_inside != state.inside_concession:
+                    if not now_inside:
+                        event(GeofenceEvent.EventType.SITE_EXIT)
+                    elif state.inside_concession is not None:
+                        event(GeofenceEvent.EventType.SITE_ENTER)
+                    state.inside_concession = now_inside
+
+            zone_id = int(zone_of[index]) or None
+            if zone_id != state.work_zone_id:
+                if not is_new:
+                    if state.work_zone_id:
+                        event(GeofenceEvent.EventType.ZONE_EXIT, state.work_zone_id)
+                    if zone_id:
+                        event(GeofenceEvent.EventType.ZONE_ENTER, zone_id)
+                state.work_zone_id = zone_id
+
+            state.last_fix_at = fix.timestamp
+            changed_states[fix.equipment_id] = state
+
+    EquipmentGeofenceState.objects.bulk_update(
+        changed_states.values(), ['inside_concession', 'work_zone', 'last_fix_at'], batch_size=500,
+    )
+    GeofenceEvent.objects.bulk_create(events, batch_size=1000)
+
+    # Alertes: sorties de concession uniquement (changements d'état)
+    exits = [item for item in events if item.event_type == GeofenceEvent.EventType.SITE_EXIT]
+    if exits:
+        codes = dict(
+            Equipment.objects.filter(pk__in={item.equipment_id for item in exits})
+            .values_list('pk', 'equipment_code')
+        )
+        for exit_event in exits:
+            _exit_alert(exit_event, codes)
+    return events
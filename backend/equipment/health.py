@@ -0,0 +1,263 @@
+"""
+Maintenance prédictive de la flotte
+
+score_fleet() construit la matrice des variables de tous les équipements
+en service en quelques requêtes groupées (équipements, maintenances,
+incidents, utilisation GPS), puis calcule en une passe NumPy:
+
+- le risque de panne: logistique d'une combinaison linéaire des variables
+  (dépassement d'intervalle d'entretien, incidents récents, maintenances
+  correctives, âge, utilisation, surconsommation de carburant);
+- la date estimée du prochain entretien: la plus proche entre l'échéance
+  calendaire, l'échéance en heures au rythme d'utilisation observé et la
+  date planifiée.
+
+Les coefficients sont des valeurs de départ, à recalibrer sur l'historique
+des pannes. Les résultats sont enregistrés dans EquipmentHealthScore.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+
+from incidents.models import Incident
+
+from .models import (
+    Equipment, EquipmentHealthScore, EquipmentTracking, EquipmentTrackingRollup, MaintenanceRecord,
+)
+
+
+UTILIZATION_DAYS = 30
+INCIDENT_DAYS = 30
+CORRECTIVE_DAYS = 365
+# Vitesse au-delà de laquelle un engin est considéré en activité (km/h)
+MOVING_SPEED = 1.0
+
+COEFFICIENTS = {
+    'bias': -3.0,
+    'overdue': 1.5,       # par intervalle d'entretien écoulé (borné à 3)
+    'incidents': 0.6,     # par incident sur 30 jours
+    'corrective': 0.4,    # par maintenance corrective sur 365 jours
+    'age': 0.06,          # par année de service (bornée à 30)
+    'utilization': 1.0,   # taux d'utilisation 0-1
+    'fuel': 0.8,          # surconsommation relative au type (bornée à 2)
+}
+# Seuils de risque: faible < 0.25 <= modéré < 0.5 <= élevé < 0.75 <= critique
+RISK_THRESHOLDS = (0.25, 0.5, 0.75)
+RISK_LEVELS = (
+    EquipmentHealthScore.RiskLevel.LOW,
+    EquipmentHealthScore.RiskLevel.MEDIUM,
+    EquipmentHealthScore.RiskLevel.HIGH,
+    EquipmentHealthScore.RiskLevel.CRITICAL,
+)
+CORRECTIVE_TYPES = (MaintenanceRecord.MaintenanceType.CORRECTIVE, MaintenanceRecord.MaintenanceType.REPAIR)
+SCORE_FIELDS = (
+    'failure_risk', 'risk_level', 'next_service_date', 'hours_since_service', 'days_since_service',
+    'utilization', 'incidents_30d', 'corrective_maintenances_365d', 'computed_at',
+)
+
+
+def _number(value):
+    return np.nan if value is None else float(value)
+
+
+def _ordinal(day):
+    return np.nan if day is None else float(day.toordinal())
+
+
+def _column(ids, values):
+    """{equipment_id: valeur} -> colonne alignée sur `ids` (0 si absent)"""
+    return np.array([values.get(pk, 0) for pk in ids], dtype=float)
+
+
+def fleet_features(now=None):
+    """
+    Matrice des variables de la flotte en service, en quelques requêtes
+    groupées. Retourne (ids, {variable: tableau aligné sur ids}).
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    rows = list(
+        Equipment.objects.exclude(status=Equipment.EquipmentStatus.RETIRED)
+        .order_by('pk')
+        .values_list(
+            'pk', 'status', 'equipment_type', 'hours_operated', 'fuel_consumption_rate',
+            'commissioning_date', 'year_of_manufacture', 'last_maintenance_date', 'next_maintenance_date',
+        )
+    )
+    ids = [row[0] for row in rows]
+
+    completed = Q(status=MaintenanceRecord.MaintenanceStatus.COMPLETED)
+    maintenance = {
+        row['equipment_id']: row
+        for row in MaintenanceRecord.objects.order_by().values('equipment_id').annotate(
+            last_end=Max('end_date', filter=completed),
+            last_hours=Max('hours_at_maintenance', filter=completed),
+            corrective=Count('pk', filter=completed & Q(
+                maintenance_type__in=CORRECTIVE_TYPES, end_date__gte=now - timedelta(days=CORRECTIVE_DAYS),
+            )),
+        )
+    }
+
+    involvement = Incident.equipment_involved.through.objects
+    incidents = dict(
+        involvement.filter(incident__date__gte=today - timedelta(days=INCIDENT_DAYS))
+        .order_by().values('equipment_id').annotate(total=Count('incident_id'))
+        .values_list('equipment_id', 'total')
+    )
+
+    # Minutes d'activité: positions brutes pas encore compactées + paliers minute
+    window_start = now - timedelta(days=UTILIZATION_DAYS)
+    active_minutes = dict(
+        EquipmentTracking.objects.filter(timestamp__gte=window_start, speed__gt=MOVING_SPEED)
+        .order_by().values('equipment_id')
+        .annotate(minutes=Count(TruncMinute('timestamp'), distinct=True))
+        .values_list('equipment_id', 'minutes')
+    )
+    for equipment_id, minutes in (
+        EquipmentTrackingRollup.objects.filter(
+            resolution=EquipmentTrackingRollup.Resolution.MINUTE,
+            bucket_start__gte=window_start, max_speed__gt=MOVING_SPEED,
+        )
+        .order_by().values('equipment_id').annotate(minutes=Count('pk'))
+        .values_list('equipment_id', 'minutes')
+    ):
+        active_minutes[equipment_id] = active_minutes.get(equipment_id, 0) + minutes
+
+    def maintenance_value(pk, name):
+        return maintenance.get(pk, {}).get(name)
+
+    last_service = []
+    for pk, _status, _type, _hours, _fuel, commissioning, _year, last_date, _next in rows:
+        end = maintenance_value(pk, 'last_end')
+        days = [day for day in (end and timezone.localdate(end), last_date) if day]
+        last_service.append(_ordinal(max(days) if days else commissioning))
+
+    features = {
+        'breakdown': np.array([row[1] == Equipment.EquipmentStatus.BREAKDOWN for row in rows], dtype=bool),
+        'equipment_type': np.array([row[2] for row in rows], dtype=object),
+        'hours': np.array([_number(row[3]) for row in rows], dtype=float),
+        'fuel_rate': np.array([_number(row[4]) for row in rows], dtype=float),
+        'commissioning': np.array([_ordinal(row[5]) for row in rows], dtype=float),
+        'year_of_manufacture': np.array([_number(row[6]) for row in rows], dtype=float),
+        'next_planned': np.array([_ordinal(row[8]) for row in rows], dtype=float),
+        'last_service': np.array(last_service, dtype=float),
+        'last_service_hours': np.array([_number(maintenance_value(pk, 'last_hours')) for pk in ids], dtype=float),
+        'corrective': _column(ids, {pk: row['corrective'] for pk, row in maintenance.items()}),
+        'incidents': _column(ids, incidents),
+        'active_minutes': _column(ids, active_minutes),
+    }
+    return ids, features
+
+
+def score_features(features, today, interval_hours, interval_days):
+    """
+    Risque de panne et prochain entretien pour toute la matrice, en une
+    passe vectorisée. Retourne {variable: tableau}.
+    """
+    today_ordinal = float(today.toordinal())
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hours = features['hours']
+        hours_since = np.where(
+            np.isnan(features['last_service_hours']), hours, hours - features['last_service_hours'],
+        ).clip(min=0)
+        days_since = (today_ordinal - features['last_service']).clip(min=0)
+
+        age_days = today_ordinal - features['commissioning']
+        age_years = np.where(
+            np.isnan(age_days), today.year - features['year_of_manufacture'], age_days / 365.25,
+        )
+        age_years = np.nan_to_num(age_years, nan=0.0).clip(0, 30)
+
+        utilization = (features['active_minutes'] / (UTILIZATION_DAYS * 24 * 60)).clip(0, 1)
+
+        overdue = np.fmax(hours_since / interval_hours, days_since / interval_days)
+        overdue = np.nan_to_num(overdue, nan=0.0).clip(0, 3)
+
+        # Surconsommation par rapport à la médiane du type d'équipement
+        fuel_rate = features['fuel_rate']
+        type_median = np.full(len(fuel_rate), np.nan)
+        for equipment_type in set(features['equipment_type']):
+            mask = features['equipment_type'] == equipment_type
+            if np.any(~np.isnan(fuel_rate[mask])):
+                type_median[mask] = np.nanmedian(fuel_rate[mask])
+        fuel_excess = np.nan_to_num(fuel_rate / type_median - 1, nan=0.0, posinf=0.0).clip(0, 2)
+
+        z = (
+            COEFFICIENTS['bias']
+            + COEFFICIENTS['overdue'] * overdue
+            + COEFFICIENTS['incidents'] * features['incidents']
+            + COEFFICIENTS['corrective'] * features['corrective']
+            + COEFFICIENTS['age'] * age_years
+            + COEFFICIENTS['utilization'] * utilization
+            + COEFFICIENTS['fuel'] * fuel_excess
+        )
+        risk = np.where(features['breakdown'], 1.0, 1 / (1 + np.exp(-z)))
+
+        # Prochain entretien: échéance calendaire, en heures au rythme
+        # observé (heures moteur ~ temps en activité), ou date planifiée
+        by_calendar = interval_days - days_since
+        daily_hours = utilization * 24
+        by_hours = np.where(daily_hours > 0, (interval_hours - hours_since) / daily_hours, np.nan)
+        by_planned = features['next_planned'] - today_ordinal
+        days_to_service = np.fmin(np.fmin(by_calendar, by_hours), by_planned).clip(min=0)
+
+    return {
+        'failure_risk': risk,
+        'risk_index': np.digitize(risk, RISK_THRESHOLDS),
+        'days_to_service': days_to_service,
+        'hours_since_service': hours_since,
+        'days_since_service': days_since,
+        'utilization': utilization,
+        'incidents': features['incidents'],
+        'corrective': features['corrective'],
+    }
+
+
+def _optional(value, cast):
+    return None if np.isnan(value) else cast(value)
+
+
+def score_fleet(now=None):
+    """
+    Recalculer et enregistrer les scores de toute la flotte en service.
+    Retourne le nombre d'équipements notés.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    ids, features = fleet_features(now)
+    scores = score_features(
+        features, today,
+        float(getattr(settings, 'EQUIPMENT_SERVICE_INTERVAL_HOURS', 250)),
+        float(getattr(settings, 'EQUIPMENT_SERVICE_INTERVAL_DAYS', 90)),
+    )
+
+    objects = []
+    for index, equipment_id in enumerate(ids):
+        days_to_service = scores['days_to_service'][index]
+        objects.append(EquipmentHealthScore(
+            equipment_id=equipment_id,
+            failure_risk=round(float(scores['failure_risk'][index]), 4),
+            risk_level=RISK_LEVELS[scores['risk_index'][index]],
+            next_service_date=_optional(days_to_service, lambda days: today + timedelta(days=int(days))),
+            hours_since_service=_optional(scores['hours_since_service'][index], lambda hours: round(float(hours), 2)),
+            days_since_service=_optional(scores['days_since_service'][index], int),
+            utilization=round(float(scores['utilization'][index]), 4),
+            incidents_30d=int(scores['incidents'][index]),
+            corrective_maintenances_365d=int(scores['corrective'][index]),
+            computed_at=now,
+        ))
+
+    with transaction.atomic():
+        # Équipements retirés du service: plus de score
+        EquipmentHealthScore.objects.filter(equipment__status=Equipment.EquipmentStatus.RETIRED).delete()
+        EquipmentHealthScore.objects.bulk_create(
+            objects, batch_size=1000,
+            update_conflicts=True, unique_fields=['equipment'], update_fields=SCORE_FIELDS,
+        )
+    return len(objects)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from equipment.tracking import compact_tracking, minute_cutoff, raw_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Agrège l'historique GPS plus ancien que la fenêtre brute en paliers "
+        "minute et heure, purge les positions brutes correspondantes et les "
+        "paliers minute expirés. Planifié par run_equipment_jobs (processus clock "
+        "du Procfile)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Lignes supprimées par requête (défaut: TRACKING_PRUNE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"Positions brutes antérieures au {raw_cutoff():%d/%m/%Y %H:%M}, "
+            f"paliers minute antérieurs au {minute_cutoff():%d/%m/%Y %H:%M}"
+        )
+        compacted, written, pruned = compact_tracking(
+            batch_size=options['batch_size'],
+            progress=lambda equipment_id, total: self.stdout.write(
+                f"  équipement #{equipment_id}: {total} position(s) compactée(s) au total"
+            ),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{compacted} position(s) compactée(s), {written} palier(s) écrit(s), "
+            f"{pruned} palier(s) minute purgé(s)."
+        ))
@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from equipment.health import score_fleet
+from equipment.tracking import compact_tracking
+
+
+class Command(BaseCommand):
+    help = (
+        "Planificateur des tâches périodiques des équipements: recalcul des "
+        "scores de maintenance prédictive (EQUIPMENT_SCORE_INTERVAL_HOURS) et "
+        "compaction de l'historique GPS (TRACKING_COMPACT_INTERVAL_HOURS)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exécuter toutes les tâches une fois puis s'arrêter"
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=60.0,
+            help="Attente (secondes) entre deux vérifications des échéances (défaut: 60)"
+        )
+
+    def jobs(self):
+        """(nom, intervalle en secondes, tâche)"""
+        return [
+            ('scores', float(getattr(settings, 'EQUIPMENT_SCORE_INTERVAL_HOURS', 24)) * 3600, self.score),
+            ('compaction', float(getattr(settings, 'TRACKING_COMPACT_INTERVAL_HOURS', 24)) * 3600, self.compact),
+        ]
+
+    def score(self):
+        scored = score_fleet()
+        self.stdout.write(self.style.SUCCESS(f"{scored} équipement(s) noté(s)."))
+
+    def compact(self):
+        compacted, written, pruned = compact_tracking()
+        self.stdout.write(self.style.SUCCESS(
+            f"{compacted} position(s) compactée(s), {written} palier(s) écrit(s), "
+            f"{pruned} palier(s) minute purgé(s)."
+        ))
+
+    def handle(self, *args, **options):
+        jobs = self.jobs()
+        last_run = {}
+        while True:
+            for name, interval, job in jobs:
+                if name in last_run and time.monotonic() - last_run[name] < interval:
+                    continue
+                try:
+                    job()
+                except Exception as exc:
+                    self.stderr.write(self.style.ERROR(f"Tâche {name} en échec: {exc}"))
+                last_run[name] = time.monotonic()
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from equipment.health import score_fleet
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule le risque de panne et la date estimée du prochain entretien "
+        "de tous les équipements en service (EquipmentHealthScore). "
+        "Planifié par run_equipment_jobs (processus clock du Procfile)."
+    )
+
+    def handle(self, *args, **options):
+        scored = score_fleet()
+        self.stdout.write(self.style.SUCCESS(f"{scored} équipement(s) noté(s)."))
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0004_equipment_current_speed_equipment_last_latitude_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='equipmenttracking',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
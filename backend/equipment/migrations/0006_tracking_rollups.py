@@ -0,0 +1,54 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0005_tracking_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentTrackingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('MINUTE', 'Minute'), ('HOUR', 'Heure')], max_length=10)),
+                ('bucket_start', models.DateTimeField(verbose_name="Début de l'intervalle")),
+                ('first_at', models.DateTimeField()),
+                ('first_latitude', models.DecimalField(decimal_places=7, max_digits=10)),
+                ('first_longitude', models.DecimalField(decimal_places=7, max_digits=10)),
+                ('last_at', models.DateTimeField()),
+                ('last_latitude', models.DecimalField(decimal_places=7, max_digits=10)),
+                ('last_longitude', models.DecimalField(decimal_places=7, max_digits=10)),
+                ('max_speed', models.FloatField(default=0.0)),
+                ('avg_speed', models.FloatField(default=0.0)),
+                ('distance_km', models.FloatField(default=0.0, verbose_name='Distance parcourue (km)')),
+                ('fix_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Trajectoire agrégée',
+                'verbose_name_plural': 'Trajectoires agrégées',
+                'ordering': ['equipment', 'resolution', 'bucket_start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='equipmenttracking',
+            index=models.Index(fields=['equipment', 'timestamp'], name='equipment_e_equipme_8fc278_idx'),
+        ),
+        migrations.AddField(
+            model_name='equipmenttrackingrollup',
+            name='equipment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tracking_rollups', to='equipment.equipment'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmenttrackingrollup',
+            index=models.Index(fields=['resolution', 'bucket_start'], name='equipment_e_resolut_6fc186_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='equipmenttrackingrollup',
+            unique_together={('equipment', 'resolution', 'bucket_start')},
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0006_tracking_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenancerecord',
+            index=models.Index(fields=['equipment', 'status', 'end_date'], name='equipment_m_equipme_3d3812_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0007_maintenance_last_completed_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentHealthScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('failure_risk', models.FloatField(default=0.0, verbose_name='Risque de panne (0-1)')),
+                ('risk_level', models.CharField(choices=[('LOW', 'Faible'), ('MEDIUM', 'Modéré'), ('HIGH', 'Élevé'), ('CRITICAL', 'Critique')], default='LOW', max_length=10, verbose_name='Niveau de risque')),
+                ('next_service_date', models.DateField(blank=True, null=True, verbose_name='Prochain entretien estimé')),
+                ('hours_since_service', models.FloatField(blank=True, null=True, verbose_name="Heures depuis l'entretien")),
+                ('days_since_service', models.PositiveIntegerField(blank=True, null=True, verbose_name="Jours depuis l'entretien")),
+                ('utilization', models.FloatField(default=0.0, verbose_name="Taux d'utilisation (30 j)")),
+                ('incidents_30d', models.PositiveIntegerField(default=0, verbose_name='Incidents (30 j)')),
+                ('corrective_maintenances_365d', models.PositiveIntegerField(default=0, verbose_name='Maintenances correctives (365 j)')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculé le')),
+                ('equipment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='health_score', to='equipment.equipment')),
+            ],
+            options={
+                'verbose_name': 'Score de santé équipement',
+                'verbose_name_plural': 'Scores de santé équipements',
+                'ordering': ['-failure_risk'],
+                'indexes': [models.Index(fields=['risk_level', 'failure_risk'], name='equipment_e_risk_le_001c6c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mining_sites', '0004_miningsite_commissioning_date'),
+        ('operations', '0003_alter_operation_quantity_extracted_and_more'),
+        ('equipment', '0008_equipment_health_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentGeofenceState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inside_concession', models.BooleanField(blank=True, null=True, verbose_name='Dans la concession')),
+                ('last_fix_at', models.DateTimeField(verbose_name='Dernier relevé évalué')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('equipment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='geofence_state', to='equipment.equipment')),
+                ('work_zone', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='operations.workzone', verbose_name='Zone de chantier')),
+            ],
+            options={
+                'verbose_name': 'État géofence équipement',
+                'verbose_name_plural': 'États géofence équipements',
+            },
+        ),
+        migrations.CreateModel(
+            name='GeofenceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('SITE_ENTER', 'Entrée dans la concession'), ('SITE_EXIT', 'Sortie de la concession'), ('ZONE_ENTER', 'Entrée dans une zone'), ('ZONE_EXIT', "Sortie d'une zone")], max_length=20, verbose_name='Événement')),
+                ('latitude', models.DecimalField(decimal_places=7, max_digits=10)),
+                ('longitude', models.DecimalField(decimal_places=7, max_digits=10)),
+                ('timestamp', models.DateTimeField(verbose_name='Horodatage du relevé')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geofence_events', to='equipment.equipment')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geofence_events', to='mining_sites.miningsite', verbose_name='Site')),
+                ('work_zone', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='geofence_events', to='operations.workzone', verbose_name='Zone de chantier')),
+            ],
+            options={
+                'verbose_name': 'Événement géofence',
+                'verbose_name_plural': 'Événements géofence',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['equipment', 'timestamp'], name='equipment_g_equipme_86f68e_idx')],
+            },
+        ),
+    ]
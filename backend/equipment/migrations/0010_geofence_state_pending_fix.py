@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-19 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_geofence_state_events'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='equipmentgeofencestate',
+            name='last_fix_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Dernier relevé évalué'),
+        ),
+    ]
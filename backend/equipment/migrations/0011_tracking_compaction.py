@@ -0,0 +1,39 @@
+# Generated by Django 4.2.27 on 2026-10-19 19:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import timedelta
+from django.db.models import Max
+
+
+def seed_watermarks(apps, schema_editor):
+    """Avancement des équipements déjà compactés: fin du dernier palier heure"""
+    Rollup = apps.get_model('equipment', 'EquipmentTrackingRollup')
+    Compaction = apps.get_model('equipment', 'EquipmentTrackingCompaction')
+    Compaction.objects.bulk_create([
+        Compaction(equipment_id=row['equipment_id'], compacted_until=row['last'] + timedelta(hours=1))
+        for row in Rollup.objects.filter(resolution='HOUR').order_by()
+        .values('equipment_id').annotate(last=Max('bucket_start'))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0010_geofence_state_pending_fix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentTrackingCompaction',
+            fields=[
+                ('equipment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tracking_compaction', serialize=False, to='equipment.equipment')),
+                ('compacted_until', models.DateTimeField(verbose_name="Compacté jusqu'au")),
+            ],
+            options={
+                'verbose_name': 'Compaction du tracking',
+                'verbose_name_plural': 'Compactions du tracking',
+            },
+        ),
+        migrations.RunPython(seed_watermarks, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from nexus_backend.validators import validate_maintenance_dates
 
@@ -260,6 +261,10 @@ class MaintenanceRecord(models.Model):
         verbose_name = "Historique de maintenance"
         verbose_name_plural = "Historique des maintenances"
         ordering = ['-scheduled_date']
+        indexes = [
+            # Dernière maintenance terminée par équipement (with_last_maintenance)
+            models.Index(fields=['equipment', 'status', 'end_date']),
+        ]
     
     def clean(self):
         """Validations métier avant sauvegarde"""
@@ -280,6 +285,32 @@ class MaintenanceRecord(models.Model):
         return f"{self.maintenance_code} - {self.equipment.equipment_code}"
 
 
+# Champs de MaintenanceRecord annotés par with_last_maintenance()
+LAST_MAINTENANCE_FIELDS = {
+    'last_completed_maintenance_id': 'pk',
+    'last_completed_maintenance_code': 'maintenance_code',
+    'last_completed_maintenance_type': 'maintenance_type',
+    'last_completed_maintenance_end': 'end_date',
+}
+
+
+def with_last_maintenance(queryset):
+    """
+    Annoter des équipements avec leur dernière maintenance terminée
+    (identifiant, code, type, date de fin) par sous-requêtes corrélées:
+    le nombre de requêtes ne dépend plus du nombre d'équipements.
+    """
+    last = (
+        MaintenanceRecord.objects
+        .filter(equipment=models.OuterRef('pk'), status=MaintenanceRecord.MaintenanceStatus.COMPLETED)
+        .order_by(models.F('end_date').desc(nulls_last=True), '-pk')
+    )
+    return queryset.annotate(**{
+        name: models.Subquery(last.values(field)[:1])
+        for name, field in LAST_MAINTENANCE_FIELDS.items()
+    })
+
+
 class EquipmentTracking(models.Model):
     """
     Historique des positions GPS pour le tracking en temps réel.
@@ -292,12 +323,200 @@ class EquipmentTracking(models.Model):
     latitude = models.DecimalField(max_digits=10, decimal_places=7)
     longitude = models.DecimalField(max_digits=10, decimal_places=7)
     speed = models.FloatField(default=0.0)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Horodatage du relevé GPS (fourni par le boîtier en saisie par lot)
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         verbose_name = "Tracking Équipement"
         verbose_name_plural = "Tracking Équipements"
         ordering = ['-timestamp']
+        indexes = [
+            # Trajectoires d'un équipement et compaction (compact_tracking)
+            models.Index(fields=['equipment', 'timestamp']),
+        ]
 
     def __str__(self):
         return f"{self.equipment.equipment_code} at {self.timestamp}"
+
+
+class EquipmentTrackingRollup(models.Model):
+    """
+    Trajectoire agrégée par minute ou par heure (paliers de rétention).
+    Produite par la commande compact_tracking à partir des positions
+    brutes plus anciennes que la fenêtre de rétention.
+    """
+
+    class Resolution(models.TextChoices):
+        MINUTE = 'MINUTE', 'Minute'
+        HOUR = 'HOUR', 'Heure'
+
+    equipment = models.ForeignKey(
+        Equipment, on_delete=models.CASCADE,
+        related_name='tracking_rollups'
+    )
+    resolution = models.CharField(max_length=10, choices=Resolution.choices)
+    bucket_start = models.DateTimeField(verbose_name="Début de l'intervalle")
+
+    first_at = models.DateTimeField()
+    first_latitude = models.DecimalField(max_digits=10, decimal_places=7)
+    first_longitude = models.DecimalField(max_digits=10, decimal_places=7)
+    last_at = models.DateTimeField()
+    last_latitude = models.DecimalField(max_digits=10, decimal_places=7)
+    last_longitude = models.DecimalField(max_digits=10, decimal_places=7)
+
+    max_speed = models.FloatField(default=0.0)
+    avg_speed = models.FloatField(default=0.0)
+    distance_km = models.FloatField(default=0.0, verbose_name="Distance parcourue (km)")
+    fix_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Trajectoire agrégée"
+        verbose_name_plural = "Trajectoires agrégées"
+        ordering = ['equipment', 'resolution', 'bucket_start']
+        unique_together = ['equipment', 'resolution', 'bucket_start']
+        indexes = [models.Index(fields=['resolution', 'bucket_start'])]
+
+    def __str__(self):
+        return f"{self.equipment.equipment_code} {self.resolution} {self.bucket_start}"
+
+
+class EquipmentTrackingCompaction(models.Model):
+    """
+    Avancement de la compaction de l'historique GPS d'un équipement: les
+    positions antérieures à `compacted_until` sont dans les paliers agrégés,
+    les suivantes encore brutes.
+    """
+    equipment = models.OneToOneField(
+        Equipment, on_delete=models.CASCADE,
+        primary_key=True, related_name='tracking_compaction'
+    )
+    compacted_until = models.DateTimeField(verbose_name="Compacté jusqu'au")
+
+    class Meta:
+        verbose_name = "Compaction du tracking"
+        verbose_name_plural = "Compactions du tracking"
+
+    def __str__(self):
+        return f"{self.equipment_id} compacté jusqu'au {self.compacted_until}"
+
+
+class EquipmentHealthScore(models.Model):
+    """
+    Score de maintenance prédictive d'un équipement (un par équipement).
+    Recalculé pour toute la flotte par la commande score_equipment_health
+    (planifiée par run_equipment_jobs); les endpoints lisent ces scores sans
+    les recalculer.
+    """
+
+    class RiskLevel(models.TextChoices):
+        LOW = 'LOW', 'Faible'
+        MEDIUM = 'MEDIUM', 'Modéré'
+        HIGH = 'HIGH', 'Élevé'
+        CRITICAL = 'CRITICAL', 'Critique'
+
+    equipment = models.OneToOneField(
+        Equipment, on_delete=models.CASCADE,
+        related_name='health_score'
+    )
+    failure_risk = models.FloatField(default=0.0, verbose_name="Risque de panne (0-1)")
+    risk_level = models.CharField(
+        max_length=10, choices=RiskLevel.choices, default=RiskLevel.LOW,
+        verbose_name="Niveau de risque"
+    )
+    next_service_date = models.DateField(
+        null=True, blank=True,
+        verbose_name="Prochain entretien estimé"
+    )
+
+    # Variables du modèle au moment du calcul
+    hours_since_service = models.FloatField(null=True, blank=True, verbose_name="Heures depuis l'entretien")
+    days_since_service = models.PositiveIntegerField(null=True, blank=True, verbose_name="Jours depuis l'entretien")
+    utilization = models.FloatField(default=0.0, verbose_name="Taux d'utilisation (30 j)")
+    incidents_30d = models.PositiveIntegerField(default=0, verbose_name="Incidents (30 j)")
+    corrective_maintenances_365d = models.PositiveIntegerField(default=0, verbose_name="Maintenances correctives (365 j)")
+
+    computed_at = models.DateTimeField(verbose_name="Calculé le")
+
+    class Meta:
+        verbose_name = "Score de santé équipement"
+        verbose_name_plural = "Scores de santé équipements"
+        ordering = ['-failure_risk']
+        indexes = [models.Index(fields=['risk_level', 'failure_risk'])]
+
+    def __str__(self):
+        return f"{self.equipment.equipment_code} {self.failure_risk:.2f} ({self.risk_level})"
+
+
+# Niveaux de risque signalés (needing_maintenance, intelligence)
+HIGH_RISK_LEVELS = (EquipmentHealthScore.RiskLevel.HIGH, EquipmentHealthScore.RiskLevel.CRITICAL)
+
+
+class EquipmentGeofenceState(models.Model):
+    """
+    Dernier état géographique connu d'un équipement (service de géofences):
+    dans ou hors de la concession de son site, zone de chantier courante.
+    """
+    equipment = models.OneToOneField(
+        Equipment, on_delete=models.CASCADE,
+        related_name='geofence_state'
+    )
+    inside_concession = models.BooleanField(
+        null=True, blank=True,
+        verbose_name="Dans la concession"
+    )
+    work_zone = models.ForeignKey(
+        'operations.WorkZone', on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+',
+        verbose_name="Zone de chantier"
+    )
+    # Vide tant qu'aucun relevé n'a été évalué
+    last_fix_at = models.DateTimeField(null=True, blank=True, verbose_name="Dernier relevé évalué")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "État géofence équipement"
+        verbose_name_plural = "États géofence équipements"
+
+    def __str__(self):
+        return f"{self.equipment.equipment_code} concession={self.inside_concession} zone={self.work_zone_id}"
+
+
+class GeofenceEvent(models.Model):
+    """Entrée/sortie d'un équipement (concession ou zone de chantier)"""
+
+    class EventType(models.TextChoices):
+        SITE_ENTER = 'SITE_ENTER', 'Entrée dans la concession'
+        SITE_EXIT = 'SITE_EXIT', 'Sortie de la concession'
+        ZONE_ENTER = 'ZONE_ENTER', 'Entrée dans une zone'
+        ZONE_EXIT = 'ZONE_EXIT', 'Sortie d\'une zone'
+
+    equipment = models.ForeignKey(
+        Equipment, on_delete=models.CASCADE,
+        related_name='geofence_events'
+    )
+    event_type = models.CharField(max_length=20, choices=EventType.choices, verbose_name="Événement")
+    site = models.ForeignKey(
+        'mining_sites.MiningSite', on_delete=models.CASCADE,
+        related_name='geofence_events',
+        verbose_name="Site"
+    )
+    work_zone = models.ForeignKey(
+        'operations.WorkZone', on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='geofence_events',
+        verbose_name="Zone de chantier"
+    )
+    latitude = models.DecimalField(max_digits=10, decimal_places=7)
+    longitude = models.DecimalField(max_digits=10, decimal_places=7)
+    timestamp = models.DateTimeField(verbose_name="Horodatage du relevé")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Événement géofence"
+        verbose_name_plural = "Événements géofence"
+        ordering = ['-timestamp']
+        indexes = [models.Index(fields=['equipment', 'timestamp'])]
+
+    def __str__(self):
+        return f"{self.equipment.equipment_code} {self.event_type} {self.timestamp}"
@@ -0,0 +1,135 @@
+"""
+Géométrie des trajectoires (carte, SIG MG)
+
+Les points d'une trajectoire (tracking.trajectory) sont découpés selon une
+emprise éventuelle, simplifiés par Douglas–Peucker à une tolérance en
+mètres, puis encodés de façon compacte: géométrie GeoJSON
+(LineString / MultiLineString, [lon, lat]) ou polylignes encodées
+(algorithme Google, précision 1e-5).
+
+La simplification travaille sur une projection équirectangulaire locale
+(mètres), suffisante à l'échelle d'un site; les distances de chaque
+segment sont calculées en une opération NumPy.
+"""
+
+import numpy as np
+
+from nexus_backend.geo import EARTH_RADIUS_KM
+
+
+ENCODINGS = ('geojson', 'polyline')
+POLYLINE_PRECISION = 5
+GEOJSON_DECIMALS = 6
+
+
+def parse_bbox(value):
+    """'min_lon,min_lat,max_lon,max_lat' -> tuple de flottants (ValueError sinon)"""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError(value)
+    min_lon, min_lat, max_lon, max_lat = parts
+    if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise ValueError(value)
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def coordinates(points):
+    """Points de trajectoire -> tableau (n, 2) de [lat, lon]"""
+    return np.array([(point['latitude'], point['longitude']) for point in points], dtype=float).reshape(-1, 2)
+
+
+def clip_to_bbox(coords, bbox):
+    """
+    Tronçons consécutifs de points dans l'emprise: liste de tableaux.
+    Un passage hors de l'emprise coupe la trajectoire.
+    """
+    if bbox is None:
+        return [coords] if len(coords) else []
+    min_lon, min_lat, max_lon, max_lat = bbox
+    inside = (
+        (coords[:, 1] >= min_lon) & (coords[:, 1] <= max_lon)
+        & (coords[:, 0] >= min_lat) & (coords[:, 0] <= max_lat)
+    )
+    # Bornes des tronçons: changements de l'état dedans/dehors
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], inside.astype(np.int8), [0]))))
+    return [coords[start:stop] for start, stop in zip(edges[::2], edges[1::2])]
+
+
+def _project(coords):
+    """[lat, lon] -> [x, y] en mètres (équirectangulaire autour du centre)"""
+    radius_m = EARTH_RADIUS_KM * 1000
+    lat = np.radians(coords[:, 0])
+    lon = np.radians(coords[:, 1])
+    return np.column_stack((lon * np.cos(lat.mean()) * radius_m, lat * radius_m))
+
+
+def simplify(coords, tolerance_m):
+    """
+    Douglas–Peucker (itératif) à `tolerance_m` mètres: sous-ensemble des
+    points, extrémités conservées.
+    """
+    count = len(coords)
+    if count < 3 or tolerance_m <= 0:
+        return coords
+    xy = _project(coords)
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        origin = xy[first]
+        segment = xy[last] - origin
+        inner = xy[first + 1:last] - origin
+        length2 = segment @ segment
+        if length2 > 0:
+            # Distance au segment (projection bornée aux extrémités)
+            t = np.clip(inner @ segment / length2, 0.0, 1.0)
+            inner = inner - t[:, None] * segment
+        distances = np.hypot(inner[:, 0], inner[:, 1])
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance_m:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return coords[keep]
+
+
+def encode_polyline(coords, precision=POLYLINE_PRECISION):
+    """Polyligne encodée (algorithme Google) de points [lat, lon]"""
+    if not len(coords):
+        return ''
+    values = np.rint(coords * 10 ** precision).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    # Signe dans le bit de poids faible
+    deltas = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    chunks = []
+    for value in deltas.tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+
+def geojson_geometry(parts):
+    """Géométrie GeoJSON de tronçons [lat, lon] (None sans point)"""
+    lines = [
+        np.round(part[:, ::-1], GEOJSON_DECIMALS).tolist()
+        for part in parts if len(part)
+    ]
+    if not lines:
+        return None
+    if len(lines) == 1:
+        return {'type': 'LineString', 'coordinates': lines[0]}
+    return {'type': 'MultiLineString', 'coordinates': lines}
+
+
+def shape_path(points, bbox=None, tolerance_m=0):
+    """
+    Découper (emprise) puis simplifier une trajectoire.
+    Retourne la liste des tronçons simplifiés (tableaux [lat, lon]).
+    """
+    return [simplify(part, tolerance_m) for part in clip_to_bbox(coordinates(points), bbox)]
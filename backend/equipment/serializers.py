@@ -1,6 +1,9 @@
 from rest_framework import serializers
-from .models import Equipment, MaintenanceRecord, EquipmentTracking
+from .models import (
+    Equipment, EquipmentHealthScore, MaintenanceRecord, EquipmentTracking, GeofenceEvent,
+)
 from django.core.exceptions import ValidationError
+from django.db.models import F
 
 
 class MaintenanceRecordSerializer(serializers.ModelSerializer):
@@ -69,6 +72,33 @@ class EquipmentTrackingSerializer(serializers.ModelSerializer):
         fields = ['id', 'equipment', 'latitude', 'longitude', 'speed', 'timestamp']
 
 
+def last_maintenance(obj):
+    """
+    Dernière maintenance effectuée: annotations de with_last_maintenance(),
+    ou une requête pour un équipement chargé sans elles
+    """
+    if hasattr(obj, 'last_completed_maintenance_id'):
+        if obj.last_completed_maintenance_id is None:
+            return None
+        return {
+            'id': obj.last_completed_maintenance_id,
+            'code': obj.last_completed_maintenance_code,
+            'type': obj.last_completed_maintenance_type,
+            'date': obj.last_completed_maintenance_end,
+        }
+    last = obj.maintenance_records.filter(
+        status='COMPLETED'
+    ).order_by(F('end_date').desc(nulls_last=True), '-pk').first()
+    if last:
+        return {
+            'id': last.id,
+            'code': last.maintenance_code,
+            'type': last.maintenance_type,
+            'date': last.end_date
+        }
+    return None
+
+
 class EquipmentSerializer(serializers.ModelSerializer):
     """Serializer complet pour le modèle Equipment"""
     equipment_type_display = serializers.CharField(
@@ -103,17 +133,7 @@ class EquipmentSerializer(serializers.ModelSerializer):
     
     def get_last_maintenance(self, obj):
         """Retourne la dernière maintenance effectuée"""
-        last = obj.maintenance_records.filter(
-            status='COMPLETED'
-        ).order_by('-end_date').first()
-        if last:
-            return {
-                'id': last.id,
-                'code': last.maintenance_code,
-                'type': last.maintenance_type,
-                'date': last.end_date
-            }
-        return None
+        return last_maintenance(obj)
 
 
 class EquipmentListSerializer(serializers.ModelSerializer):
@@ -122,6 +142,7 @@ class EquipmentListSerializer(serializers.ModelSerializer):
     status_display = serializers.CharField(
         source='get_status_display', read_only=True
     )
+    last_maintenance = serializers.SerializerMethodField()
     
     class Meta:
         model = Equipment
@@ -129,8 +150,48 @@ class EquipmentListSerializer(serializers.ModelSerializer):
             'id', 'equipment_code', 'name', 'equipment_type',
             'status', 'status_display', 'site_name',
             'last_latitude', 'last_longitude', 'current_speed',
-            'next_maintenance_date', 'hours_operated'
+            'next_maintenance_date', 'hours_operated', 'last_maintenance'
+        ]
+    
+    def get_last_maintenance(self, obj):
+        return last_maintenance(obj)
+
+
+class EquipmentHealthScoreSerializer(serializers.ModelSerializer):
+    """Serializer des scores de maintenance prédictive (lecture seule)"""
+    equipment_code = serializers.CharField(source='equipment.equipment_code', read_only=True)
+    equipment_name = serializers.CharField(source='equipment.name', read_only=True)
+    site_name = serializers.CharField(source='equipment.site.name', read_only=True)
+    risk_level_display = serializers.CharField(
+        source='get_risk_level_display', read_only=True
+    )
+    
+    class Meta:
+        model = EquipmentHealthScore
+        fields = [
+            'equipment', 'equipment_code', 'equipment_name', 'site_name',
+            'failure_risk', 'risk_level', 'risk_level_display', 'next_service_date',
+            'hours_since_service', 'days_since_service', 'utilization',
+            'incidents_30d', 'corrective_maintenances_365d', 'computed_at'
         ]
+        read_only_fields = fields
+
+
+class GeofenceEventSerializer(serializers.ModelSerializer):
+    """Serializer des entrées/sorties de géofences (lecture seule)"""
+    event_type_display = serializers.CharField(
+        source='get_event_type_display', read_only=True
+    )
+    work_zone_name = serializers.CharField(source='work_zone.name', read_only=True, default=None)
+    
+    class Meta:
+        model = GeofenceEvent
+        fields = [
+            'id', 'equipment', 'event_type', 'event_type_display',
+            'site', 'work_zone', 'work_zone_name',
+            'latitude', 'longitude', 'timestamp'
+        ]
+        read_only_fields = fields
 
 
 class EquipmentStatusUpdateSerializer(serializers.ModelSerializer):
@@ -138,3 +199,13 @@ class EquipmentStatusUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Equipment
         fields = ['status', 'notes']
+
+
+class TelemetryFixSerializer(serializers.Serializer):
+    """Relevé GPS d'un lot de télémétrie (POST /equipment/telemetry/)"""
+    equipment = serializers.IntegerField()
+    # Flottants des boîtiers GPS, arrondis à 7 décimales à l'écriture
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    speed = serializers.FloatField(min_value=0, default=0.0)
+    timestamp = serializers.DateTimeField(required=False)
@@ -0,0 +1,111 @@
+"""
+Diffusion des positions GPS en temps réel (ws/tracking/)
+
+Chaque saisie de position (update_tracking, telemetry) publie, après le
+commit, un message par site vers le groupe `tracking_site_<id>`. Les
+positions sont filtrées par équipement avant publication:
+
+- au plus une position par intervalle minimal (1 s par défaut);
+- dans cet intervalle dépassé, seulement si l'engin s'est déplacé d'au
+  moins la distance minimale, ou si le dernier envoi est plus ancien que
+  le battement (un engin à l'arrêt reste visible comme actif).
+
+La dernière position publiée de chaque équipement est gardée dans le cache
+partagé (Redis en production), commun à tous les processus.
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+
+from nexus_backend.geo import haversine_km
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'tracking:published:'
+CACHE_TIMEOUT = 24 * 3600
+
+
+def site_group(site_id):
+    return f"tracking_site_{site_id}"
+
+
+def position_payload(equipment_id, latitude, longitude, speed, timestamp):
+    """Position telle qu'envoyée aux clients"""
+    return {
+        'id': equipment_id,
+        'lat': float(latitude),
+        'lon': float(longitude),
+        'speed': None if speed is None else float(speed),
+        'ts': timestamp.isoformat(),
+    }
+
+
+def _is_due(previous, fix):
+    """La position doit-elle être publiée, vu la dernière publiée (ts, lat, lon)?"""
+    if previous is None:
+        return True
+    published_at, latitude, longitude = previous
+    elapsed = fix.timestamp.timestamp() - published_at
+    if elapsed < getattr(settings, 'TRACKING_STREAM_MIN_INTERVAL_SECONDS', 1):
+        # Relevé trop rapproché, ou plus ancien que le dernier publié
+        return False
+    if elapsed >= getattr(settings, 'TRACKING_STREAM_HEARTBEAT_SECONDS', 30):
+        return True
+    moved_m = haversine_km(latitude, longitude, float(fix.latitude), float(fix.longitude)) * 1000
+    return moved_m >= getattr(settings, 'TRACKING_STREAM_MIN_DISTANCE_M', 5)
+
+
+def publish_positions(fixes, site_ids):
+    """
+    Publier les dernières positions d'équipements (EquipmentTracking, un
+    relevé au plus par équipement), regroupées en un message par site.
+
+    `site_ids`: {equipment_id: site_id}. Retourne le nombre de positions
+    publiées; une diffusion impossible ne fait jamais échouer la saisie.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return 0
+
+    fixes = [fix for fix in fixes if site_ids.get(fix.equipment_id)]
+    keys = {fix.equipment_id: f"{CACHE_PREFIX}{fix.equipment_id}" for fix in fixes}
+    try:
+        published = cache.get_many(list(keys.values()))
+    except Exception:
+        logger.warning("Cache des positions publiées indisponible", exc_info=True)
+        published = {}
+
+    frames = {}
+    remember = {}
+    for fix in fixes:
+        key = keys[fix.equipment_id]
+        if not _is_due(published.get(key), fix):
+            continue
+        remember[key] = (fix.timestamp.timestamp(), float(fix.latitude), float(fix.longitude))
+        frames.setdefault(site_ids[fix.equipment_id], []).append(position_payload(
+            fix.equipment_id, fix.latitude, fix.longitude, fix.speed, fix.timestamp,
+        ))
+
+    if not frames:
+        return 0
+    try:
+        cache.set_many(remember, timeout=CACHE_TIMEOUT)
+    except Exception:
+        logger.warning("Cache des positions publiées indisponible", exc_info=True)
+
+    count = 0
+    for site_id, positions in frames.items():
+        try:
+            async_to_sync(channel_layer.group_send)(
+                site_group(site_id),
+                {'type': 'tracking_positions', 'site_id': site_id, 'positions': positions}
+            )
+            count += len(positions)
+        except Exception:
+            logger.warning("Diffusion des positions du site #%s impossible", site_id, exc_info=True)
+    return count
@@ -0,0 +1,130 @@
+"""
+Télémétrie GPS des équipements par lots
+
+Un lot contient des relevés de nombreux équipements, éventuellement dans
+le désordre. Les relevés valides sont insérés en une fois (bulk_create)
+dans EquipmentTracking; la dernière position connue de chaque équipement
+(last_latitude, last_longitude, current_speed, last_position_update) est
+mise à jour par un seul UPDATE ... CASE, gardé par l'horodatage: un relevé
+plus ancien que la position enregistrée n'écrase jamais celle-ci, même
+entre deux lots concurrents. Après le commit, la dernière position de
+chaque équipement est diffusée sur ws/tracking/ (streaming). Les relevés
+sont aussi contrôlés contre les géofences des sites (geofence).
+"""
+
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, DecimalField, FloatField, Q, Value, When
+from django.utils import timezone
+
+from .models import Equipment, EquipmentTracking
+from .geofence import evaluate_fixes
+from .serializers import TelemetryFixSerializer
+from .streaming import publish_positions
+
+
+COORDINATE_STEP = Decimal('0.0000001')
+# Avance d'horloge tolérée pour un boîtier
+MAX_FUTURE_SKEW = timedelta(minutes=5)
+UPDATE_BATCH_SIZE = 500
+
+
+def coordinate(value):
+    """Flottant GPS -> Decimal à 7 décimales (champs latitude/longitude)"""
+    return Decimal(str(value)).quantize(COORDINATE_STEP, rounding=ROUND_HALF_UP)
+
+
+def latest_fixes(fixes):
+    """Relevé le plus récent de chaque équipement: {equipment_id: relevé}"""
+    latest = {}
+    for fix in fixes:
+        current = latest.get(fix.equipment_id)
+        if current is None or fix.timestamp > current.timestamp:
+            latest[fix.equipment_id] = fix
+    return latest
+
+
+def update_last_positions(latest):
+    """
+    Dernière position des équipements en un UPDATE par tranche, gardé par
+    l'horodatage. Retourne le nombre d'équipements mis à jour.
+    """
+    updated = 0
+    items = sorted(latest.items())
+    for start in range(0, len(items), UPDATE_BATCH_SIZE):
+        chunk = items[start:start + UPDATE_BATCH_SIZE]
+
+        def case(attribute, output_field):
+            return Case(
+                *[When(pk=pk, then=Value(getattr(fix, attribute))) for pk, fix in chunk],
+                output_field=output_field,
+            )
+
+        timestamps = case('timestamp', DateTimeField())
+        updated += Equipment.objects.filter(
+            Q(last_position_update__isnull=True) | Q(last_position_update__lt=timestamps),
+            pk__in=[pk for pk, _fix in chunk],
+        ).update(
+            last_latitude=case('latitude', DecimalField(max_digits=10, decimal_places=7)),
+            last_longitude=case('longitude', DecimalField(max_digits=10, decimal_places=7)),
+            current_speed=case('speed', FloatField()),
+            last_position_update=timestamps,
+        )
+    return updated
+
+
+def ingest_fixes(rows, equipment_queryset):
+    """
+    Valider et enregistrer un lot de relevés.
+
+    `equipment_queryset`: équipements que l'appelant peut mettre à jour
+    (périmètre de sites déjà appliqué). Retourne
+    (relevés insérés, équipements mis à jour, erreurs [{'index', 'errors'}]).
+    """
+    now = timezone.now()
+    errors = []
+    valid = []
+    for index, row in enumerate(rows):
+        serializer = TelemetryFixSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({'index': index, 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        timestamp = data.get('timestamp') or now
+        if timestamp > now + MAX_FUTURE_SKEW:
+            errors.append({'index': index, 'errors': {'timestamp': ["Horodatage dans le futur."]}})
+            continue
+        valid.append((index, data, timestamp))
+
+    # Équipements du lot visibles par l'appelant: une requête
+    allowed = dict(
+        equipment_queryset.filter(pk__in={data['equipment'] for _i, data, _t in valid})
+        .values_list('pk', 'site_id')
+    )
+
+    fixes = []
+    for index, data, timestamp in valid:
+        if data['equipment'] not in allowed:
+            errors.append({'index': index, 'errors': {'equipment': ["Équipement introuvable ou hors de vos sites."]}})
+            continue
+        fixes.append(EquipmentTracking(
+            equipment_id=data['equipment'],
+            latitude=coordinate(data['latitude']),
+            longitude=coordinate(data['longitude']),
+            speed=data['speed'],
+            timestamp=timestamp,
+        ))
+
+    updated = 0
+    if fixes:
+        with transaction.atomic():
+            EquipmentTracking.objects.bulk_create(fixes, batch_size=1000)
+            latest = latest_fixes(fixes)
+            updated = update_last_positions(latest)
+            evaluate_fixes(fixes, allowed)
+            transaction.on_commit(lambda: publish_positions(latest.values(), allowed))
+
+    errors.sort(key=lambda error: error['index'])
+    return len(fixes), updated, errors
@@ -1,3 +1,84 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from mining_sites.models import MiningSite
+from nexus_backend.geo import haversine_km
+
+from .models import Equipment, EquipmentTracking, EquipmentTrackingCompaction
+from .tracking import compact_tracking, raw_cutoff, summarize, trajectory
+
+
+NOW = datetime(2026, 1, 10, 12, 0, tzinfo=dt_timezone.utc)
+
+
+@override_settings(TRACKING_RAW_RETENTION_DAYS=7, TRACKING_MINUTE_RETENTION_DAYS=90)
+class TrajectoryTierTests(TestCase):
+    """Trajectoires raccordées entre paliers agrégés et positions brutes"""
+
+    def setUp(self):
+        site = MiningSite.objects.create(name="Site Test", code="TRK-1", location="Test")
+        self.equipment = Equipment.objects.create(
+            equipment_code="TRK-001", name="Camion", equipment_type="TRUCK", site=site,
+        )
+        # Une position toutes les 10 minutes sur les 10 derniers jours
+        self.start = NOW - timedelta(days=10)
+        self.timestamps = [self.start + timedelta(minutes=10 * index) for index in range(10 * 24 * 6)]
+        EquipmentTracking.objects.bulk_create([
+            EquipmentTracking(
+                equipment=self.equipment, timestamp=moment, speed=10.0,
+                latitude=9.5 + index * 1e-4, longitude=-13.0,
+            )
+            for index, moment in enumerate(self.timestamps)
+        ])
+
+    def assert_complete(self, points):
+        self.assertEqual([point['timestamp'] for point in points], self.timestamps)
+
+    def test_uncompacted_history_is_read_raw(self):
+        tier, points = trajectory(self.equipment.pk, self.start, NOW, resolution_seconds=0, now=NOW)
+        self.assertEqual(tier, 'raw')
+        self.assert_complete(points)
+
+    def test_minute_rollups_stitch_to_raw_fixes(self):
+        compact_tracking(now=NOW)
+        watermark = EquipmentTrackingCompaction.objects.get(equipment=self.equipment).compacted_until
+        self.assertEqual(watermark, raw_cutoff(NOW))
+
+        tier, points = trajectory(self.equipment.pk, self.start, NOW, resolution_seconds=0, now=NOW)
+        self.assert_complete(points)
+        self.assertEqual({point['tier'] for point in points if point['timestamp'] < watermark}, {'MINUTE'})
+        self.assertEqual({point['tier'] for point in points if point['timestamp'] >= watermark}, {'raw'})
+
+    def test_lagging_compaction_leaves_no_gap(self):
+        # Dernière compaction deux jours plus tôt: les positions entre son
+        # avancement et la fenêtre brute courante sont encore brutes
+        compact_tracking(now=NOW - timedelta(days=2))
+        _, points = trajectory(self.equipment.pk, self.start, NOW, resolution_seconds=0, now=NOW)
+        self.assert_complete(points)
+
+    def test_hour_tier(self):
+        compact_tracking(now=NOW)
+        tier, points = trajectory(self.equipment.pk, self.start, NOW, resolution_seconds=3600, now=NOW)
+        self.assertEqual(tier, 'HOUR')
+        self.assertEqual(
+            [point['timestamp'] for point in points],
+            [self.start + timedelta(hours=hours) for hours in range(10 * 24)],
+        )
+
+
+class SummarizeTests(TestCase):
+
+    def test_segment_crossing_buckets_is_counted(self):
+        fixes = [
+            {'timestamp': NOW + timedelta(seconds=seconds), 'latitude': 9.5 + index * 1e-3,
+             'longitude': -13.0, 'speed': 5.0}
+            for index, seconds in enumerate((10, 50, 70, 130))
+        ]
+        buckets = summarize(fixes, 60)
+        self.assertEqual(len(buckets), 3)
+        total = sum(
+            haversine_km(a['latitude'], a['longitude'], b['latitude'], b['longitude'])
+            for a, b in zip(fixes, fixes[1:])
+        )
+        self.assertAlmostEqual(sum(bucket['distance_km'] for bucket in buckets.values()), total)
@@ -0,0 +1,359 @@
+"""
+Historique GPS: paliers de rétention et trajectoires
+
+- positions brutes (EquipmentTracking) conservées TRACKING_RAW_RETENTION_DAYS
+- au-delà, agrégées par minute et par heure (EquipmentTrackingRollup):
+  première/dernière position, vitesse max/moyenne, distance parcourue
+- paliers minute conservés TRACKING_MINUTE_RETENTION_DAYS, paliers heure
+  sans limite
+
+La compaction (commande compact_tracking) travaille par équipement et par
+tranche d'un jour alignée sur l'heure: agrégats, purge des positions
+brutes et avancement (EquipmentTrackingCompaction) de la tranche dans une
+même transaction. Une position arrivée en retard dans une tranche déjà
+compactée est fusionnée à l'agrégat existant à la compaction suivante.
+Elle est planifiée par run_equipment_jobs (processus clock du Procfile).
+
+trajectory() lit les paliers agrégés avant l'avancement de la compaction
+de l'équipement et les positions brutes après, choisit le palier le plus
+grossier compatible avec la résolution demandée, complète avec le palier
+disponible là où le palier choisi n'existe pas (encore ou plus), puis
+ramène les points à un par intervalle de la résolution demandée.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from nexus_backend.geo import haversine_km
+
+from .models import EquipmentTracking, EquipmentTrackingCompaction, EquipmentTrackingRollup
+
+
+# Palier -> durée d'un intervalle (secondes), du plus fin au plus grossier
+TIER_SECONDS = {
+    'raw': 0,
+    EquipmentTrackingRollup.Resolution.MINUTE: 60,
+    EquipmentTrackingRollup.Resolution.HOUR: 3600,
+}
+RAW_FIELDS = ('pk', 'timestamp', 'latitude', 'longitude', 'speed')
+COMPACTION_WINDOW = timedelta(days=1)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def floor_time(moment, seconds):
+    """Début de l'intervalle de `seconds` contenant `moment` (fuseau UTC)"""
+    epoch = int(moment.timestamp())
+    return moment - timedelta(seconds=epoch % seconds, microseconds=moment.microsecond)
+
+
+def raw_cutoff(now=None):
+    """Positions brutes plus anciennes: compactées (aligné sur l'heure)"""
+    now = now or timezone.now()
+    return floor_time(now - timedelta(days=_setting('TRACKING_RAW_RETENTION_DAYS', 7)), 3600)
+
+
+def minute_cutoff(now=None):
+    """Paliers minute plus anciens: purgés (aligné sur l'heure)"""
+    now = now or timezone.now()
+    return floor_time(now - timedelta(days=_setting('TRACKING_MINUTE_RETENTION_DAYS', 90)), 3600)
+
+
+# ── Agrégation ─────────────────────────────────────────────────────────
+
+def summarize(fixes, seconds):
+    """
+    Agréger des positions triées par horodatage en intervalles de `seconds`.
+
+    `fixes`: dicts (timestamp, latitude, longitude, speed). La distance d'un
+    intervalle est la somme des segments entre positions consécutives qui y
+    aboutissent, y compris celui venant de l'intervalle précédent.
+    Retourne {début d'intervalle: agrégat}.
+    """
+    buckets = {}
+    previous = None
+    for fix in fixes:
+        start = floor_time(fix['timestamp'], seconds)
+        bucket = buckets.get(start)
+        if bucket is None:
+            bucket = buckets[start] = {
+                'bucket_start': start,
+                'first_at': fix['timestamp'],
+                'first_latitude': fix['latitude'],
+                'first_longitude': fix['longitude'],
+                'max_speed': fix['speed'],
+                'speed_total': 0.0,
+                'distance_km': 0.0,
+                'fix_count': 0,
+            }
+        if previous is not None:
+            bucket['distance_km'] += haversine_km(
+                previous['latitude'], previous['longitude'], fix['latitude'], fix['longitude'],
+            )
+        bucket['last_at'] = fix['timestamp']
+        bucket['last_latitude'] = fix['latitude']
+        bucket['last_longitude'] = fix['longitude']
+        bucket['max_speed'] = max(bucket['max_speed'], fix['speed'])
+        bucket['speed_total'] += fix['speed']
+        bucket['fix_count'] += 1
+        previous = fix
+
+    for bucket in buckets.values():
+        bucket['avg_speed'] = bucket.pop('speed_total') / bucket['fix_count']
+    return buckets
+
+
+def _merge(rollup, bucket):
+    """Fusionner un agrégat à un palier existant (positions en retard)"""
+    count = rollup.fix_count + bucket['fix_count']
+    rollup.avg_speed = (rollup.avg_speed * rollup.fix_count + bucket['avg_speed'] * bucket['fix_count']) / count
+    rollup.fix_count = count
+    rollup.max_speed = max(rollup.max_speed, bucket['max_speed'])
+    rollup.distance_km += bucket['distance_km']
+    if bucket['first_at'] < rollup.first_at:
+        rollup.first_at = bucket['first_at']
+        rollup.first_latitude, rollup.first_longitude = bucket['first_latitude'], bucket['first_longitude']
+    if bucket['last_at'] > rollup.last_at:
+        rollup.last_at = bucket['last_at']
+        rollup.last_latitude, rollup.last_longitude = bucket['last_latitude'], bucket['last_longitude']
+
+
+def save_rollups(equipment_id, resolution, buckets):
+    """Créer ou fusionner les paliers d'un équipement (une lecture, deux écritures groupées)"""
+    existing = {
+        rollup.bucket_start: rollup
+        for rollup in EquipmentTrackingRollup.objects.filter(
+            equipment_id=equipment_id, resolution=resolution, bucket_start__in=list(buckets),
+        )
+    }
+    created, updated = [], []
+    for start, bucket in buckets.items():
+        rollup = existing.get(start)
+        if rollup is None:
+            created.append(EquipmentTrackingRollup(equipment_id=equipment_id, resolution=resolution, **bucket))
+        else:
+            _merge(rollup, bucket)
+            updated.append(rollup)
+    EquipmentTrackingRollup.objects.bulk_create(created, batch_size=1000)
+    if updated:
+        EquipmentTrackingRollup.objects.bulk_update(updated, [
+            'first_at', 'first_latitude', 'first_longitude',
+            'last_at', 'last_latitude', 'last_longitude',
+            'max_speed', 'avg_speed', 'distance_km', 'fix_count',
+        ], batch_size=500)
+    return len(created) + len(updated)
+
+
+# ── Compaction ─────────────────────────────────────────────────────────
+
+def _delete_in_batches(pks, batch_size):
+    for start in range(0, len(pks), batch_size):
+        EquipmentTracking.objects.filter(pk__in=pks[start:start + batch_size]).delete()
+
+
+def compact_window(equipment_id, window_start, window_end, batch_size):
+    """Agréger puis purger les positions brutes d'une tranche [début, fin)"""
+    with transaction.atomic():
+        fixes = list(
+            EquipmentTracking.objects
+            .filter(equipment_id=equipment_id, timestamp__gte=window_start, timestamp__lt=window_end)
+            .order_by('timestamp', 'pk')
+            .values(*RAW_FIELDS)
+        )
+        if not fixes:
+            return 0, 0
+        rollups = 0
+        for resolution in (EquipmentTrackingRollup.Resolution.MINUTE, EquipmentTrackingRollup.Resolution.HOUR):
+            rollups += save_rollups(equipment_id, resolution, summarize(fixes, TIER_SECONDS[resolution]))
+        _delete_in_batches([fix['pk'] for fix in fixes], batch_size)
+        advance_watermark(equipment_id, window_end)
+    return len(fixes), rollups
+
+
+def advance_watermark(equipment_id, compacted_until):
+    """Avancer (jamais reculer) la limite de compaction d'un équipement"""
+    current = compaction_watermark(equipment_id)
+    if current is None or compacted_until > current:
+        EquipmentTrackingCompaction.objects.bulk_create(
+            [EquipmentTrackingCompaction(equipment_id=equipment_id, compacted_until=compacted_until)],
+            update_conflicts=True, unique_fields=['equipment'], update_fields=['compacted_until'],
+        )
+
+
+def compaction_watermark(equipment_id):
+    """Limite de compaction d'un équipement (None s'il n'a jamais été compacté)"""
+    return (
+        EquipmentTrackingCompaction.objects.filter(equipment_id=equipment_id)
+        .values_list('compacted_until', flat=True).first()
+    )
+
+
+def compact_tracking(now=None, batch_size=None, progress=None):
+    """
+    Compacter toutes les positions brutes plus anciennes que la fenêtre de
+    rétention puis purger les paliers minute expirés.
+
+    Retourne (positions compactées, paliers écrits, paliers minute purgés).
+    """
+    batch_size = batch_size or _setting('TRACKING_PRUNE_BATCH_SIZE', 5000)
+    cutoff = raw_cutoff(now)
+    oldest = (
+        EquipmentTracking.objects.filter(timestamp__lt=cutoff)
+        .order_by()
+        .values('equipment_id')
+        .annotate(first=Min('timestamp'))
+    )
+
+    compacted = written = 0
+    for row in list(oldest):
+        equipment_id, first = row['equipment_id'], row['first']
+        while first is not None:
+            window_start = floor_time(first, 3600)
+            window_end = min(window_start + COMPACTION_WINDOW, cutoff)
+            fixes, rollups = compact_window(equipment_id, window_start, window_end, batch_size)
+            compacted += fixes
+            written += rollups
+            # Tranche suivante: prochaine position à compacter (saute les trous)
+            first = (
+                EquipmentTracking.objects
+                .filter(equipment_id=equipment_id, timestamp__gte=window_end, timestamp__lt=cutoff)
+                .order_by('timestamp')
+                .values_list('timestamp', flat=True)
+                .first()
+            )
+        if progress:
+            progress(row['equipment_id'], compacted)
+
+    pruned = prune_minute_rollups(now, batch_size)
+    return compacted, written, pruned
+
+
+def prune_minute_rollups(now=None, batch_size=5000):
+    """Purger par lots les paliers minute plus anciens que leur rétention"""
+    expired = EquipmentTrackingRollup.objects.filter(
+        resolution=EquipmentTrackingRollup.Resolution.MINUTE,
+        bucket_start__lt=minute_cutoff(now),
+    )
+    pruned = 0
+    while True:
+        pks = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return pruned
+        EquipmentTrackingRollup.objects.filter(pk__in=pks).delete()
+        pruned += len(pks)
+
+
+# ── Trajectoires ───────────────────────────────────────────────────────
+
+def select_tier(resolution_seconds):
+    """Palier le plus grossier dont l'intervalle ne dépasse pas la résolution demandée"""
+    tier = 'raw'
+    for name, seconds in TIER_SECONDS.items():
+        if seconds <= resolution_seconds:
+            tier = name
+    return tier
+
+
+def _point(bucket, tier):
+    return {
+        'timestamp': bucket['bucket_start'],
+        'latitude': float(bucket['last_latitude']),
+        'longitude': float(bucket['last_longitude']),
+        'speed': round(bucket['avg_speed'], 2),
+        'max_speed': round(bucket['max_speed'], 2),
+        'distance_km': round(bucket['distance_km'], 4),
+        'tier': tier,
+    }
+
+
+def _rollup_points(equipment_id, resolution, start, end):
+    if start >= end:
+        return []
+    rows = (
+        EquipmentTrackingRollup.objects
+        .filter(equipment_id=equipment_id, resolution=resolution, bucket_start__gte=start, bucket_start__lt=end)
+        .order_by('bucket_start')
+        .values('bucket_start', 'last_latitude', 'last_longitude', 'avg_speed', 'max_speed', 'distance_km')
+    )
+    return [_point(row, resolution) for row in rows]
+
+
+def thin(points, seconds):
+    """
+    Ramener des points à un par intervalle de `seconds` (dernière position,
+    vitesse moyenne, vitesse max et distance cumulées).
+    """
+    thinned = {}
+    for point in points:
+        start = floor_time(point['timestamp'], seconds)
+        current = thinned.get(start)
+        if current is None:
+            thinned[start] = dict(point, timestamp=start, _speeds=[point['speed']])
+            continue
+        current['_speeds'].append(point['speed'])
+        current['latitude'], current['longitude'] = point['latitude'], point['longitude']
+        if 'max_speed' in point:
+            current['max_speed'] = max(current['max_speed'], point['max_speed'])
+            current['distance_km'] = round(current['distance_km'] + point['distance_km'], 4)
+    for point in thinned.values():
+        speeds = point.pop('_speeds')
+        point['speed'] = round(sum(speeds) / len(speeds), 2)
+    return list(thinned.values())
+
+
+def trajectory(equipment_id, start, end, resolution_seconds=None, now=None):
+    """
+    Trajectoire d'un équipement sur [start, end].
+
+    Sans résolution, elle est déduite de TRACKING_MAX_POINTS. Les positions
+    brutes sont lues à partir de la limite de compaction de l'équipement,
+    qu'elle soit en retard ou non sur la fenêtre de rétention. Retourne
+    (palier choisi, points triés par horodatage).
+    """
+    if resolution_seconds is None:
+        resolution_seconds = (end - start).total_seconds() / _setting('TRACKING_MAX_POINTS', 2000)
+    tier = select_tier(resolution_seconds)
+    minute_from = minute_cutoff(now)
+    raw_from = compaction_watermark(equipment_id)
+
+    points = []
+    # Période compactée: paliers agrégés (minute au plus fin, heure là où
+    # les paliers minute ont été purgés)
+    if raw_from is not None and start < raw_from:
+        older_end = min(end, raw_from)
+        if tier == EquipmentTrackingRollup.Resolution.HOUR:
+            points += _rollup_points(equipment_id, tier, start, older_end)
+        else:
+            points += _rollup_points(equipment_id, EquipmentTrackingRollup.Resolution.HOUR, start, min(older_end, minute_from))
+            points += _rollup_points(equipment_id, EquipmentTrackingRollup.Resolution.MINUTE, max(start, minute_from), older_end)
+
+    # Fenêtre brute: positions, ou agrégées à la volée au palier choisi
+    if raw_from is None or end >= raw_from:
+        fixes = (
+            EquipmentTracking.objects
+            .filter(equipment_id=equipment_id, timestamp__gte=max(start, raw_from or start), timestamp__lte=end)
+            .order_by('timestamp', 'pk')
+            .values(*RAW_FIELDS)
+        )
+        if tier == 'raw':
+            points += [{
+                'timestamp': fix['timestamp'],
+                'latitude': float(fix['latitude']),
+                'longitude': float(fix['longitude']),
+                'speed': fix['speed'],
+                'tier': 'raw',
+            } for fix in fixes.iterator(chunk_size=2000)]
+        else:
+            buckets = summarize(fixes.iterator(chunk_size=2000), TIER_SECONDS[tier])
+            points += [_point(bucket, tier) for bucket in buckets.values()]
+
+    # Palier plus fin que la résolution demandée: un point par intervalle
+    if resolution_seconds >= 1 and resolution_seconds > TIER_SECONDS[tier]:
+        points = thin(points, int(resolution_seconds))
+    return tier, points
@@ -2,14 +2,28 @@ from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Prefetch, Q
 from django.utils import timezone
-from .models import Equipment, MaintenanceRecord, EquipmentTracking
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from .models import (
+    Equipment, EquipmentGeofenceState, EquipmentHealthScore, MaintenanceRecord, EquipmentTracking,
+    HIGH_RISK_LEVELS, with_last_maintenance,
+)
+from .geofence import evaluate_fixes
+from .streaming import publish_positions
+from .paths import ENCODINGS, encode_polyline, geojson_geometry, parse_bbox, shape_path
+from .telemetry import ingest_fixes
+from .tracking import trajectory
 from .serializers import (
     EquipmentSerializer, EquipmentListSerializer,
     EquipmentStatusUpdateSerializer,
     MaintenanceRecordSerializer, MaintenanceRecordListSerializer,
-    EquipmentTrackingSerializer
+    EquipmentTrackingSerializer, EquipmentHealthScoreSerializer, GeofenceEventSerializer
 )
 from accounts.permissions import CanManageEquipment
 from accounts.mixins import SiteScopedMixin
@@ -35,6 +49,21 @@ class EquipmentViewSet(CSVExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
     ordering_fields = ['equipment_code', 'name', 'created_at', 'next_maintenance_date']
     ordering = ['equipment_code']
     
+    # Actions qui sérialisent la dernière maintenance
+    LAST_MAINTENANCE_ACTIONS = ('list', 'retrieve', 'update', 'partial_update', 'update_status')
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.LAST_MAINTENANCE_ACTIONS:
+            queryset = with_last_maintenance(queryset)
+        if self.action == 'retrieve':
+            # Historique complet: fiche détaillée uniquement
+            queryset = queryset.prefetch_related(Prefetch(
+                'maintenance_records',
+                queryset=MaintenanceRecord.objects.select_related('equipment'),
+            ))
+        return queryset
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return EquipmentListSerializer
@@ -70,12 +99,14 @@ class EquipmentViewSet(CSVExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Mettre à jour l'équipement
+        # Mettre à jour l'équipement (colonnes de position uniquement)
         equipment.last_latitude = lat
         equipment.last_longitude = lon
         equipment.current_speed = speed
         equipment.last_position_update = timezone.now()
-        equipment.save()
+        equipment.save(update_fields=[
+            'last_latitude', 'last_longitude', 'current_speed', 'last_position_update',
+        ])
 
         # Enregistrer dans l'historique
         tracking = EquipmentTracking.objects.create(
@@ -84,37 +115,264 @@ class EquipmentViewSet(CSVExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
             longitude=lon,
             speed=speed
         )
+
+        # Contrôle des géofences (concession, zones de chantier)
+        evaluate_fixes([tracking], {equipment.pk: equipment.site_id})
         
-        # BROADCASH REAL-TIME (Simulé ou via Channels si configuré)
-        # self.broadcast_position(equipment)
+        # Diffusion temps réel (ws/tracking/), limitée par équipement
+        transaction.on_commit(lambda: publish_positions([tracking], {equipment.pk: equipment.site_id}))
 
         return Response(EquipmentTrackingSerializer(tracking).data)
     
+    @action(detail=False, methods=['post'])
+    def telemetry(self, request):
+        """
+        Saisie par lot des positions GPS de plusieurs équipements:
+        liste de relevés {equipment, latitude, longitude, speed, timestamp}
+        (ou {"fixes": [...]}), dans un ordre quelconque.
+        
+        201: tout est enregistré, 207: enregistrement partiel, 400: rien.
+        """
+        rows = request.data.get('fixes') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {"error": "Une liste non vide de relevés est attendue"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_fixes = getattr(settings, 'TELEMETRY_MAX_FIXES', 10000)
+        if len(rows) > max_fixes:
+            return Response(
+                {"error": f"{max_fixes} relevés au plus par lot"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        accepted, updated, errors = ingest_fixes(rows, self.get_queryset())
+        if not errors:
+            response_status = status.HTTP_201_CREATED
+        elif accepted:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'accepted': accepted,
+            'rejected': len(errors),
+            'equipment_updated': updated,
+            'errors': errors,
+        }, status=response_status)
+    
+    @action(detail=True, methods=['get'])
+    def trajectory(self, request, pk=None):
+        """
+        Trajectoire GPS sur une période (?start=...&end=..., 24 h par défaut).
+        
+        ?resolution=<secondes>: écart souhaité entre deux points; le palier
+        le plus grossier compatible est choisi (brut, minute, heure). Sans
+        résolution, elle est déduite de TRACKING_MAX_POINTS.
+        """
+        equipment = self.get_object()
+        start, end = self._query_period()
+        resolution = self._query_number('resolution', 'Nombre de secondes attendu')
+        
+        tier, points = trajectory(equipment.pk, start, end, resolution)
+        return Response({
+            'equipment': equipment.pk,
+            'start': start,
+            'end': end,
+            'tier': tier,
+            'points': points,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def trajectories(self, request):
+        """
+        Trajectoires compactes de plusieurs équipements (carte).
+        
+        ?equipment=1,2,3 (obligatoire), ?start/?end et ?resolution comme
+        /trajectory/, ?bbox=min_lon,min_lat,max_lon,max_lat pour ne garder
+        que les tronçons dans l'emprise, ?tolerance=<mètres> pour la
+        simplification Douglas–Peucker, ?encoding=geojson (défaut) ou
+        polyline.
+        """
+        params = request.query_params
+        try:
+            ids = sorted({int(value) for value in params.get('equipment', '').split(',') if value.strip()})
+        except ValueError:
+            raise ValidationError({'equipment': 'Liste d\'identifiants attendue (ex. 1,2,3)'})
+        if not ids:
+            raise ValidationError({'equipment': 'Au moins un équipement est requis'})
+        max_trajectories = getattr(settings, 'TRACKING_MAX_TRAJECTORIES', 50)
+        if len(ids) > max_trajectories:
+            raise ValidationError({'equipment': f'{max_trajectories} équipements au plus'})
+        
+        start, end = self._query_period()
+        resolution = self._query_number('resolution', 'Nombre de secondes attendu')
+        tolerance = self._query_number('tolerance', 'Tolérance en mètres attendue') or 0
+        encoding = params.get('encoding', 'geojson')
+        if encoding not in ENCODINGS:
+            raise ValidationError({'encoding': f"Valeurs possibles: {', '.join(ENCODINGS)}"})
+        bbox = None
+        if params.get('bbox'):
+            try:
+                bbox = parse_bbox(params['bbox'])
+            except ValueError:
+                raise ValidationError({'bbox': 'Emprise attendue: min_lon,min_lat,max_lon,max_lat'})
+        
+        # Équipements visibles par l'utilisateur uniquement
+        codes = dict(self.get_queryset().filter(pk__in=ids).values_list('pk', 'equipment_code'))
+        results = []
+        for equipment_id in ids:
+            if equipment_id not in codes:
+                continue
+            tier, points = trajectory(equipment_id, start, end, resolution)
+            parts = shape_path(points, bbox, tolerance)
+            properties = {
+                'equipment': equipment_id,
+                'equipment_code': codes[equipment_id],
+                'tier': tier,
+                'points': len(points),
+                'simplified_points': sum(len(part) for part in parts),
+            }
+            if encoding == 'polyline':
+                results.append(dict(properties, polylines=[encode_polyline(part) for part in parts]))
+            else:
+                results.append({
+                    'type': 'Feature',
+                    'geometry': geojson_geometry(parts),
+                    'properties': properties,
+                })
+        
+        if encoding == 'polyline':
+            return Response({'start': start, 'end': end, 'tolerance': tolerance, 'trajectories': results})
+        return Response({
+            'type': 'FeatureCollection',
+            'features': results,
+            'properties': {'start': start, 'end': end, 'tolerance': tolerance},
+        })
+    
+    def _query_period(self):
+        """Période ?start/?end (24 h jusqu'à maintenant par défaut)"""
+        end = self._query_moment('end') or timezone.now()
+        start = self._query_moment('start') or end - timedelta(days=1)
+        if start >= end:
+            raise ValidationError({'start': 'La date de début doit précéder la date de fin'})
+        return start, end
+    
+    def _query_number(self, name, message):
+        """Nombre positif ou nul optionnel"""
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValidationError({name: message})
+        if not value >= 0:
+            raise ValidationError({name: message})
+        return value
+    
+    def _query_moment(self, name):
+        """Date (AAAA-MM-JJ, début de journée) ou date/heure ISO 8601"""
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            moment = parse_datetime(value)
+            day = parse_date(value) if moment is None else None
+        except ValueError:
+            raise ValidationError({name: 'Date invalide'})
+        if moment is None:
+            if day is None:
+                raise ValidationError({name: 'Date invalide'})
+            moment = datetime.combine(day, time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment, timezone.get_current_timezone())
+        return moment
+    
     @action(detail=True, methods=['get'])
     def maintenance_history(self, request, pk=None):
         """Récupère l'historique de maintenance d'un équipement"""
         equipment = self.get_object()
-        records = equipment.maintenance_records.all()
+        records = equipment.maintenance_records.select_related('equipment')
         serializer = MaintenanceRecordListSerializer(records, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def needing_maintenance(self, request):
-        """Liste les équipements nécessitant une maintenance prochaine"""
+        """
+        Liste les équipements nécessitant une maintenance prochaine: entretien
+        planifié ou estimé (score prédictif) dans les 7 jours, ou risque de
+        panne élevé
+        """
         from django.utils import timezone
         from datetime import timedelta
         
         today = timezone.now().date()
         threshold = today + timedelta(days=7)  # Maintenance dans les 7 jours
         
-        equipment = Equipment.objects.filter(
-            next_maintenance_date__lte=threshold,
+        equipment = with_last_maintenance(Equipment.objects.select_related('site').filter(
+            Q(next_maintenance_date__lte=threshold)
+            | Q(health_score__next_service_date__lte=threshold)
+            | Q(health_score__risk_level__in=HIGH_RISK_LEVELS),
             status__in=['OPERATIONAL', 'MAINTENANCE']
-        ).order_by('next_maintenance_date')
+        )).order_by(
+            F('health_score__failure_risk').desc(nulls_last=True), 'next_maintenance_date'
+        )
         
         serializer = EquipmentListSerializer(equipment, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def health_scores(self, request):
+        """
+        Scores de maintenance prédictive précalculés (score_equipment_health),
+        du plus risqué au moins risqué. ?risk_level=HIGH,CRITICAL pour filtrer.
+        Vide tant que run_equipment_jobs n'a pas tourné.
+        """
+        scores = EquipmentHealthScore.objects.select_related('equipment__site').filter(
+            equipment__in=self.filter_queryset(self.get_queryset())
+        ).order_by('-failure_risk', 'equipment__equipment_code')
+        levels = [level for level in request.query_params.get('risk_level', '').split(',') if level]
+        if levels:
+            unknown = set(levels) - set(EquipmentHealthScore.RiskLevel.values)
+            if unknown:
+                raise ValidationError({'risk_level': f"Valeurs possibles: {', '.join(EquipmentHealthScore.RiskLevel.values)}"})
+            scores = scores.filter(risk_level__in=levels)
+        
+        page = self.paginate_queryset(scores)
+        if page is not None:
+            return self.get_paginated_response(EquipmentHealthScoreSerializer(page, many=True).data)
+        return Response(EquipmentHealthScoreSerializer(scores, many=True).data)
+    
+    @action(detail=True, methods=['get'])
+    def health(self, request, pk=None):
+        """Score de maintenance prédictive d'un équipement"""
+        equipment = self.get_object()
+        score = EquipmentHealthScore.objects.select_related('equipment__site').filter(equipment=equipment).first()
+        if score is None:
+            return Response(
+                {"error": "Score non encore calculé pour cet équipement"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(EquipmentHealthScoreSerializer(score).data)
+    
+    @action(detail=True, methods=['get'])
+    def geofence(self, request, pk=None):
+        """État géofence courant et derniers événements (?limit=, 50 par défaut)"""
+        equipment = self.get_object()
+        try:
+            limit = min(int(request.query_params.get('limit', 50)), 500)
+        except ValueError:
+            raise ValidationError({'limit': 'Nombre entier attendu'})
+        state = EquipmentGeofenceState.objects.filter(equipment=equipment).first()
+        events = equipment.geofence_events.select_related('work_zone').order_by('-timestamp')[:max(limit, 0)]
+        return Response({
+            'equipment': equipment.pk,
+            'inside_concession': state.inside_concession if state else None,
+            'work_zone': state.work_zone_id if state else None,
+            'last_fix_at': state.last_fix_at if state else None,
+            'events': GeofenceEventSerializer(events, many=True).data,
+        })
+    
     @action(detail=False, methods=['get'])
     def by_qr_code(self, request):
         """Recherche un équipement par QR code"""
@@ -126,7 +384,7 @@ class EquipmentViewSet(CSVExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
             )
         
         try:
-            equipment = Equipment.objects.get(qr_code=qr_code)
+            equipment = with_last_maintenance(Equipment.objects.select_related('site')).get(qr_code=qr_code)
             serializer = EquipmentSerializer(equipment)
             return Response(serializer.data)
         except Equipment.DoesNotExist:
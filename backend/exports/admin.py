@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import ExportJob
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'resource', 'export_format', 'user', 'status', 'progress', 'created_at', 'expires_at')
+    list_filter = ('status', 'export_format', 'resource')
+    search_fields = ('user__email', 'resource', 'params_hash')
+    readonly_fields = ('params_hash', 'rows_total', 'rows_done', 'file_size', 'started_at', 'finished_at', 'created_at')
+    ordering = ('-created_at',)
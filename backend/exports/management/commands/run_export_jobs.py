@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from exports.services import claim_next_job, purge_expired_jobs, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Worker des exports en arrière-plan (CSV, PDF, Excel)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Traiter les exports en attente puis s'arrêter"
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help="Attente (secondes) quand la file est vide (défaut: 2)"
+        )
+
+    def handle(self, *args, **options):
+        last_maintenance = 0
+        while True:
+            # Maintenance au plus une fois par minute
+            if time.monotonic() - last_maintenance > 60:
+                requeued = requeue_stale_jobs()
+                purged = purge_expired_jobs()
+                if requeued or purged:
+                    self.stdout.write(f"{requeued} export(s) relancé(s), {purged} expiré(s) supprimé(s)")
+                last_maintenance = time.monotonic()
+
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            job = run_job(job)
+            style = self.style.SUCCESS if job.status == job.Status.DONE else self.style.ERROR
+            self.stdout.write(style(f"Export #{job.pk} {job.resource}.{job.export_format}: {job.get_status_display()}"))
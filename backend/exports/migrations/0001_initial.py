@@ -0,0 +1,47 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import exports.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(help_text="Préfixe de l'API: operations, equipment, reports...", max_length=50, verbose_name='Ressource')),
+                ('export_format', models.CharField(choices=[('csv', 'CSV'), ('pdf', 'PDF'), ('xlsx', 'Excel')], max_length=10, verbose_name='Format')),
+                ('object_id', models.IntegerField(blank=True, help_text="Export d'un objet unique (ex: classeur d'un rapport)", null=True, verbose_name='Objet exporté')),
+                ('filters', models.JSONField(blank=True, default=dict, verbose_name='Filtres')),
+                ('params_hash', models.CharField(db_index=True, help_text="Ressource + format + filtres + périmètre de l'utilisateur", max_length=64, verbose_name='Empreinte des paramètres')),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('RUNNING', 'En cours'), ('DONE', 'Terminé'), ('FAILED', 'Échec')], default='PENDING', max_length=20, verbose_name='Statut')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Progression (%)')),
+                ('rows_total', models.PositiveIntegerField(blank=True, null=True, verbose_name='Lignes à exporter')),
+                ('rows_done', models.PositiveIntegerField(default=0, verbose_name='Lignes exportées')),
+                ('file', models.FileField(blank=True, null=True, upload_to='exports/%Y/%m/', verbose_name='Fichier')),
+                ('file_size', models.BigIntegerField(blank=True, null=True, verbose_name='Taille (octets)')),
+                ('error', models.TextField(blank=True, verbose_name='Erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Démarré le')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('expires_at', models.DateTimeField(default=exports.models.default_expiry, verbose_name='Expire le')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Demandé par')),
+            ],
+            options={
+                'verbose_name': 'Export',
+                'verbose_name_plural': 'Exports',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='exports_exp_status_b76416_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='export_format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('pdf', 'PDF'), ('xlsx', 'Excel'), ('zip', 'Archive ZIP')], max_length=10, verbose_name='Format'),
+        ),
+    ]
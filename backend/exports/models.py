@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+def default_expiry():
+    return timezone.now() + timedelta(hours=getattr(settings, 'EXPORT_JOB_TTL_HOURS', 24))
+
+
+class ExportJob(models.Model):
+    """
+    Export exécuté en arrière-plan (CSV, PDF, Excel, lots ZIP)
+
+    Le client crée le job, suit sa progression (polling ou WebSocket
+    `export_progress`) puis télécharge le fichier, avec reprise (HTTP Range).
+    """
+
+    class ExportFormat(models.TextChoices):
+        CSV = 'csv', 'CSV'
+        PDF = 'pdf', 'PDF'
+        XLSX = 'xlsx', 'Excel'
+        ZIP = 'zip', 'Archive ZIP'
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'En attente'
+        RUNNING = 'RUNNING', 'En cours'
+        DONE = 'DONE', 'Terminé'
+        FAILED = 'FAILED', 'Échec'
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='export_jobs',
+        verbose_name="Demandé par"
+    )
+    resource = models.CharField(
+        max_length=50,
+        verbose_name="Ressource",
+        help_text="Préfixe de l'API: operations, equipment, reports..."
+    )
+    export_format = models.CharField(
+        max_length=10,
+        choices=ExportFormat.choices,
+        verbose_name="Format"
+    )
+    object_id = models.IntegerField(
+        null=True, blank=True,
+        verbose_name="Objet exporté",
+        help_text="Export d'un objet unique (ex: classeur d'un rapport)"
+    )
+    filters = models.JSONField(default=dict, blank=True, verbose_name="Filtres")
+    params_hash = models.CharField(
+        max_length=64,
+        db_index=True,
+        verbose_name="Empreinte des paramètres",
+        help_text="Ressource + format + filtres + périmètre de l'utilisateur"
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name="Statut"
+    )
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name="Progression (%)")
+    rows_total = models.PositiveIntegerField(null=True, blank=True, verbose_name="Lignes à exporter")
+    rows_done = models.PositiveIntegerField(default=0, verbose_name="Lignes exportées")
+    file = models.FileField(upload_to='exports/%Y/%m/', null=True, blank=True, verbose_name="Fichier")
+    file_size = models.BigIntegerField(null=True, blank=True, verbose_name="Taille (octets)")
+    error = models.TextField(blank=True, verbose_name="Erreur")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Démarré le")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Terminé le")
+    expires_at = models.DateTimeField(default=default_expiry, verbose_name="Expire le")
+
+    class Meta:
+        verbose_name = "Export"
+        verbose_name_plural = "Exports"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Export #{self.pk} {self.resource} ({self.export_format}) - {self.status}"
+
+    @property
+    def is_ready(self):
+        return self.status == self.Status.DONE and bool(self.file)
@@ -0,0 +1,35 @@
+from django.urls import reverse
+from rest_framework import serializers
+
+from .models import ExportJob
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    """Serializer pour les exports en arrière-plan"""
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'resource', 'export_format', 'object_id', 'filters',
+            'status', 'status_display', 'progress', 'rows_total', 'rows_done',
+            'file_size', 'error', 'download_url',
+            'created_at', 'started_at', 'finished_at', 'expires_at',
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if not obj.is_ready:
+            return None
+        url = reverse('exportjob-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class ExportJobCreateSerializer(serializers.Serializer):
+    """Demande d'export: ressource de l'API, format, filtres de la liste"""
+    resource = serializers.CharField(max_length=50)
+    export_format = serializers.ChoiceField(choices=ExportJob.ExportFormat.choices)
+    object_id = serializers.IntegerField(required=False, allow_null=True)
+    filters = serializers.DictField(required=False, default=dict)
@@ -0,0 +1,362 @@
+"""
+Service d'exports en arrière-plan
+
+- création (avec réutilisation d'un fichier récent aux mêmes paramètres)
+- reconstruction du ViewSet d'origine pour retrouver exactement le même
+  queryset filtré et le même périmètre de sites que l'export synchrone
+- exécution par le worker (commande run_export_jobs) et notifications
+  WebSocket `export_progress`
+"""
+
+import hashlib
+import json
+import logging
+import tempfile
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework.request import Request
+
+from nexus_backend.csv_export import CSVExportMixin, iter_csv
+from nexus_backend.export_projection import default_export_fields
+from nexus_backend.pdf_export import PDFExportMixin
+
+from .models import ExportJob
+
+
+logger = logging.getLogger(__name__)
+
+# Paramètres de requête sans effet sur le contenu exporté
+IGNORED_PARAMS = {'page', 'page_size', 'format', 'background'}
+PROGRESS_EVERY = 2000
+
+
+class ExportNotAllowed(Exception):
+    """Ressource, format ou objet non exportable pour cet utilisateur"""
+
+
+# ── Ressources exportables ─────────────────────────────────────────────
+
+def get_viewset_class(resource):
+    """ViewSet enregistré sous le préfixe `resource` du routeur de l'API"""
+    from nexus_backend.api_urls import router
+
+    for prefix, viewset, _basename in router.registry:
+        if prefix == resource:
+            return viewset
+    return None
+
+
+def supported_formats(viewset_class, detail=False):
+    formats = set()
+    if detail:
+        if hasattr(viewset_class, 'render_excel'):
+            formats.add(ExportJob.ExportFormat.XLSX)
+    else:
+        if issubclass(viewset_class, CSVExportMixin):
+            formats.add(ExportJob.ExportFormat.CSV)
+        if issubclass(viewset_class, PDFExportMixin):
+            formats.add(ExportJob.ExportFormat.PDF)
+        if hasattr(viewset_class, 'render_bundle'):
+            formats.add(ExportJob.ExportFormat.ZIP)
+    return formats
+
+
+def normalize_filters(query_params):
+    """QueryDict -> dict stable (listes pour les paramètres répétés)"""
+    filters = {}
+    for key in sorted(query_params.keys()):
+        if key in IGNORED_PARAMS:
+            continue
+        if hasattr(query_params, 'getlist'):
+            values = query_params.getlist(key)
+        else:
+            values = query_params[key]
+        if isinstance(values, (list, tuple)):
+            values = [str(v) for v in values]
+            filters[key] = values[0] if len(values) == 1 else values
+        else:
+            filters[key] = str(values)
+    return filters
+
+
+def build_view(viewset_class, user, filters, action, pk=None):
+    """
+    Instancier le ViewSet comme le ferait le routeur pour une requête GET
+    portant `filters`, afin d'appliquer ses filtres, son périmètre de sites
+    et ses permissions.
+    """
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    query = QueryDict(mutable=True)
+    for key, value in (filters or {}).items():
+        if isinstance(value, list):
+            query.setlist(key, [str(v) for v in value])
+        else:
+            query[key] = str(value)
+    http_request.GET = query
+
+    request = Request(http_request)
+    request.user = user
+
+    view = viewset_class()
+    view.action_map = {'get': action}
+    view.action = action
+    view.request = request
+    view.args = ()
+    view.kwargs = {'pk': pk} if pk is not None else {}
+    view.format_kwarg = None
+    view.headers = {}
+    return view
+
+
+def scope_fingerprint(user):
+    """Périmètre de données de l'utilisateur (sites visibles)"""
+    site_ids = user.get_site_ids()
+    sites = 'all' if site_ids is None else ','.join(str(i) for i in sorted(site_ids))
+    return f'{user.role}:{sites}'
+
+
+def compute_params_hash(user, resource, export_format, filters, object_id=None):
+    payload = json.dumps({
+        'resource': resource,
+        'format': export_format,
+        'object_id': object_id,
+        'filters': filters,
+        'scope': scope_fingerprint(user),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def check_access(user, resource, export_format, filters, object_id=None):
+    """Vérifier que l'utilisateur peut exporter; lève ExportNotAllowed"""
+    viewset_class = get_viewset_class(resource)
+    if viewset_class is None:
+        raise ExportNotAllowed(f"Ressource inconnue: {resource}")
+    detail = object_id is not None
+    if export_format not in supported_formats(viewset_class, detail=detail):
+        raise ExportNotAllowed(f"Format {export_format} non disponible pour {resource}")
+
+    view = build_view(viewset_class, user, filters, 'retrieve' if detail else 'list', pk=object_id)
+    try:
+        view.check_permissions(view.request)
+        if detail:
+            obj = view.get_object()
+            check = getattr(view, 'check_excel_allowed', None)
+            if check is not None:
+                check(obj)
+        elif export_format == ExportJob.ExportFormat.ZIP:
+            view.check_bundle_allowed()
+    except Exception as exc:
+        raise ExportNotAllowed(str(getattr(exc, 'detail', exc))) from exc
+
+
+# ── Création / réutilisation ───────────────────────────────────────────
+
+def enqueue(user, resource, export_format, filters=None, object_id=None):
+    """
+    Créer un export, ou réutiliser un export identique encore frais.
+
+    Retourne (job, reused).
+    """
+    filters = filters or {}
+    params_hash = compute_params_hash(user, resource, export_format, filters, object_id)
+    now = timezone.now()
+    freshness = timedelta(seconds=getattr(settings, 'EXPORT_JOB_FRESHNESS_SECONDS', 900))
+
+    # Même demande déjà en cours pour cet utilisateur
+    in_flight = ExportJob.objects.filter(
+        user=user, params_hash=params_hash,
+        status__in=[ExportJob.Status.PENDING, ExportJob.Status.RUNNING],
+    ).first()
+    if in_flight:
+        return in_flight, True
+
+    # Fichier récent aux mêmes paramètres (même périmètre de données)
+    fresh = ExportJob.objects.filter(
+        params_hash=params_hash,
+        status=ExportJob.Status.DONE,
+        finished_at__gte=now - freshness,
+        expires_at__gt=now,
+    ).exclude(file='').order_by('-finished_at').first()
+    if fresh:
+        if fresh.user_id == user.pk:
+            return fresh, True
+        job = ExportJob.objects.create(
+            user=user, resource=resource, export_format=export_format,
+            object_id=object_id, filters=filters, params_hash=params_hash,
+            status=ExportJob.Status.DONE, progress=100,
+            rows_total=fresh.rows_total, rows_done=fresh.rows_done,
+            file=fresh.file.name, file_size=fresh.file_size,
+            started_at=now, finished_at=now, expires_at=fresh.expires_at,
+        )
+        return job, True
+
+    job = ExportJob.objects.create(
+        user=user, resource=resource, export_format=export_format,
+        object_id=object_id, filters=filters, params_hash=params_hash,
+    )
+    transaction.on_commit(lambda: notify(job))
+    return job, False
+
+
+# ── Notifications ──────────────────────────────────────────────────────
+
+def job_payload(job):
+    return {
+        'id': job.pk,
+        'resource': job.resource,
+        'export_format': job.export_format,
+        'status': job.status,
+        'progress': job.progress,
+        'rows_done': job.rows_done,
+        'rows_total': job.rows_total,
+        'error': job.error,
+    }
+
+
+def notify(job):
+    """Événement WebSocket `export_progress` vers le groupe de l'utilisateur"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            f"notifications_{job.user_id}",
+            {'type': 'export_progress', 'job': job_payload(job)}
+        )
+    except Exception:
+        # Une notification perdue ne doit pas faire échouer l'export
+        logger.warning("Notification export #%s impossible", job.pk, exc_info=True)
+
+
+def _update_progress(job, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    ExportJob.objects.filter(pk=job.pk).update(**fields)
+    notify(job)
+
+
+# ── Exécution (worker) ─────────────────────────────────────────────────
+
+def claim_next_job():
+    """Réserver le prochain export en attente (SKIP LOCKED entre workers)"""
+    with transaction.atomic():
+        job = (
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ExportJob.Status.PENDING)
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = ExportJob.Status.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def requeue_stale_jobs():
+    """Remettre en file les exports d'un worker arrêté en cours de route"""
+    timeout = timedelta(seconds=getattr(settings, 'EXPORT_JOB_TIMEOUT_SECONDS', 3600))
+    return ExportJob.objects.filter(
+        status=ExportJob.Status.RUNNING,
+        started_at__lt=timezone.now() - timeout,
+    ).update(status=ExportJob.Status.PENDING, started_at=None, progress=0, rows_done=0)
+
+
+def purge_expired_jobs():
+    """Supprimer les exports expirés et les fichiers qui ne sont plus référencés"""
+    expired = list(ExportJob.objects.filter(expires_at__lt=timezone.now()))
+    for job in expired:
+        name = job.file.name if job.file else None
+        job.delete()
+        if name and not ExportJob.objects.filter(file=name).exists():
+            job.file.storage.delete(name)
+    return len(expired)
+
+
+def _write_csv(job, view, queryset, output):
+    fields = default_export_fields(view, queryset.model)
+    _update_progress(job, rows_total=queryset.count())
+    rows = -1  # la première ligne est l'en-tête
+    for line in iter_csv(queryset, fields):
+        output.write(line.encode('utf-8'))
+        rows += 1
+        if rows and rows % PROGRESS_EVERY == 0:
+            total = job.rows_total or rows
+            _update_progress(job, rows_done=rows, progress=min(99, int(rows * 100 / max(total, 1))))
+    return rows
+
+
+def _write_pdf(job, view, queryset, output):
+    max_rows = getattr(settings, 'EXPORT_JOB_PDF_MAX_ROWS', 100000)
+    total = min(queryset.count(), max_rows)
+    _update_progress(job, rows_total=total)
+
+    def progress(rows):
+        _update_progress(job, rows_done=rows, progress=min(99, int(rows * 100 / max(total, 1))))
+
+    return view.render_pdf_list(queryset, output, max_rows=max_rows, progress=progress)
+
+
+def run_job(job):
+    """Produire le fichier d'un export réservé par claim_next_job()"""
+    viewset_class = get_viewset_class(job.resource)
+    detail = job.object_id is not None
+    try:
+        if viewset_class is None:
+            raise ExportNotAllowed(f"Ressource inconnue: {job.resource}")
+        view = build_view(
+            viewset_class, job.user, job.filters,
+            'retrieve' if detail else 'list', pk=job.object_id,
+        )
+
+        with tempfile.TemporaryFile() as output:
+            if detail:
+                obj = view.get_object()
+                rows = view.render_excel(obj, output, progress=lambda done, total: _update_progress(
+                    job, rows_done=done, rows_total=total,
+                    progress=min(99, int(done * 100 / max(total, 1))),
+                ))
+                label = f'{job.resource}_{job.object_id}'
+            elif job.export_format == ExportJob.ExportFormat.ZIP:
+                rows = view.render_bundle(job.filters, output, progress=lambda done, total: _update_progress(
+                    job, rows_done=done, rows_total=total,
+                    progress=min(99, int(done * 100 / max(total, 1))),
+                ))
+                label = f'{job.resource}_lot'
+            else:
+                queryset = view.filter_queryset(view.get_queryset())
+                if job.export_format == ExportJob.ExportFormat.CSV:
+                    rows = _write_csv(job, view, queryset, output)
+                else:
+                    rows = _write_pdf(job, view, queryset, output)
+                label = slugify(queryset.model._meta.verbose_name_plural)
+
+            size = output.tell()
+            output.seek(0)
+            filename = f"export_{job.pk}_{label}_{timezone.now().strftime('%Y%m%d_%H%M')}.{job.export_format}"
+            job.file.save(filename, File(output), save=False)
+
+        job.status = ExportJob.Status.DONE
+        job.progress = 100
+        job.rows_done = rows
+        job.file_size = size
+        job.error = ''
+    except Exception as exc:
+        logger.exception("Export #%s en échec", job.pk)
+        job.status = ExportJob.Status.FAILED
+        job.error = str(exc)[:2000]
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'rows_done', 'file', 'file_size', 'error', 'finished_at'])
+    notify(job)
+    return job
@@ -0,0 +1,135 @@
+import mimetypes
+import os
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+
+from .models import ExportJob
+from .serializers import ExportJobCreateSerializer, ExportJobSerializer
+from .services import ExportNotAllowed, check_access, enqueue, normalize_filters
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    Plage demandée (en-tête Range, une seule plage) -> (début, fin incluse).
+
+    None si l'en-tête est absent ou non géré (réponse complète),
+    ValueError si la plage ne peut pas être servie (416).
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffixe: les N derniers octets
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+def iter_file_range(fileobj, start, end, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    try:
+        fileobj.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = fileobj.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        fileobj.close()
+
+
+class ExportJobViewSet(mixins.CreateModelMixin,
+                       mixins.ListModelMixin,
+                       mixins.RetrieveModelMixin,
+                       viewsets.GenericViewSet):
+    """ViewSet des exports en arrière-plan
+
+    - POST: créer un export (ou réutiliser un export identique récent)
+    - GET: suivre sa progression (aussi poussée par WebSocket `export_progress`)
+    - GET download/: télécharger le fichier, avec reprise (HTTP Range)
+    Chaque utilisateur ne voit que ses propres exports.
+    """
+    serializer_class = ExportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = ExportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        filters = normalize_filters(data.get('filters') or {})
+        object_id = data.get('object_id')
+
+        try:
+            check_access(request.user, data['resource'], data['export_format'], filters, object_id)
+        except ExportNotAllowed as exc:
+            raise PermissionDenied(str(exc))
+
+        job, reused = enqueue(request.user, data['resource'], data['export_format'], filters, object_id)
+        return Response(
+            ExportJobSerializer(job, context=self.get_serializer_context()).data,
+            status=status.HTTP_200_OK if reused else status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Télécharger le fichier (Range/If-Range pour reprendre un transfert)"""
+        job = self.get_object()
+        if not job.is_ready:
+            return Response(
+                {'error': "L'export n'est pas encore disponible.", 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        size = job.file_size if job.file_size is not None else job.file.size
+        etag = f'"export-{job.pk}-{size}-{int(job.finished_at.timestamp())}"'
+        filename = os.path.basename(job.file.name)
+
+        byte_range = None
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range == etag:
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        fileobj = job.file.open('rb')
+        if byte_range is None:
+            response = FileResponse(fileobj, as_attachment=True, filename=filename)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                iter_file_range(fileobj, start, end),
+                status=206,
+                content_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(job.finished_at.timestamp())
+        return response
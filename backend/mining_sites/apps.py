@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class MiningSitesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mining_sites'
+
+    def ready(self):
+        import mining_sites.geofences  # invalidation du registre des géofences
+        import mining_sites.tiles  # invalidation des tuiles de la carte
+        from mining_sites.sync import connect_signals
+
+        connect_signals()  # journal des changements synchronisés
@@ -0,0 +1,157 @@
+"""
+Registre des géofences (concessions des sites, zones de chantier)
+
+Les polygones sont compilés une fois par processus (geometry.CompiledPolygon)
+et gardés en mémoire, avec l'index spatial qui les localise
+(spatial.SpatialIndex, construit à la première recherche). Le cache partagé ne porte qu'un numéro de version:
+
+    geofences:ver  -> numéro de version
+
+La modification d'un site ou d'une zone incrémente la version après le
+commit; chaque processus recompile le registre à sa prochaine lecture.
+Les opérations en masse (queryset.update, bulk_create) ne déclenchent pas
+les signaux: appeler `invalidate()` après coup.
+"""
+
+import threading
+from functools import cached_property
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from operations.models import WorkZone
+
+from .geometry import CompiledPolygon
+from .models import MiningSite
+from .spatial import SpatialIndex
+
+
+VERSION_KEY = 'geofences:ver'
+
+_lock = threading.Lock()
+_registry = None
+
+
+class GeofenceRegistry:
+    """Polygones compilés: concessions par site, zones actives par site"""
+
+    def __init__(self, version):
+        self.version = version
+        self.sites = {}
+        # Sites sans concession exploitable: point central, pour les plus proches
+        self.site_points = {}
+        for site_id, geojson, lat, lon in MiningSite.objects.values_list(
+            'id', 'concession_geojson', 'latitude', 'longitude'
+        ):
+            compiled = CompiledPolygon.from_geojson(geojson)
+            if compiled is not None:
+                self.sites[site_id] = compiled
+            elif lat is not None and lon is not None:
+                self.site_points[site_id] = (float(lat), float(lon))
+        self.zones = {}
+        for zone_id, site_id, geojson in (
+            WorkZone.objects.filter(is_active=True).exclude(zone_geojson__isnull=True)
+            .order_by('site_id', 'code').values_list('id', 'site_id', 'zone_geojson')
+        ):
+            compiled = CompiledPolygon.from_geojson(geojson)
+            if compiled is not None:
+                self.zones.setdefault(site_id, []).append((zone_id, compiled))
+
+    def site(self, site_id):
+        """Concession compilée d'un site (None: pas de polygone exploitable)"""
+        return self.sites.get(site_id)
+
+    def site_zones(self, site_id):
+        """[(zone_id, polygone compilé)] des zones actives d'un site"""
+        return self.zones.get(site_id, [])
+
+    @cached_property
+    def index(self):
+        """Index spatial (grille) des concessions et zones"""
+        return SpatialIndex(
+            self.sites, self.zones, self.site_points,
+            cell_degrees=getattr(settings, 'GEOFENCE_GRID_CELL_DEGREES', 0.05),
+        )
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # add() ne remplace pas une version posée entre-temps par un autre processus
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def registry():
+    """Registre à jour (recompilé si un polygone a changé depuis le dernier chargement)"""
+    global _registry
+    version = _current_version()
+    current = _registry
+    if current is None or current.version != version:
+        with _lock:
+            if _registry is None or _registry.version != version:
+                _registry = GeofenceRegistry(version)
+            current = _registry
+    return current
+
+
+def site_polygon(site):
+    """
+    Concession compilée d'un site: celle du registre pour un site
+    enregistré, compilée à la volée pour une instance non enregistrée.
+    """
+    if site.pk is None:
+        return CompiledPolygon.from_geojson(site.concession_geojson)
+    return registry().site(site.pk)
+
+
+def points_in_concession(site, lats, lons):
+    """
+    Appartenance d'un lot de points (tableaux de latitudes et longitudes)
+    à la concession d'un site: tableau booléen.
+
+    Comme MiningSite.is_point_in_concession, un site sans polygone
+    exploitable (absent, type non pris en charge, mal formé) accepte tous
+    les points.
+    """
+    lats = np.asarray(lats, dtype=float).ravel()
+    lons = np.asarray(lons, dtype=float).ravel()
+    if lats.shape != lons.shape:
+        raise ValueError("Autant de latitudes que de longitudes sont attendues")
+    polygon = site_polygon(site)
+    if polygon is None:
+        return np.ones(len(lats), dtype=bool)
+    return polygon.contains(lats, lons)
+
+
+def locate(lat, lon, site_ids=None):
+    """Site et zone contenant un point GPS (voir SpatialIndex.locate)"""
+    return registry().index.locate(lat, lon, site_ids)
+
+
+def nearest_sites(lat, lon, k=5, site_ids=None):
+    """Les `k` sites les plus proches: [(site_id, distance_m)]"""
+    return registry().index.nearest(lat, lon, k, site_ids=site_ids)
+
+
+def invalidate():
+    """Forcer la recompilation du registre dans tous les processus"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Clé absente (expirée ou cache vidé): repartir d'une version neuve
+        cache.set(VERSION_KEY, _current_version() + 1, timeout=None)
+
+
+@receiver(post_save, sender=MiningSite)
+@receiver(post_delete, sender=MiningSite)
+@receiver(post_save, sender=WorkZone)
+@receiver(post_delete, sender=WorkZone)
+def _invalidate_on_change(sender, instance, **kwargs):
+    # Après commit: un lecteur ne doit pas recompiler un état non encore visible
+    transaction.on_commit(invalidate)
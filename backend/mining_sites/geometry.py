@@ -0,0 +1,151 @@
+"""
+Polygones GeoJSON compilés (SIG MG)
+
+Un Polygon ou MultiPolygon GeoJSON est converti une fois en tableaux NumPy
+d'arêtes (un bloc par polygone, anneau extérieur et trous ensemble) avec
+son emprise. Le test d'appartenance (ray casting, règle pair-impair: un
+point dans un trou croise deux anneaux) est vectorisé sur des lots de
+points, après un pré-filtrage par emprise.
+
+Les distances (en mètres) sont calculées dans une projection
+équirectangulaire locale centrée sur le point, suffisante à l'échelle d'un
+site.
+"""
+
+import numpy as np
+
+from nexus_backend.geo import EARTH_RADIUS_KM
+
+
+# Taille des blocs points x arêtes évalués en une opération
+CHUNK_CELLS = 2_000_000
+
+METERS_PER_DEGREE = np.radians(1.0) * EARTH_RADIUS_KM * 1000
+
+
+def bbox_distance_m(lat, lon, bboxes):
+    """
+    Distance (m) d'un point à des emprises (tableau (n, 4) de
+    min_lon, min_lat, max_lon, max_lat); 0 pour un point à l'intérieur.
+    Minore la distance aux géométries qu'elles contiennent.
+    """
+    dx = np.maximum(np.maximum(bboxes[:, 0] - lon, lon - bboxes[:, 2]), 0) * np.cos(np.radians(lat))
+    dy = np.maximum(np.maximum(bboxes[:, 1] - lat, lat - bboxes[:, 3]), 0)
+    return np.hypot(dx, dy) * METERS_PER_DEGREE
+
+
+def _ring(coordinates):
+    """Anneau GeoJSON [[lon, lat], ...] -> tableau (n, 2), fermé"""
+    ring = np.asarray([point[:2] for point in coordinates], dtype=float).reshape(-1, 2)
+    if len(ring) and not np.array_equal(ring[0], ring[-1]):
+        ring = np.vstack((ring, ring[:1]))
+    return ring
+
+
+class CompiledPolygon:
+    """Polygone ou multipolygone prêt pour des tests d'appartenance en lot"""
+
+    def __init__(self, polygons):
+        # polygons: liste de listes d'anneaux (extérieur puis trous)
+        self.parts = []
+        # Anneaux conservés ([lon, lat], fermés), pour le rendu (tuiles)
+        self.rings = []
+        for rings in polygons:
+            rings = [ring for ring in rings if len(ring) >= 4]
+            if not rings:
+                continue
+            self.rings.append(rings)
+            start = np.concatenate([ring[:-1] for ring in rings])
+            end = np.concatenate([ring[1:] for ring in rings])
+            exterior = rings[0]
+            self.parts.append({
+                'bbox': (*exterior.min(axis=0), *exterior.max(axis=0)),
+                'x1': start[:, 0], 'y1': start[:, 1],
+                'x2': end[:, 0], 'y2': end[:, 1],
+            })
+        if self.parts:
+            boxes = np.array([part['bbox'] for part in self.parts])
+            self.bbox = (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+        else:
+            self.bbox = None
+
+    @classmethod
+    def from_geojson(cls, geojson):
+        """
+        Compiler une géométrie (Polygon, MultiPolygon, ou Feature les
+        contenant). Retourne None si elle est absente, d'un autre type ou
+        mal formée.
+        """
+        if not isinstance(geojson, dict):
+            return None
+        if geojson.get('type') == 'Feature':
+            geojson = geojson.get('geometry') or {}
+        try:
+            coordinates = geojson.get('coordinates') or []
+            if geojson.get('type') == 'Polygon':
+                polygons = [coordinates]
+            elif geojson.get('type') == 'MultiPolygon':
+                polygons = coordinates
+            else:
+                return None
+            compiled = cls([[_ring(ring) for ring in polygon] for polygon in polygons])
+        except (TypeError, ValueError, IndexError, AttributeError):
+            return None
+        return compiled if compiled.parts else None
+
+    @property
+    def vertex_count(self):
+        return sum(len(part['x1']) for part in self.parts)
+
+    def contains(self, lats, lons):
+        """Tableau booléen: chaque point (lat, lon) est-il dans la géométrie?"""
+        lats = np.asarray(lats, dtype=float).ravel()
+        lons = np.asarray(lons, dtype=float).ravel()
+        inside = np.zeros(len(lats), dtype=bool)
+        if self.bbox is None or not len(lats):
+            return inside
+        for part in self.parts:
+            min_lon, min_lat, max_lon, max_lat = part['bbox']
+            candidates = np.flatnonzero(
+                (lons >= min_lon) & (lons <= max_lon) & (lats >= min_lat) & (lats <= max_lat) & ~inside
+            )
+            if len(candidates):
+                inside[candidates] = self._crossings_odd(part, lats[candidates], lons[candidates])
+        return inside
+
+    @staticmethod
+    def _crossings_odd(part, lats, lons):
+        x1, y1, x2, y2 = part['x1'], part['y1'], part['x2'], part['y2']
+        chunk = max(1, CHUNK_CELLS // len(x1))
+        result = np.empty(len(lats), dtype=bool)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for start in range(0, len(lats), chunk):
+                py = lats[start:start + chunk, None]
+                px = lons[start:start + chunk, None]
+                # Arêtes qui enjambent l'horizontale du point, à droite de celui-ci
+                spans = (y1 > py) != (y2 > py)
+                crossing_x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+                crossings = np.count_nonzero(spans & (px < crossing_x), axis=1)
+                result[start:start + chunk] = crossings % 2 == 1
+        return result
+
+    def contains_point(self, lat, lon):
+        return bool(self.contains([lat], [lon])[0])
+
+    def distance_m(self, lat, lon):
+        """Distance (m) du point au contour le plus proche; 0 à l'intérieur"""
+        if self.contains_point(lat, lon):
+            return 0.0
+        scale = np.cos(np.radians(lat))
+        best = np.inf
+        for part in self.parts:
+            # Arêtes en mètres, origine au point
+            x1 = (part['x1'] - lon) * scale
+            y1 = part['y1'] - lat
+            dx = (part['x2'] - lon) * scale - x1
+            dy = part['y2'] - lat - y1
+            length2 = dx * dx + dy * dy
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = np.where(length2 > 0, -(x1 * dx + y1 * dy) / length2, 0.0).clip(0.0, 1.0)
+            best = min(best, float(np.hypot(x1 + t * dx, y1 + t * dy).min()))
+        return best * METERS_PER_DEGREE
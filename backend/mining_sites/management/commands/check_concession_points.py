@@ -0,0 +1,72 @@
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from environment.models import EnvironmentalData
+from incidents.models import Incident
+from mining_sites.geofences import points_in_concession
+from mining_sites.models import MiningSite
+from operations.models import Operation, OperationPhoto
+
+
+# (libellé, modèle, chemin du site)
+SOURCES = (
+    ('Opérations', Operation, 'site_id'),
+    ('Incidents', Incident, 'site_id'),
+    ('Données environnementales', EnvironmentalData, 'site_id'),
+    ('Photos d\'opération', OperationPhoto, 'operation__site_id'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Contrôle en lot les coordonnées GPS historiques (opérations, incidents, "
+        "données environnementales, photos) contre les concessions des sites."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--site', type=int, help="Limiter le contrôle à un site")
+        parser.add_argument(
+            '--list', action='store_true', help="Afficher les identifiants des enregistrements hors concession",
+        )
+
+    def handle(self, *args, **options):
+        sites = MiningSite.objects.exclude(concession_geojson__isnull=True)
+        if options['site']:
+            sites = sites.filter(pk=options['site'])
+            if not sites.exists():
+                raise CommandError(f"Site {options['site']} introuvable ou sans concession.")
+        sites = {site.pk: site for site in sites}
+
+        started = time.perf_counter()
+        total = outside_total = 0
+        for label, model, site_path in SOURCES:
+            rows = defaultdict(list)
+            for pk, site_id, lat, lon in (
+                model.objects.filter(**{f'{site_path}__in': list(sites)})
+                .exclude(gps_latitude__isnull=True).exclude(gps_longitude__isnull=True)
+                .values_list('pk', site_path, 'gps_latitude', 'gps_longitude').iterator(chunk_size=10000)
+            ):
+                rows[site_id].append((pk, float(lat), float(lon)))
+
+            checked = outside = 0
+            for site_id, site_rows in rows.items():
+                points = np.array([row[1:] for row in site_rows])
+                inside = points_in_concession(sites[site_id], points[:, 0], points[:, 1])
+                offenders = np.flatnonzero(~inside)
+                checked += len(site_rows)
+                outside += len(offenders)
+                if options['list'] and len(offenders):
+                    ids = ', '.join(str(site_rows[index][0]) for index in offenders)
+                    self.stdout.write(f"  {label} hors concession ({sites[site_id].name}): {ids}")
+            total += checked
+            outside_total += outside
+            self.stdout.write(f"{label}: {checked} point(s) contrôlé(s), {outside} hors concession")
+
+        elapsed = time.perf_counter() - started
+        style = self.style.WARNING if outside_total else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{total} point(s) contrôlé(s) en {elapsed:.2f} s, {outside_total} hors concession."
+        ))
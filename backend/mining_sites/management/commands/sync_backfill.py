@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from mining_sites.sync import backfill
+
+
+class Command(BaseCommand):
+    help = (
+        "Journalise l'état courant des tables synchronisées avec les nœuds "
+        "distribués (mise en service de la synchronisation, ou après des "
+        "opérations en masse qui ne déclenchent pas les signaux)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--site', type=int, action='append', help="Limiter à un site (option répétable)")
+
+    def handle(self, *args, **options):
+        total = backfill(options['site'])
+        self.stdout.write(self.style.SUCCESS(f"{total} enregistrement(s) journalisé(s)."))
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.27 on 2026-10-19 19:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mining_sites', '0004_miningsite_commissioning_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncSequence',
+            fields=[
+                ('table', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Table')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Dernière valeur')),
+            ],
+            options={
+                'verbose_name': 'Séquence de synchronisation',
+                'verbose_name_plural': 'Séquences de synchronisation',
+            },
+        ),
+        migrations.AddField(
+            model_name='distributednode',
+            name='sync_cursor',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Curseur de synchronisation'),
+        ),
+        migrations.CreateModel(
+            name='SyncUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, verbose_name="Clé d'idempotence")),
+                ('table', models.CharField(max_length=100, verbose_name='Table')),
+                ('object_id', models.BigIntegerField(blank=True, null=True, verbose_name='Identifiant')),
+                ('result', models.JSONField(default=dict, verbose_name='Résultat')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('node', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_uploads', to='mining_sites.distributednode', verbose_name='Nœud')),
+            ],
+            options={
+                'verbose_name': 'Envoi de nœud',
+                'verbose_name_plural': 'Envois de nœuds',
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100, verbose_name='Table')),
+                ('object_id', models.BigIntegerField(verbose_name='Identifiant')),
+                ('seq', models.BigIntegerField(verbose_name='Séquence')),
+                ('operation', models.CharField(choices=[('UPSERT', 'Création / modification'), ('DELETE', 'Suppression')], max_length=10, verbose_name='Opération')),
+                ('changed_at', models.DateTimeField(auto_now=True, verbose_name='Date du changement')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_changes', to='mining_sites.miningsite', verbose_name='Site')),
+            ],
+            options={
+                'verbose_name': 'Changement synchronisé',
+                'verbose_name_plural': 'Changements synchronisés',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='syncupload',
+            constraint=models.UniqueConstraint(fields=('node', 'key'), name='sync_upload_unique_key'),
+        ),
+        migrations.AddIndex(
+            model_name='syncchange',
+            index=models.Index(fields=['site', 'table', 'seq'], name='sync_change_site_seq_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='syncchange',
+            constraint=models.UniqueConstraint(fields=('table', 'object_id'), name='sync_change_unique_object'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-19 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mining_sites', '0005_distributed_sync'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='syncchange',
+            name='sync_change_unique_object',
+        ),
+        migrations.AddConstraint(
+            model_name='syncchange',
+            constraint=models.UniqueConstraint(fields=('table', 'object_id', 'site'), name='sync_change_unique_object_site'),
+        ),
+    ]
@@ -142,57 +142,16 @@ class MiningSite(models.Model):
     def is_point_in_concession(self, lat, lon):
         """
         Vérifie si un point GPS (lat, lon) est à l'intérieur du polygone de concession.
-        Implémentation de l'algorithme de Ray Casting (Point in Polygon).
+        Ray casting sur les anneaux compilés et mis en cache (geofences);
+        un lot de points se vérifie avec geofences.points_in_concession.
         """
-        if not self.concession_geojson:
-            return True
+        from .geofences import points_in_concession
 
         try:
-            # Conversion en flottants pour la précision
-            lat = float(lat)
-            lon = float(lon)
-            
-            geojson = self.concession_geojson
-            geom_type = geojson.get('type')
-            coords = geojson.get('coordinates', [])
-
-            if geom_type == 'Polygon':
-                # Un polygone GeoJSON est une liste de "rings", le 1er est l'extérieur
-                return self._ray_casting(lat, lon, coords[0])
-            
-            elif geom_type == 'MultiPolygon':
-                # Un MultiPolygon est une liste de Polygones
-                for polygon_coords in coords:
-                    if self._ray_casting(lat, lon, polygon_coords[0]):
-                        return True
-                return False
-            
-            return True # Type non supporté, on autorise par défaut
-        except (ValueError, TypeError, IndexError, KeyError):
+            return bool(points_in_concession(self, [float(lat)], [float(lon)])[0])
+        except (ValueError, TypeError):
             return True # Erreur de format, on ne bloque pas l'utilisateur
 
-    def _ray_casting(self, lat, lon, ring):
-        """Algorithme de Ray Casting : compte les intersections avec les segments du polygone"""
-        n = len(ring)
-        inside = False
-        
-        # En GeoJSON, les points sont [longitude, latitude]
-        p1x, p1y = ring[0]
-        for i in range(1, n + 1):
-            p2x, p2y = ring[i % n]
-            
-            # Vérifie si le rayon horizontal depuis (lon, lat) intersecte le segment [p1, p2]
-            if lat > min(p1y, p2y):
-                if lat <= max(p1y, p2y):
-                    if lon <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (lat - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or lon <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-            
-        return inside
-
 
 class DistributedNode(models.Model):
     """
@@ -215,6 +174,8 @@ class DistributedNode(models.Model):
     cpu_usage = models.FloatField(default=0.0, verbose_name="Utilisation CPU (%)")
     memory_usage = models.FloatField(default=0.0, verbose_name="Utilisation RAM (%)")
     ai_model_version = models.CharField(max_length=50, default="v1.0-alpha")
+    # Curseur acquitté par le nœud (sync): {table: dernière séquence appliquée}
+    sync_cursor = models.JSONField(default=dict, blank=True, verbose_name="Curseur de synchronisation")
 
     def __str__(self):
         return f"Node {self.node_id} ({self.site.name})"
@@ -222,3 +183,77 @@ class DistributedNode(models.Model):
     class Meta:
         verbose_name = "Nœud Distribué"
         verbose_name_plural = "Nœuds Distribués"
+
+
+class SyncSequence(models.Model):
+    """Séquence monotone des changements d'une table synchronisée"""
+    table = models.CharField(max_length=100, primary_key=True, verbose_name="Table")
+    value = models.BigIntegerField(default=0, verbose_name="Dernière valeur")
+
+    def __str__(self):
+        return f"{self.table}: {self.value}"
+
+    class Meta:
+        verbose_name = "Séquence de synchronisation"
+        verbose_name_plural = "Séquences de synchronisation"
+
+
+class SyncChange(models.Model):
+    """
+    Dernier changement connu d'un enregistrement synchronisé, par site
+    (journal compacté: une ligne par enregistrement et par site, mise à
+    jour à chaque changement). Un enregistrement déplacé vers un autre site
+    garde sur l'ancien une ligne DELETE, pierre tombale pour ses nœuds.
+    """
+
+    class Operation(models.TextChoices):
+        UPSERT = 'UPSERT', 'Création / modification'
+        DELETE = 'DELETE', 'Suppression'
+
+    table = models.CharField(max_length=100, verbose_name="Table")
+    object_id = models.BigIntegerField(verbose_name="Identifiant")
+    site = models.ForeignKey(
+        MiningSite, on_delete=models.CASCADE,
+        related_name='sync_changes',
+        verbose_name="Site"
+    )
+    seq = models.BigIntegerField(verbose_name="Séquence")
+    operation = models.CharField(max_length=10, choices=Operation.choices, verbose_name="Opération")
+    changed_at = models.DateTimeField(auto_now=True, verbose_name="Date du changement")
+
+    def __str__(self):
+        return f"{self.table}#{self.object_id} @{self.seq} ({self.operation})"
+
+    class Meta:
+        verbose_name = "Changement synchronisé"
+        verbose_name_plural = "Changements synchronisés"
+        constraints = [
+            models.UniqueConstraint(fields=['table', 'object_id', 'site'], name='sync_change_unique_object_site'),
+        ]
+        indexes = [
+            models.Index(fields=['site', 'table', 'seq'], name='sync_change_site_seq_idx'),
+        ]
+
+
+class SyncUpload(models.Model):
+    """Changement envoyé par un nœud, mémorisé par clé d'idempotence"""
+    node = models.ForeignKey(
+        DistributedNode, on_delete=models.CASCADE,
+        related_name='sync_uploads',
+        verbose_name="Nœud"
+    )
+    key = models.CharField(max_length=100, verbose_name="Clé d'idempotence")
+    table = models.CharField(max_length=100, verbose_name="Table")
+    object_id = models.BigIntegerField(null=True, blank=True, verbose_name="Identifiant")
+    result = models.JSONField(default=dict, verbose_name="Résultat")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.node.node_id}: {self.key}"
+
+    class Meta:
+        verbose_name = "Envoi de nœud"
+        verbose_name_plural = "Envois de nœuds"
+        constraints = [
+            models.UniqueConstraint(fields=['node', 'key'], name='sync_upload_unique_key'),
+        ]
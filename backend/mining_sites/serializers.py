@@ -38,8 +38,10 @@ class DistributedNodeSerializer(serializers.ModelSerializer):
         model = DistributedNode
         fields = [
             'id', 'site', 'site_name', 'node_id', 'ip_address', 
-            'status', 'last_sync', 'cpu_usage', 'memory_usage', 'ai_model_version'
+            'status', 'last_sync', 'cpu_usage', 'memory_usage', 'ai_model_version',
+            'sync_cursor',
         ]
+        read_only_fields = ['last_sync', 'sync_cursor']
 
 
 class MiningSiteListSerializer(serializers.ModelSerializer):
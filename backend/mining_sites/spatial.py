@@ -0,0 +1,154 @@
+"""
+Index spatial des sites et zones de chantier (SIG MG)
+
+Grille uniforme en degrés sur les emprises des concessions et des zones
+actives du registre des géofences: chaque cellule liste les géométries
+dont l'emprise la recouvre. Localiser un point ne teste que les quelques
+géométries de sa cellule (O(1) en moyenne, quel que soit le nombre de
+sites); la recherche des plus proches parcourt les emprises par distance
+croissante et s'arrête dès que les suivantes ne peuvent plus faire mieux.
+
+Les sites sans concession exploitable y figurent par leur point central
+(latitude, longitude) pour la recherche des plus proches.
+
+L'index est construit avec le registre (mining_sites.geofences) et
+reconstruit avec lui quand un site ou une zone change.
+"""
+
+import heapq
+from collections import namedtuple
+from math import floor
+
+import numpy as np
+
+from .geometry import bbox_distance_m
+
+
+SITE = 'site'
+ZONE = 'zone'
+
+Location = namedtuple('Location', ['site_id', 'zone_id'])
+
+
+class SpatialIndex:
+    """Grille uniforme sur les concessions (et centres de sites) et les zones"""
+
+    def __init__(self, sites, zones, site_points=None, cell_degrees=0.05):
+        """
+        `sites`: {site_id: CompiledPolygon}; `zones`: {site_id: [(zone_id,
+        CompiledPolygon)]} dans l'ordre de priorité; `site_points`:
+        {site_id: (lat, lon)} des sites sans concession.
+        """
+        self.cell = float(cell_degrees)
+        self.kinds, self.ids, self.site_ids, self.polygons, boxes = [], [], [], [], []
+
+        def add(kind, pk, site_id, polygon, bbox):
+            self.kinds.append(kind)
+            self.ids.append(pk)
+            self.site_ids.append(site_id)
+            self.polygons.append(polygon)
+            boxes.append(bbox)
+
+        for site_id, polygon in sorted(sites.items()):
+            add(SITE, site_id, site_id, polygon, polygon.bbox)
+        for site_id, (lat, lon) in sorted((site_points or {}).items()):
+            add(SITE, site_id, site_id, None, (lon, lat, lon, lat))
+        for site_id, site_zones in sorted(zones.items()):
+            for zone_id, polygon in site_zones:
+                add(ZONE, zone_id, site_id, polygon, polygon.bbox)
+
+        self.bboxes = np.array(boxes, dtype=float).reshape(-1, 4)
+        self.kind_array = np.array(self.kinds, dtype=object)
+        self.site_array = np.array(self.site_ids, dtype=np.int64)
+
+        # Cellule -> indices des géométries (polygones seulement) qui la recouvrent
+        self.cells = {}
+        for index, polygon in enumerate(self.polygons):
+            if polygon is None:
+                continue
+            min_lon, min_lat, max_lon, max_lat = self.bboxes[index]
+            for x in range(self._cell(min_lon), self._cell(max_lon) + 1):
+                for y in range(self._cell(min_lat), self._cell(max_lat) + 1):
+                    self.cells.setdefault((x, y), []).append(index)
+
+    def _cell(self, degrees):
+        return floor(degrees / self.cell)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def intersecting(self, bbox):
+        """Indices des géométries dont l'emprise recoupe `bbox` (min_lon, min_lat, max_lon, max_lat)"""
+        min_lon, min_lat, max_lon, max_lat = bbox
+        return np.flatnonzero(
+            (self.bboxes[:, 0] <= max_lon) & (self.bboxes[:, 2] >= min_lon)
+            & (self.bboxes[:, 1] <= max_lat) & (self.bboxes[:, 3] >= min_lat)
+        )
+
+    def bbox_of(self, kind, pk):
+        """Emprise indexée d'un site ou d'une zone (None s'il n'est pas indexé)"""
+        for index, (entry_kind, entry_id) in enumerate(zip(self.kinds, self.ids)):
+            if entry_kind == kind and entry_id == pk:
+                return tuple(self.bboxes[index])
+        return None
+
+    def locate(self, lat, lon, site_ids=None):
+        """
+        Site et zone contenant le point: Location(site_id, zone_id), None
+        quand aucun. `site_ids` limite la recherche à ces sites. Une zone
+        du site trouvé l'emporte; une zone seule donne aussi son site.
+        """
+        lat, lon = float(lat), float(lon)
+        allowed = None if site_ids is None else set(site_ids)
+        site_id = None
+        zones = []
+        for index in self.cells.get((self._cell(lon), self._cell(lat)), ()):
+            if allowed is not None and self.site_ids[index] not in allowed:
+                continue
+            min_lon, min_lat, max_lon, max_lat = self.bboxes[index]
+            if not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+                continue
+            if self.kinds[index] == SITE:
+                if site_id is None and self.polygons[index].contains_point(lat, lon):
+                    site_id = self.ids[index]
+            elif self.polygons[index].contains_point(lat, lon):
+                zones.append((self.site_ids[index], self.ids[index]))
+
+        zone_id = None
+        for zone_site_id, candidate in zones:
+            if site_id is None or zone_site_id == site_id:
+                site_id, zone_id = zone_site_id, candidate
+                break
+        return Location(site_id, zone_id)
+
+    def nearest(self, lat, lon, k=5, kind=SITE, site_ids=None):
+        """
+        Les `k` sites (ou zones) les plus proches: [(id, distance_m)] par
+        distance croissante, 0 pour une géométrie contenant le point.
+        `site_ids` limite la recherche à ces sites.
+        """
+        lat, lon = float(lat), float(lon)
+        mask = self.kind_array == kind
+        if site_ids is not None:
+            mask &= np.isin(self.site_array, list(site_ids))
+        candidates = np.flatnonzero(mask)
+        if not len(candidates) or k < 1:
+            return []
+
+        # Distance aux emprises: minorant, pour parcourir par distance croissante
+        bounds = bbox_distance_m(lat, lon, self.bboxes[candidates])
+        order = np.argsort(bounds, kind='stable')
+        best = []  # tas max (distance négative) des k meilleurs
+        for position in order:
+            if len(best) == k and bounds[position] > -best[0][0]:
+                break
+            index = candidates[position]
+            polygon = self.polygons[index]
+            distance = bounds[position] if polygon is None else polygon.distance_m(lat, lon)
+            item = (-float(distance), -index)
+            if len(best) < k:
+                heapq.heappush(best, item)
+            elif item > best[0]:
+                heapq.heapreplace(best, item)
+
+        return [(self.ids[-index], round(-distance, 1)) for distance, index in sorted(best, reverse=True)]
@@ -0,0 +1,413 @@
+"""
+Synchronisation différentielle des nœuds distribués (DistributedNode)
+
+Journal des changements
+    Chaque enregistrement d'une table synchronisée (SYNC_TABLES, modèles
+    rattachés à un site) a une ligne SyncChange par site: dernière opération
+    (UPSERT/DELETE) et numéro de séquence de sa table. Un enregistrement
+    changé de site reçoit une suppression sur l'ancien (site relu en base
+    avant l'écriture) et une création sur le nouveau. La séquence d'une
+    table (SyncSequence) est incrémentée dans la transaction de la
+    modification: sa ligne reste verrouillée jusqu'au commit, si bien que
+    les changements d'une table deviennent visibles dans l'ordre de leurs
+    numéros et qu'un curseur ne saute jamais un changement validé plus
+    tard.
+
+Réception (nœud <- serveur)
+    Le nœud présente son curseur {table: séquence} (jeton opaque) et reçoit
+    les changements de son site postérieurs, en NDJSON compressé (gzip):
+    une ligne par changement ('upsert' avec les colonnes de
+    l'enregistrement, 'delete' pour une suppression), puis une ligne de fin
+    portant le curseur suivant. Présenter un curseur acquitte les
+    changements qui le précèdent: le serveur l'enregistre avec last_sync.
+
+Envoi (nœud -> serveur)
+    Les changements locaux (UPLOAD_TABLES) sont envoyés avec une clé
+    d'idempotence: une clé déjà traitée renvoie le résultat mémorisé
+    (SyncUpload) sans rien réappliquer. Chaque changement passe les
+    contrôles de rôle de l'API de sa table (création, modification ou
+    suppression, y compris sur l'objet). Une modification portant une
+    séquence de base plus ancienne que le dernier changement serveur de
+    l'enregistrement est refusée en conflit. Chaque changement appliqué
+    renvoie la séquence qu'il a reçue (`seq`): le nœud en fait la séquence
+    de base de ses modifications suivantes de l'enregistrement, sans
+    attendre la réception suivante.
+
+Les opérations en masse (queryset.update, bulk_create) ne déclenchent pas
+les signaux: appeler `record_change()` pour les enregistrements concernés,
+ou `sync_backfill` pour tout reconstruire.
+"""
+
+import base64
+import binascii
+import gzip
+import json
+from importlib import import_module
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from accounts.lock_registry import is_locked
+from accounts.permissions import CanManageEnvironment, CanManageIncidents, CanManageOperations
+
+from .models import SyncChange, SyncSequence, SyncUpload
+
+
+# Tables synchronisées (modèles avec un champ `site`) et colonnes dont la
+# seule modification ne produit pas de changement (positions GPS temps réel)
+SYNC_TABLES = {
+    'operations.WorkZone': {},
+    'operations.Shift': {},
+    'operations.Operation': {},
+    'incidents.Incident': {},
+    'environment.EnvironmentalThreshold': {},
+    'environment.EnvironmentalData': {},
+    'personnel.Personnel': {},
+    'equipment.Equipment': {
+        'volatile': {'last_latitude', 'last_longitude', 'current_speed', 'last_position_update'},
+    },
+}
+
+# Tables modifiables par un nœud: serializer de validation, champ auteur,
+# permission de l'API de la table
+UPLOAD_TABLES = {
+    'operations.Operation': ('operations.serializers.OperationSerializer', 'created_by', CanManageOperations),
+    'incidents.Incident': ('incidents.serializers.IncidentSerializer', 'reported_by', CanManageIncidents),
+    'environment.EnvironmentalData': (
+        'environment.serializers.EnvironmentalDataSerializer', 'recorded_by', CanManageEnvironment,
+    ),
+}
+
+# Opération envoyée -> méthode HTTP équivalente pour les permissions
+UPLOAD_METHODS = {'create': 'POST', 'update': 'PATCH', 'delete': 'DELETE'}
+
+
+class CursorError(ValueError):
+    pass
+
+
+# ── Journal des changements ────────────────────────────────────────────
+
+def next_seq(table, count=1):
+    """
+    Réserver `count` numéros de séquence d'une table; retourne le dernier.
+    La ligne de séquence reste verrouillée jusqu'à la fin de la transaction
+    appelante.
+    """
+    if not SyncSequence.objects.filter(table=table).update(value=F('value') + count):
+        # Première utilisation (ou créée entre-temps par une autre transaction)
+        SyncSequence.objects.bulk_create([SyncSequence(table=table)], ignore_conflicts=True)
+        SyncSequence.objects.filter(table=table).update(value=F('value') + count)
+    return SyncSequence.objects.values_list('value', flat=True).get(table=table)
+
+
+def _upsert_changes(changes):
+    # bulk_create: pas de signaux (ni d'entrée d'audit par changement)
+    SyncChange.objects.bulk_create(
+        changes, batch_size=1000, update_conflicts=True, unique_fields=['table', 'object_id', 'site'],
+        update_fields=['seq', 'operation', 'changed_at'],
+    )
+
+
+def record_change(table, object_id, site_id, operation, previous_site_id=None):
+    """
+    Enregistrer le dernier changement d'un enregistrement synchronisé; s'il
+    a quitté `previous_site_id`, une suppression y est aussi journalisée
+    """
+    changes = [(site_id, operation)]
+    if previous_site_id is not None and previous_site_id != site_id:
+        changes.insert(0, (previous_site_id, SyncChange.Operation.DELETE))
+    changes = [(site, op) for site, op in changes if site is not None]
+    if not changes:
+        return
+    with transaction.atomic():
+        last = next_seq(table, len(changes))
+        _upsert_changes([
+            SyncChange(table=table, object_id=object_id, site_id=site, seq=last - len(changes) + 1 + offset, operation=op)
+            for offset, (site, op) in enumerate(changes)
+        ])
+
+
+def _is_volatile(table, update_fields):
+    volatile = SYNC_TABLES[table].get('volatile')
+    return bool(update_fields and volatile and set(update_fields) <= volatile)
+
+
+def _remember_site(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Site enregistré avant l'écriture (déplacement -> pierre tombale)
+    instance._sync_previous_site_id = None
+    if raw or instance.pk is None or (update_fields and 'site' not in update_fields):
+        return
+    instance._sync_previous_site_id = (
+        sender.objects.filter(pk=instance.pk).values_list('site_id', flat=True).first()
+    )
+
+
+def _on_save(sender, instance, update_fields=None, **kwargs):
+    table = sender._meta.label
+    if _is_volatile(table, update_fields):
+        return
+    record_change(
+        table, instance.pk, instance.site_id, SyncChange.Operation.UPSERT,
+        previous_site_id=getattr(instance, '_sync_previous_site_id', None),
+    )
+    instance._sync_previous_site_id = None
+
+
+def _on_delete(sender, instance, **kwargs):
+    record_change(sender._meta.label, instance.pk, instance.site_id, SyncChange.Operation.DELETE)
+
+
+def connect_signals():
+    for table in SYNC_TABLES:
+        model = apps.get_model(table)
+        pre_save.connect(_remember_site, sender=model, dispatch_uid=f'sync-site-{table}')
+        post_save.connect(_on_save, sender=model, dispatch_uid=f'sync-save-{table}')
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=f'sync-delete-{table}')
+
+
+# ── Curseurs ───────────────────────────────────────────────────────────
+
+def encode_cursor(cursor):
+    raw = json.dumps(cursor, separators=(',', ':'), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Jeton -> {table: séquence} (CursorError si illisible)"""
+    if not token:
+        return {}
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorError(token)
+    if not isinstance(cursor, dict) or not all(
+        table in SYNC_TABLES and isinstance(seq, int) and seq >= 0 for table, seq in cursor.items()
+    ):
+        raise CursorError(token)
+    return cursor
+
+
+# ── Réception ──────────────────────────────────────────────────────────
+
+def changes_since(site_id, cursor, limit):
+    """
+    Changements du site postérieurs au curseur, table par table, au plus
+    `limit`. Retourne (lignes NDJSON, curseur suivant, reste-t-il des changements).
+    """
+    cursor = dict(cursor)
+    lines = []
+    has_more = False
+    for table in SYNC_TABLES:
+        remaining = limit - len(lines)
+        changes = list(
+            SyncChange.objects.filter(site_id=site_id, table=table, seq__gt=cursor.get(table, 0))
+            .order_by('seq').values_list('seq', 'object_id', 'operation')[:remaining + 1]
+        )
+        if len(changes) > remaining:
+            changes = changes[:remaining]
+            has_more = True
+        if not changes:
+            if has_more:
+                break
+            continue
+
+        model = apps.get_model(table)
+        upserts = [object_id for _seq, object_id, operation in changes if operation == SyncChange.Operation.UPSERT]
+        rows = {row['id']: row for row in model.objects.filter(pk__in=upserts, site_id=site_id).values()}
+        for seq, object_id, operation in changes:
+            row = rows.get(object_id) if operation == SyncChange.Operation.UPSERT else None
+            if row is None:
+                # Supprimé ou déplacé (éventuellement depuis le changement): pierre tombale
+                lines.append({'table': table, 'seq': seq, 'op': 'delete', 'id': object_id})
+            else:
+                lines.append({'table': table, 'seq': seq, 'op': 'upsert', 'id': object_id, 'data': row})
+        cursor[table] = changes[-1][0]
+        if has_more:
+            break
+    return lines, cursor, has_more
+
+
+def ndjson(lines, compress=True):
+    body = ''.join(json.dumps(line, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n' for line in lines).encode()
+    return gzip.compress(body, mtime=0) if compress else body
+
+
+def acknowledge(node, cursor):
+    """Le nœud a appliqué les changements jusqu'à `cursor`: dernière synchronisation"""
+    node.sync_cursor = cursor
+    node.last_sync = timezone.now()
+    node.status = 'ONLINE'
+    node.save(update_fields=['sync_cursor', 'last_sync', 'status'])
+
+
+# ── Envoi ──────────────────────────────────────────────────────────────
+
+def _serializer_class(table):
+    module, name = UPLOAD_TABLES[table][0].rsplit('.', 1)
+    return getattr(import_module(module), name)
+
+
+class _MethodRequest:
+    """Requête d'envoi vue avec la méthode HTTP d'un changement (permissions)"""
+
+    def __init__(self, request, method):
+        self._request = request
+        self.method = method
+
+    def __getattr__(self, name):
+        return getattr(self._request, name)
+
+
+def _permitted(table, action, request, instance=None):
+    """Contrôles de rôle de l'API de la table pour ce changement"""
+    permission = UPLOAD_TABLES[table][2]()
+    request = _MethodRequest(request, UPLOAD_METHODS[action])
+    if not permission.has_permission(request, None):
+        return False
+    return instance is None or permission.has_object_permission(request, None, instance)
+
+
+def _current_seq(table, object_id, site_id):
+    """Séquence du dernier changement d'un enregistrement sur un site"""
+    return (
+        SyncChange.objects.filter(table=table, object_id=object_id, site_id=site_id)
+        .values_list('seq', flat=True).first()
+    )
+
+
+def _apply(node, item, request):
+    """Appliquer un changement envoyé par un nœud. Retourne le résultat (dict)"""
+    table, operation, object_id = item['table'], item['op'], item.get('id')
+    model = apps.get_model(table)
+    instance = None
+    if object_id is not None:
+        instance = model.objects.filter(pk=object_id, site_id=node.site_id).first()
+        if instance is None:
+            return {'status': 'error', 'errors': {'id': ["Enregistrement introuvable sur ce site."]}}
+
+    action = 'delete' if operation == 'delete' else ('create' if instance is None else 'update')
+    if not _permitted(table, action, request, instance):
+        return {'status': 'forbidden', 'errors': {
+            'non_field_errors': ["Vous n'avez pas la permission d'effectuer cette action."],
+        }}
+
+    if instance is not None:
+        if is_locked(table, instance.pk):
+            return {'status': 'error', 'errors': {'id': ["Enregistrement verrouillé."]}}
+        base_seq = item.get('base_seq')
+        if base_seq is not None:
+            current = _current_seq(table, instance.pk, node.site_id)
+            if current is not None and current > base_seq:
+                return {'status': 'conflict', 'id': instance.pk, 'seq': current}
+
+    if operation == 'delete':
+        if instance is None:
+            return {'status': 'error', 'errors': {'id': ["Identifiant requis pour une suppression."]}}
+        instance.delete()
+        return {'status': 'deleted', 'id': object_id, 'seq': _current_seq(table, object_id, node.site_id)}
+
+    data = dict(item.get('data') or {})
+    data['site'] = node.site_id
+    serializer = _serializer_class(table)(
+        instance, data=data, partial=instance is not None, context={'request': request},
+    )
+    if not serializer.is_valid():
+        return {'status': 'error', 'errors': serializer.errors}
+    if instance is None:
+        saved = serializer.save(**{UPLOAD_TABLES[table][1]: request.user})
+        return {'status': 'created', 'id': saved.pk, 'seq': _current_seq(table, saved.pk, node.site_id)}
+    saved = serializer.save()
+    return {'status': 'updated', 'id': saved.pk, 'seq': _current_seq(table, saved.pk, node.site_id)}
+
+
+def _invalid(item):
+    """Erreurs de forme d'un changement envoyé (None s'il est bien formé)"""
+    if not isinstance(item, dict):
+        return {'non_field_errors': ["Objet attendu."]}
+    errors = {}
+    key = item.get('key')
+    if not isinstance(key, str) or not key or len(key) > 100:
+        errors['key'] = ["Clé d'idempotence requise (100 caractères au plus)."]
+    if item.get('table') not in UPLOAD_TABLES:
+        errors['table'] = [f"Tables acceptées: {', '.join(UPLOAD_TABLES)}"]
+    if item.get('op') not in ('upsert', 'delete'):
+        errors['op'] = ["Valeurs possibles: upsert, delete"]
+    if item.get('id') is not None and not isinstance(item.get('id'), int):
+        errors['id'] = ["Identifiant entier attendu."]
+    return errors or None
+
+
+def apply_uploads(node, items, request):
+    """
+    Appliquer les changements envoyés par un nœud, chacun dans sa propre
+    transaction avec sa clé d'idempotence. Retourne un résultat par
+    changement, dans l'ordre.
+    """
+    keys = [item.get('key') for item in items if isinstance(item, dict)]
+    seen = {
+        upload.key: upload.result
+        for upload in SyncUpload.objects.filter(node=node, key__in=[key for key in keys if isinstance(key, str)])
+    }
+    results = []
+    for index, item in enumerate(items):
+        errors = _invalid(item)
+        if errors:
+            results.append({'index': index, 'status': 'error', 'errors': errors})
+            continue
+        key = item['key']
+        if key in seen:
+            results.append({'index': index, 'key': key, **seen[key], 'duplicate': True})
+            continue
+        try:
+            with transaction.atomic():
+                result = _apply(node, item, request)
+                if result['status'] in ('created', 'updated', 'deleted'):
+                    SyncUpload.objects.create(
+                        node=node, key=key, table=item['table'], object_id=result.get('id'), result=result,
+                    )
+                    seen[key] = result
+        except IntegrityError:
+            # Même clé appliquée entre-temps par un envoi concurrent
+            upload = SyncUpload.objects.filter(node=node, key=key).first()
+            if upload is None:
+                raise
+            result = {**upload.result, 'duplicate': True}
+        results.append({'index': index, 'key': key, **result})
+
+    if any(result['status'] in ('created', 'updated', 'deleted') for result in results):
+        node.last_sync = timezone.now()
+        node.status = 'ONLINE'
+        node.save(update_fields=['last_sync', 'status'])
+    return results
+
+
+def backfill(site_ids=None):
+    """
+    Journaliser l'état courant de toutes les tables synchronisées (mise en
+    service, ou après des opérations en masse), une transaction par table.
+    Retourne le nombre d'enregistrements journalisés.
+    """
+    total = 0
+    for table in SYNC_TABLES:
+        queryset = apps.get_model(table).objects.exclude(site__isnull=True)
+        if site_ids is not None:
+            queryset = queryset.filter(site_id__in=site_ids)
+        with transaction.atomic():
+            rows = list(queryset.order_by('pk').values_list('pk', 'site_id'))
+            if not rows:
+                continue
+            first = next_seq(table, len(rows)) - len(rows) + 1
+            _upsert_changes([
+                SyncChange(
+                    table=table, object_id=pk, site_id=site_id, seq=first + offset,
+                    operation=SyncChange.Operation.UPSERT,
+                )
+                for offset, (pk, site_id) in enumerate(rows)
+            ])
+        total += len(rows)
+    return total
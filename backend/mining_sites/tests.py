@@ -1,3 +1,494 @@
-from django.test import TestCase
+import gzip
+import json
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from equipment.models import Equipment
+from incidents.models import Incident
+from operations.models import WorkZone
+from operations.serializers import OperationSerializer
+
+from . import geofences
+from .geometry import CompiledPolygon, bbox_distance_m
+from .models import DistributedNode, MiningSite, SyncChange, SyncUpload
+from .spatial import Location, SpatialIndex
+from .sync import CursorError, changes_since, decode_cursor, encode_cursor
+from .tiles import _tile_x, _tile_y
+
+
+def incident_data(code):
+    return {
+        'incident_code': code, 'incident_type': 'OTHER', 'severity': 'LOW',
+        'date': '2026-10-01', 'description': 'Signalé depuis le nœud',
+    }
+
+
+def square(min_lon, min_lat, max_lon, max_lat):
+    """Anneau GeoJSON [lon, lat] d'un rectangle"""
+    return [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+
+
+# Concession de 0,2° de côté trouée en son centre
+CONCESSION = {'type': 'Polygon', 'coordinates': [
+    square(-13.1, 9.4, -12.9, 9.6), square(-13.02, 9.48, -12.98, 9.52),
+]}
+
+
+def compiled(*rings):
+    return CompiledPolygon.from_geojson({'type': 'Polygon', 'coordinates': list(rings)})
+
+
+class SyncTestMixin:
+
+    def setUp(self):
+        self.site = MiningSite.objects.create(name="Site A", code="SYNC-A", location="A")
+        self.other_site = MiningSite.objects.create(name="Site B", code="SYNC-B", location="B")
+        self.node = DistributedNode.objects.create(site=self.site, node_id='NODE-A')
+        self.admin = User.objects.create_user(email='admin@example.com', password='x', role='ADMIN')
+
+    def create_incident(self, code, site=None):
+        return Incident.objects.create(site=site or self.site, **incident_data(code))
+
+    def changes(self, site, cursor=None, limit=100):
+        lines, cursor, has_more = changes_since(site.pk, cursor or {}, limit)
+        return [(line['op'], line['id']) for line in lines], cursor, has_more
+
+
+class SyncJournalTests(SyncTestMixin, TestCase):
+    """Curseurs, pagination et pierres tombales du journal"""
+
+    def test_cursor_pages_and_resumes(self):
+        incidents = [self.create_incident(f'INC-{index}') for index in range(5)]
+        first, cursor, has_more = self.changes(self.site, limit=3)
+        self.assertEqual(first, [('upsert', incident.pk) for incident in incidents[:3]])
+        self.assertTrue(has_more)
+
+        rest, cursor, has_more = self.changes(self.site, cursor)
+        self.assertEqual(rest, [('upsert', incident.pk) for incident in incidents[3:]])
+        self.assertFalse(has_more)
+        self.assertEqual(self.changes(self.site, cursor)[0], [])
+        self.assertEqual(decode_cursor(encode_cursor(cursor)), cursor)
+
+    def test_changes_are_scoped_to_the_site(self):
+        self.create_incident('INC-B', site=self.other_site)
+        self.assertEqual(self.changes(self.site)[0], [])
+
+    def test_update_replaces_earlier_change(self):
+        incident = self.create_incident('INC-1')
+        _, cursor, _ = self.changes(self.site)
+        incident.description = 'Modifié'
+        incident.save()
+        self.assertEqual(self.changes(self.site, cursor)[0], [('upsert', incident.pk)])
+        self.assertEqual(SyncChange.objects.filter(object_id=incident.pk).count(), 1)
+
+    def test_delete_leaves_tombstone(self):
+        incident = self.create_incident('INC-1')
+        _, cursor, _ = self.changes(self.site)
+        pk = incident.pk
+        incident.delete()
+        self.assertEqual(self.changes(self.site, cursor)[0], [('delete', pk)])
+
+    def test_moved_record_leaves_tombstone_on_previous_site(self):
+        incident = self.create_incident('INC-1')
+        _, cursor_a, _ = self.changes(self.site)
+        _, cursor_b, _ = self.changes(self.other_site)
+        incident.site = self.other_site
+        incident.save()
+        self.assertEqual(self.changes(self.site, cursor_a)[0], [('delete', incident.pk)])
+        self.assertEqual(self.changes(self.other_site, cursor_b)[0], [('upsert', incident.pk)])
+
+        # Retour sur le site d'origine
+        _, cursor_a, _ = self.changes(self.site, cursor_a)
+        _, cursor_b, _ = self.changes(self.other_site, cursor_b)
+        incident.site = self.site
+        incident.save()
+        self.assertEqual(self.changes(self.site, cursor_a)[0], [('upsert', incident.pk)])
+        self.assertEqual(self.changes(self.other_site, cursor_b)[0], [('delete', incident.pk)])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(CursorError):
+            decode_cursor('pas-un-curseur')
+
+    def test_changes_endpoint_returns_gzipped_ndjson(self):
+        incident = self.create_incident('INC-1')
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get(
+            f'/api/distributed-nodes/{self.node.pk}/changes/', HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in gzip.decompress(response.content).decode().splitlines()]
+        self.assertEqual(lines[0]['id'], incident.pk)
+        self.assertEqual(lines[-1]['cursor'], response['X-Sync-Cursor'])
+
+
+class SyncUploadTests(SyncTestMixin, TestCase):
+    """Envoi des changements d'un nœud: idempotence et rôles"""
+
+    def upload(self, user, changes):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(
+            f'/api/distributed-nodes/{self.node.pk}/upload/', {'changes': changes}, format='json',
+        )
+
+    def user(self, role):
+        user = User.objects.create_user(email=f'{role.lower()}@example.com', password='x', role=role)
+        user.assigned_sites.add(self.site)
+        return user
+
+    def upload_ndjson(self, body):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        return client.post(
+            f'/api/distributed-nodes/{self.node.pk}/upload/', gzip.compress(body),
+            content_type='application/x-ndjson', HTTP_CONTENT_ENCODING='gzip',
+        )
+
+    def test_gzipped_ndjson_upload(self):
+        change = {'key': 'k1', 'table': 'incidents.Incident', 'op': 'upsert', 'data': incident_data('INC-G')}
+        response = self.upload_ndjson(json.dumps(change).encode() + b'\n')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Incident.objects.filter(incident_code='INC-G').exists())
+
+    @override_settings(SYNC_MAX_UPLOAD_BYTES=1024)
+    def test_decompressed_size_is_bounded(self):
+        response = self.upload_ndjson(b'\n' * 1025)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('octets au plus', str(response.data['changes']))
+        # À la limite: décompressé puis lu (aucun changement)
+        response = self.upload_ndjson(b'\n' * 1024)
+        self.assertIn('non vide', str(response.data['changes']))
+
+    def test_truncated_gzip_is_refused(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post(
+            f'/api/distributed-nodes/{self.node.pk}/upload/', gzip.compress(b'{}\n' * 100)[:20],
+            content_type='application/x-ndjson', HTTP_CONTENT_ENCODING='gzip',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(str(response.data['changes']), 'NDJSON illisible')
+
+    def test_upload_is_idempotent(self):
+        change = {'key': 'k1', 'table': 'incidents.Incident', 'op': 'upsert', 'data': incident_data('INC-N1')}
+        first = self.upload(self.admin, [change])
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data['results'][0]['status'], 'created')
+
+        again = self.upload(self.admin, [change])
+        self.assertEqual(again.status_code, 200)
+        self.assertTrue(again.data['results'][0]['duplicate'])
+        self.assertEqual(Incident.objects.filter(incident_code='INC-N1').count(), 1)
+        self.assertEqual(SyncUpload.objects.filter(node=self.node, key='k1').count(), 1)
+
+    def test_stale_base_seq_conflicts(self):
+        incident = self.create_incident('INC-1')
+        _, cursor, _ = self.changes(self.site)
+        incident.description = 'Modifié sur le serveur'
+        incident.save()
+        response = self.upload(self.admin, [{
+            'key': 'k1', 'table': 'incidents.Incident', 'op': 'upsert', 'id': incident.pk,
+            'base_seq': cursor['incidents.Incident'], 'data': {'description': 'Modifié sur le nœud'},
+        }])
+        self.assertEqual(response.data['results'][0]['status'], 'conflict')
+        incident.refresh_from_db()
+        self.assertEqual(incident.description, 'Modifié sur le serveur')
+
+    def test_consecutive_uploads_advance_base_seq(self):
+        incident = self.create_incident('INC-1')
+        _, cursor, _ = self.changes(self.site)
+        base_seq = cursor['incidents.Incident']
+        for index in range(2):
+            response = self.upload(self.admin, [{
+                'key': f'k{index}', 'table': 'incidents.Incident', 'op': 'upsert', 'id': incident.pk,
+                'base_seq': base_seq, 'data': {'description': f'Modification {index}'},
+            }])
+            result = response.data['results'][0]
+            self.assertEqual(result['status'], 'updated')
+            self.assertGreater(result['seq'], base_seq)
+            base_seq = result['seq']
+        incident.refresh_from_db()
+        self.assertEqual(incident.description, 'Modification 1')
+        self.assertEqual(SyncUpload.objects.get(key='k1').result['seq'], base_seq)
+
+        # Séquence de base d'avant la première modification: conflit
+        response = self.upload(self.admin, [{
+            'key': 'k2', 'table': 'incidents.Incident', 'op': 'upsert', 'id': incident.pk,
+            'base_seq': cursor['incidents.Incident'], 'data': {'description': 'Périmée'},
+        }])
+        self.assertEqual(response.data['results'][0]['status'], 'conflict')
+
+    def test_read_only_roles_cannot_write(self):
+        incident = self.create_incident('INC-1')
+        for role in ('ANALYST', 'MMG'):
+            response = self.upload(self.user(role), [
+                {'key': f'{role}-c', 'table': 'incidents.Incident', 'op': 'upsert', 'data': incident_data(f'INC-{role}')},
+                {'key': f'{role}-u', 'table': 'incidents.Incident', 'op': 'upsert', 'id': incident.pk,
+                 'data': {'description': 'x'}},
+                {'key': f'{role}-d', 'table': 'incidents.Incident', 'op': 'delete', 'id': incident.pk},
+            ])
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual({result['status'] for result in response.data['results']}, {'forbidden'})
+        self.assertTrue(Incident.objects.filter(pk=incident.pk, description='Signalé depuis le nœud').exists())
+        self.assertFalse(SyncUpload.objects.exists())
+
+    def test_technician_can_create_but_not_update_or_delete(self):
+        incident = self.create_incident('INC-1')
+        response = self.upload(self.user('TECHNICIEN'), [
+            {'key': 't-c', 'table': 'incidents.Incident', 'op': 'upsert', 'data': incident_data('INC-T')},
+            {'key': 't-u', 'table': 'incidents.Incident', 'op': 'upsert', 'id': incident.pk, 'data': {'description': 'x'}},
+            {'key': 't-d', 'table': 'incidents.Incident', 'op': 'delete', 'id': incident.pk},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']], ['created', 'forbidden', 'forbidden'],
+        )
+        self.assertTrue(Incident.objects.filter(pk=incident.pk).exists())
+
+    def test_site_manager_can_update_and_delete(self):
+        incident = self.create_incident('INC-1')
+        response = self.upload(self.user('SITE_MANAGER'), [
+            {'key': 'm-u', 'table': 'incidents.Incident', 'op': 'upsert', 'id': incident.pk, 'data': {'description': 'x'}},
+            {'key': 'm-d', 'table': 'incidents.Incident', 'op': 'delete', 'id': incident.pk},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Incident.objects.filter(pk=incident.pk).exists())
+
+    def test_node_outside_user_sites_is_refused(self):
+        technician = User.objects.create_user(email='other@example.com', password='x', role='TECHNICIEN')
+        technician.assigned_sites.add(self.other_site)
+        response = self.upload(technician, [
+            {'key': 'o-c', 'table': 'incidents.Incident', 'op': 'upsert', 'data': incident_data('INC-O')},
+        ])
+        self.assertIn(response.status_code, (403, 404))
+
+
+class MapTileTests(TestCase):
+    """Couche des équipements servie hors du cache des tuiles"""
+
+    def setUp(self):
+        self.site = MiningSite.objects.create(name="Site A", code="TILE-A", location="A")
+        other_site = MiningSite.objects.create(name="Site B", code="TILE-B", location="B")
+        self.truck = Equipment.objects.create(
+            equipment_code="TILE-001", name="Camion", equipment_type="TRUCK", site=self.site,
+            last_latitude=9.5, last_longitude=-13.0,
+        )
+        Equipment.objects.create(
+            equipment_code="TILE-002", name="Pelle", equipment_type="EXCAVATOR", site=other_site,
+            last_latitude=9.5, last_longitude=-13.0,
+        )
+        self.manager = User.objects.create_user(email='tiles@example.com', password='x', role='SITE_MANAGER')
+        self.manager.assigned_sites.add(self.site)
+        self.url = f'/api/tiles/12/{_tile_x(-13.0, 12)}/{_tile_y(9.5, 12)}/'
+
+    def equipment(self):
+        client = APIClient()
+        client.force_authenticate(self.manager)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            (feature['properties']['id'], feature['geometry']['coordinates'])
+            for feature in response.data['features'] if feature['properties']['layer'] == 'equipment'
+        ]
+
+    def test_positions_are_read_live_and_scoped(self):
+        self.assertEqual(self.equipment(), [(self.truck.pk, [-13.0, 9.5])])
+        # Mise à jour en masse (télémétrie): aucune invalidation de tuile
+        Equipment.objects.filter(pk=self.truck.pk).update(last_latitude=9.501)
+        self.assertEqual(self.equipment(), [(self.truck.pk, [-13.0, 9.501])])
+
+
+class CompiledPolygonTests(TestCase):
+    """Appartenance en lot: trous, multipolygones, GeoJSON mal formé"""
+
+    def test_point_in_hole_is_outside(self):
+        polygon = CompiledPolygon.from_geojson(CONCESSION)
+        inside = polygon.contains([9.45, 9.5, 9.7, 9.5], [-13.05, -13.0, -13.0, -13.03])
+        self.assertEqual(inside.tolist(), [True, False, False, True])
+        self.assertGreater(polygon.distance_m(9.5, -13.0), 0)
+        self.assertEqual(polygon.distance_m(9.45, -13.05), 0)
+
+    def test_multipolygon_parts(self):
+        polygon = CompiledPolygon.from_geojson({'type': 'Feature', 'geometry': {
+            'type': 'MultiPolygon', 'coordinates': [
+                [square(-13.1, 9.4, -13.0, 9.5)],
+                # Deuxième partie trouée, dont l'emprise recoupe la première
+                [square(-13.05, 9.45, -12.9, 9.6), square(-12.98, 9.52, -12.94, 9.56)],
+            ],
+        }})
+        self.assertEqual(polygon.bbox, (-13.1, 9.4, -12.9, 9.6))
+        inside = polygon.contains(
+            [9.42, 9.58, 9.48, 9.54, 9.58, 9.42],
+            [-13.08, -12.92, -13.02, -12.96, -13.08, -12.92],
+        )
+        self.assertEqual(inside.tolist(), [True, True, True, False, False, False])
+
+    def test_open_ring_is_closed(self):
+        ring = square(-13.1, 9.4, -12.9, 9.6)[:-1]
+        polygon = CompiledPolygon.from_geojson({'type': 'Polygon', 'coordinates': [ring]})
+        self.assertTrue(polygon.contains_point(9.5, -13.0))
+
+    def test_unusable_geojson_is_rejected(self):
+        for geojson in (
+            None, 'Polygon', {'type': 'Point', 'coordinates': [-13.0, 9.5]},
+            {'type': 'Polygon', 'coordinates': 'abc'},
+            {'type': 'Polygon', 'coordinates': [[['x', 'y'], [1, 2], [3, 4], [5, 6]]]},
+            {'type': 'Polygon', 'coordinates': [[[-13.0, 9.5], [-12.9, 9.5], [-13.0, 9.5]]]},
+            {'type': 'MultiPolygon', 'coordinates': [None]},
+            {'type': 'Feature', 'geometry': None},
+        ):
+            self.assertIsNone(CompiledPolygon.from_geojson(geojson), geojson)
+
+    def test_malformed_concession_accepts_all_points(self):
+        site = MiningSite(name="Site", code="GEO-X", location="X", concession_geojson={'type': 'Polygon', 'coordinates': 'abc'})
+        self.assertTrue(site.is_point_in_concession(0, 0))
+        site.save()
+        geofences.invalidate()
+        self.assertEqual(geofences.points_in_concession(site, [0, 9.5], [0, -13.0]).tolist(), [True, True])
+
+    def test_registry_follows_concession_changes(self):
+        site = MiningSite.objects.create(name="Site", code="GEO-A", location="A", concession_geojson=CONCESSION)
+        geofences.invalidate()
+        self.assertFalse(site.is_point_in_concession(9.5, -13.0))
+        site.concession_geojson = {'type': 'Polygon', 'coordinates': [CONCESSION['coordinates'][0]]}
+        with self.captureOnCommitCallbacks(execute=True):
+            site.save()
+        self.assertTrue(site.is_point_in_concession(9.5, -13.0))
+
+
+class PointsInConcessionTests(TestCase):
+    """POST /api/sites/{id}/points-in-concession/"""
+
+    def setUp(self):
+        self.site = MiningSite.objects.create(name="Site", code="GEO-P", location="P", concession_geojson=CONCESSION)
+        geofences.invalidate()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='geo@example.com', password='x', role='ADMIN'))
+        self.url = f'/api/sites/{self.site.pk}/points-in-concession/'
+
+    def test_counts_and_outside_indices(self):
+        response = self.client.post(self.url, {'points': [[9.45, -13.05], [9.5, -13.0], [9.7, -13.0]]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['inside_count'], 1)
+        self.assertEqual(response.data['outside_indices'], [1, 2])
+
+        response = self.client.post(self.url, {'latitudes': [9.45], 'longitudes': [-13.05]}, format='json')
+        self.assertEqual(response.data['outside_count'], 0)
+
+    def test_invalid_bodies(self):
+        for body in (
+            {'points': [[9.5, -13.0, 0]]},
+            {'points': [9.5, -13.0]},
+            {'points': [['a', 'b']]},
+            {'points': 'abc'},
+            {'latitudes': [9.5, 9.6], 'longitudes': [-13.0]},
+        ):
+            response = self.client.post(self.url, body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('points', response.data)
+
+    @override_settings(SITE_MAX_CONCESSION_POINTS=2)
+    def test_point_count_is_bounded(self):
+        response = self.client.post(self.url, {'points': [[9.5, -13.0]] * 3}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('2 points au plus', str(response.data['points']))
+
+
+class SpatialIndexTests(TestCase):
+    """Plus proches (élagage par emprise, égalités) et localisation"""
+
+    def brute_force_nearest(self, index, lat, lon, k):
+        distances = []
+        for i in np.flatnonzero(index.kind_array == 'site'):
+            polygon = index.polygons[i]
+            if polygon is None:
+                distance = bbox_distance_m(lat, lon, index.bboxes[i:i + 1])[0]
+            else:
+                distance = polygon.distance_m(lat, lon)
+            distances.append((round(float(distance), 1), i))
+        return [(index.ids[i], distance) for distance, i in sorted(distances)[:k]]
+
+    def test_nearest_matches_brute_force(self):
+        rng = np.random.default_rng(7)
+        sites = {}
+        for site_id in range(1, 41):
+            lon, lat = rng.uniform(-14, -12), rng.uniform(9, 11)
+            size = rng.uniform(0.01, 0.05)
+            sites[site_id] = compiled(square(lon, lat, lon + size, lat + size))
+        points = {site_id: (rng.uniform(9, 11), rng.uniform(-14, -12)) for site_id in range(41, 51)}
+        index = SpatialIndex(sites, {}, points)
+        for lat, lon in rng.uniform((9, -14), (11, -12), size=(20, 2)):
+            for k in (1, 3, 10, 60):
+                self.assertEqual(index.nearest(lat, lon, k), self.brute_force_nearest(index, lat, lon, k))
+
+    def test_far_polygons_are_pruned(self):
+        near = compiled(square(-13.01, 9.49, -12.99, 9.51))
+        far = [compiled(square(-13.0 + offset, 10.0, -12.9 + offset, 10.1)) for offset in (0, 0.5, 1)]
+        index = SpatialIndex({1: near, 2: far[0], 3: far[1], 4: far[2]}, {})
+        distance_m = CompiledPolygon.distance_m
+        with mock.patch.object(CompiledPolygon, 'distance_m', autospec=True, side_effect=distance_m) as distance:
+            self.assertEqual(index.nearest(9.5, -13.0, k=1), [(1, 0.0)])
+        self.assertEqual([call.args[0] for call in distance.call_args_list], [near])
+
+    def test_ties_keep_index_order(self):
+        ring = square(-13.1, 9.4, -12.9, 9.6)
+        index = SpatialIndex(
+            {5: compiled(ring), 3: compiled(ring), 8: compiled(square(-12.5, 9.4, -12.4, 9.6))},
+            {}, {7: (9.5, -13.2), 6: (9.5, -13.2)},
+        )
+        self.assertEqual(index.nearest(9.5, -13.0, k=1), [(3, 0.0)])
+        self.assertEqual([pk for pk, _ in index.nearest(9.5, -13.0, k=2)], [3, 5])
+        # Deux centres de sites à égale distance: le premier indexé est gardé
+        ranked = index.nearest(9.5, -13.25, k=4)
+        self.assertEqual([pk for pk, _ in ranked], [6, 7, 3, 5])
+        self.assertEqual([pk for pk, _ in index.nearest(9.5, -13.0, k=5, site_ids=[7, 8])], [7, 8])
+
+    def test_locate_prefers_zones_of_the_containing_site(self):
+        # Site 2: concession et deux zones; site 1: une zone débordant sur la concession du site 2
+        index = SpatialIndex(
+            {2: compiled(square(-13.1, 9.4, -12.9, 9.6))},
+            {
+                1: [(10, compiled(square(-13.0, 9.45, -12.8, 9.55)))],
+                2: [(20, compiled(square(-13.05, 9.45, -12.95, 9.55))), (21, compiled(square(-13.05, 9.4, -12.95, 9.6)))],
+            },
+        )
+        self.assertEqual(index.locate(9.5, -12.97), Location(2, 20))
+        self.assertEqual(index.locate(9.58, -13.0), Location(2, 21))
+        self.assertEqual(index.locate(9.5, -12.85), Location(1, 10))
+        self.assertEqual(index.locate(9.42, -13.08), Location(2, None))
+        self.assertEqual(index.locate(9.5, -12.97, site_ids=[1]), Location(1, 10))
+        self.assertEqual(index.locate(9.7, -13.0), Location(None, None))
+
+
+class OperationZoneTests(TestCase):
+    """Zone de chantier déduite de la position d'une opération"""
+
+    def setUp(self):
+        self.site = MiningSite.objects.create(
+            name="Site", code="OPZ-A", location="A",
+            concession_geojson={'type': 'Polygon', 'coordinates': [square(-13.1, 9.4, -12.9, 9.6)]},
+        )
+        self.zone = WorkZone.objects.create(
+            code="Z1", name="Fosse nord", site=self.site,
+            zone_geojson={'type': 'Polygon', 'coordinates': [square(-13.05, 9.5, -12.95, 9.55)]},
+        )
+        geofences.invalidate()
+
+    def validate(self, **extra):
+        serializer = OperationSerializer(data={
+            'operation_code': f"OPZ-{len(extra)}", 'site': self.site.pk, 'date': '2026-01-05', **extra,
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.validated_data.get('work_zone')
+
+    def test_zone_is_assigned_from_position(self):
+        self.assertEqual(self.validate(gps_latitude='9.52', gps_longitude='-13.0'), self.zone)
+        self.assertIsNone(self.validate(gps_latitude='9.45', gps_longitude='-13.0'))
+
+    def test_given_zone_is_kept(self):
+        self.assertIsNone(self.validate(gps_latitude='9.52', gps_longitude='-13.0', work_zone=None))
@@ -0,0 +1,406 @@
+"""
+Tuiles de la carte des sites (SIG MG)
+
+/api/tiles/{z}/{x}/{y} sert, pour une tuile du découpage Web Mercator
+(XYZ), une FeatureCollection GeoJSON compacte de quatre couches:
+
+- site: concessions (points centraux pour les sites sans concession);
+- zone: zones de chantier actives;
+- incident: incidents ouverts;
+- equipment: dernière position des équipements en service.
+
+Les polygones viennent du registre des géofences (mining_sites.geofences):
+ils sont découpés à l'emprise de la tuile (plus une marge), simplifiés à la
+taille d'un pixel du zoom (Douglas–Peucker) et leurs coordonnées arrondies
+à la précision utile. Un polygone réduit à moins d'un pixel devient un
+point.
+
+Les trois premières couches sont mises en cache par tuile, sans filtre de
+sites; le périmètre de l'utilisateur est appliqué à la lecture. Clés:
+
+    tiles:gen:<z>               -> génération du zoom
+    tiles:<z>:<gen>:<x>:<y>     -> entités de la tuile
+
+Une modification (site, zone, incident) supprime, à chaque zoom, les tuiles
+recoupant l'ancienne et la nouvelle emprise; au-delà de
+TILES_INVALIDATE_MAX_TILES tuiles pour un zoom, la génération de ce zoom est
+incrémentée à la place. Les opérations en masse ne déclenchent pas les
+signaux: appeler `invalidate_bboxes()` après coup.
+
+Les équipements bougent à chaque position de télémétrie: leur couche n'est
+pas mise en cache (`equipment_features()`, une requête sur l'emprise) et
+s'ajoute aux entités en cache à chaque lecture.
+"""
+
+from math import atan, ceil, cos, degrees, floor, log, log10, pi, radians, sinh, tan
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from equipment.models import Equipment
+from equipment.paths import simplify
+from incidents.models import Incident
+from operations.models import WorkZone
+
+from .geofences import registry
+from .geometry import CompiledPolygon
+from .models import MiningSite
+from .spatial import SITE, ZONE
+
+
+TILE_SIZE = 256
+# Marge autour de la tuile (fraction de tuile): les contours coupés au bord
+# restent hors champ
+BUFFER = 1 / 16
+EQUATOR_M = 40075016.686
+OPEN_INCIDENT_STATUSES = (
+    Incident.IncidentStatus.REPORTED,
+    Incident.IncidentStatus.INVESTIGATING,
+    Incident.IncidentStatus.ACTION_REQUIRED,
+)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def zoom_range():
+    return range(_setting('TILES_MIN_ZOOM', 0), _setting('TILES_MAX_ZOOM', 20) + 1)
+
+
+def is_valid_tile(z, x, y):
+    return z in zoom_range() and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def _lon(x, z):
+    return x / 2 ** z * 360.0 - 180.0
+
+
+def _lat(y, z):
+    return degrees(atan(sinh(pi * (1 - 2 * y / 2 ** z))))
+
+
+def tile_bbox(z, x, y, buffer=0.0):
+    """Emprise (min_lon, min_lat, max_lon, max_lat) d'une tuile, marge en fraction de tuile"""
+    return (
+        max(_lon(x - buffer, z), -180.0), max(_lat(y + 1 + buffer, z), -85.0511),
+        min(_lon(x + 1 + buffer, z), 180.0), min(_lat(y - buffer, z), 85.0511),
+    )
+
+
+def _tile_x(lon, z):
+    return floor((lon + 180.0) / 360.0 * 2 ** z)
+
+
+def _tile_y(lat, z):
+    lat = radians(min(max(lat, -85.0511), 85.0511))
+    return floor((1 - log(tan(lat) + 1 / cos(lat)) / pi) / 2 * 2 ** z)
+
+
+def tile_range(bbox, z):
+    """(x0, x1, y0, y1): tuiles du zoom `z` dont l'emprise avec marge recoupe `bbox`"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    last = 2 ** z - 1
+    # Une entité dans la marge d'une tuile voisine y figure aussi
+    x0 = min(max(_tile_x(min_lon, z) - 1, 0), last)
+    x1 = min(max(_tile_x(max_lon, z) + 1, 0), last)
+    y0 = min(max(_tile_y(max_lat, z) - 1, 0), last)
+    y1 = min(max(_tile_y(min_lat, z) + 1, 0), last)
+    return x0, x1, y0, y1
+
+
+def _clip_ring(ring, bbox):
+    """Découpage Sutherland–Hodgman d'un anneau [lon, lat] à une emprise"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    low, high = ring.min(axis=0), ring.max(axis=0)
+    if low[0] >= min_lon and low[1] >= min_lat and high[0] <= max_lon and high[1] <= max_lat:
+        return ring
+    points = ring[:-1]
+    for axis, bound, keep_above in ((0, min_lon, True), (0, max_lon, False), (1, min_lat, True), (1, max_lat, False)):
+        if not len(points):
+            break
+        following = np.roll(points, -1, axis=0)
+        inside = points[:, axis] >= bound if keep_above else points[:, axis] <= bound
+        following_inside = np.roll(inside, -1)
+        output = []
+        for point, nxt, point_in, next_in in zip(points, following, inside, following_inside):
+            if point_in:
+                output.append(point)
+            if point_in != next_in:
+                t = (bound - point[axis]) / (nxt[axis] - point[axis])
+                output.append(point + t * (nxt - point))
+        points = np.array(output).reshape(-1, 2)
+    if len(points) < 3:
+        return None
+    return np.vstack((points, points[:1]))
+
+
+def _polygon_geometry(polygon, bbox, tolerance_m, decimals):
+    """Géométrie GeoJSON découpée et simplifiée (None si tout a disparu)"""
+    polygons = []
+    for rings in polygon.rings:
+        shaped = []
+        for ring in rings:
+            ring = _clip_ring(ring, bbox)
+            if ring is not None:
+                # simplify() travaille sur des [lat, lon]
+                ring = simplify(ring[:, ::-1], tolerance_m)[:, ::-1]
+            if ring is None or len(ring) < 4:
+                if not shaped:
+                    break  # anneau extérieur disparu: polygone entier
+                continue
+            shaped.append(np.round(ring, decimals).tolist())
+        if shaped:
+            polygons.append(shaped)
+    if not polygons:
+        return None
+    if len(polygons) == 1:
+        return {'type': 'Polygon', 'coordinates': polygons[0]}
+    return {'type': 'MultiPolygon', 'coordinates': polygons}
+
+
+def _point(lat, lon, decimals):
+    return {'type': 'Point', 'coordinates': [round(float(lon), decimals), round(float(lat), decimals)]}
+
+
+def _feature(geometry, layer, pk, site_id, **properties):
+    return {
+        'type': 'Feature',
+        'geometry': geometry,
+        'properties': {'layer': layer, 'id': pk, 'site': site_id, **properties},
+    }
+
+
+def _in_bbox(bbox, lat_field, lon_field):
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return {
+        f'{lat_field}__gte': min_lat, f'{lat_field}__lte': max_lat,
+        f'{lon_field}__gte': min_lon, f'{lon_field}__lte': max_lon,
+    }
+
+
+def _precision(z):
+    """Décimales utiles des coordonnées au zoom `z` (un pixel)"""
+    return min(max(ceil(-log10(360.0 / (2 ** z * TILE_SIZE))) + 1, 1), 7)
+
+
+def build_tile(z, x, y):
+    """Entités GeoJSON d'une tuile, sans les équipements ni filtre de sites"""
+    bbox = tile_bbox(z, x, y, BUFFER)
+    center_lat = (bbox[1] + bbox[3]) / 2
+    # Un pixel du zoom: tolérance de simplification et précision des coordonnées
+    tolerance_m = EQUATOR_M * cos(radians(center_lat)) / (2 ** z * TILE_SIZE)
+    decimals = _precision(z)
+    max_points = _setting('TILES_MAX_POINTS', 5000)
+
+    index = registry().index
+    matches = index.intersecting(bbox)
+    sites = {
+        site['pk']: site for site in MiningSite.objects.filter(
+            pk__in=[index.ids[i] for i in matches if index.kinds[i] == SITE]
+        ).values('pk', 'code', 'name', 'status')
+    }
+    zones = {
+        zone['pk']: zone for zone in WorkZone.objects.filter(
+            pk__in=[index.ids[i] for i in matches if index.kinds[i] == ZONE]
+        ).values('pk', 'code', 'name')
+    }
+
+    features = []
+    for i in matches:
+        kind, pk, site_id, polygon = index.kinds[i], index.ids[i], index.site_ids[i], index.polygons[i]
+        properties = {
+            name: value for name, value in (sites if kind == SITE else zones).get(pk, {}).items() if name != 'pk'
+        }
+        min_lon, min_lat, max_lon, max_lat = index.bboxes[i]
+        geometry = polygon and _polygon_geometry(polygon, bbox, tolerance_m, decimals)
+        if geometry is None:
+            # Point central ou polygone plus petit qu'un pixel
+            lat, lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+            if not (bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]):
+                continue
+            geometry = _point(lat, lon, decimals)
+        features.append(_feature(geometry, kind, pk, site_id, **properties))
+
+    # Zones sans polygone: point GPS
+    for zone in (
+        WorkZone.objects.filter(is_active=True, **_in_bbox(bbox, 'gps_latitude', 'gps_longitude'))
+        .exclude(pk__in=[index.ids[i] for i in np.flatnonzero(index.kind_array == ZONE)])
+        .values('pk', 'site_id', 'code', 'name', 'gps_latitude', 'gps_longitude')[:max_points]
+    ):
+        features.append(_feature(
+            _point(zone['gps_latitude'], zone['gps_longitude'], decimals), ZONE, zone['pk'], zone['site_id'],
+            code=zone['code'], name=zone['name'],
+        ))
+
+    for incident in (
+        Incident.objects.filter(status__in=OPEN_INCIDENT_STATUSES, **_in_bbox(bbox, 'gps_latitude', 'gps_longitude'))
+        .order_by('-date')
+        .values('pk', 'site_id', 'incident_code', 'incident_type', 'severity', 'gps_latitude', 'gps_longitude')
+        [:max_points]
+    ):
+        features.append(_feature(
+            _point(incident['gps_latitude'], incident['gps_longitude'], decimals), 'incident',
+            incident['pk'], incident['site_id'], code=incident['incident_code'],
+            type=incident['incident_type'], severity=incident['severity'],
+        ))
+
+    return features
+
+
+def equipment_features(z, x, y):
+    """Dernières positions des équipements en service sur une tuile (hors cache)"""
+    bbox = tile_bbox(z, x, y, BUFFER)
+    decimals = _precision(z)
+    return [
+        _feature(
+            _point(equipment['last_latitude'], equipment['last_longitude'], decimals), 'equipment',
+            equipment['pk'], equipment['site_id'], code=equipment['equipment_code'],
+            type=equipment['equipment_type'], status=equipment['status'],
+        )
+        for equipment in (
+            Equipment.objects.exclude(status=Equipment.EquipmentStatus.RETIRED)
+            .filter(**_in_bbox(bbox, 'last_latitude', 'last_longitude'))
+            .order_by('-last_position_update')
+            .values('pk', 'site_id', 'equipment_code', 'equipment_type', 'status', 'last_latitude', 'last_longitude')
+            [:_setting('TILES_MAX_POINTS', 5000)]
+        )
+    ]
+
+
+def _generation_key(z):
+    return f'tiles:gen:{z}'
+
+
+def _generations(zooms):
+    """{zoom: génération} en une lecture de cache"""
+    keys = {z: _generation_key(z) for z in zooms}
+    found = cache.get_many(list(keys.values()))
+    generations = {}
+    for z, key in keys.items():
+        if key not in found:
+            # add() ne remplace pas une génération posée entre-temps par un autre processus
+            cache.add(key, 1, timeout=None)
+            found[key] = cache.get(key, 1)
+        generations[z] = found[key]
+    return generations
+
+
+def _tile_key(z, generation, x, y):
+    return f'tiles:{z}:{generation}:{x}:{y}'
+
+
+def tile_features(z, x, y):
+    """Entités d'une tuile, depuis le cache ou construites"""
+    key = _tile_key(z, _generations([z])[z], x, y)
+    features = cache.get(key)
+    if features is None:
+        features = build_tile(z, x, y)
+        cache.set(key, features, timeout=_setting('TILES_CACHE_SECONDS', 3600))
+    return features
+
+
+def invalidate_bboxes(bboxes):
+    """Invalider, à chaque zoom, les tuiles recoupant ces emprises"""
+    bboxes = [bbox for bbox in bboxes if bbox is not None]
+    if not bboxes:
+        return
+    zooms = list(zoom_range())
+    generations = _generations(zooms)
+    max_tiles = _setting('TILES_INVALIDATE_MAX_TILES', 256)
+    keys = []
+    for z in zooms:
+        ranges = [tile_range(bbox, z) for bbox in bboxes]
+        if sum((x1 - x0 + 1) * (y1 - y0 + 1) for x0, x1, y0, y1 in ranges) > max_tiles:
+            try:
+                cache.incr(_generation_key(z))
+            except ValueError:
+                cache.set(_generation_key(z), generations[z] + 1, timeout=None)
+            continue
+        keys.extend(
+            _tile_key(z, generations[z], x, y)
+            for x0, x1, y0, y1 in ranges
+            for x in range(x0, x1 + 1)
+            for y in range(y0, y1 + 1)
+        )
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_points(points):
+    """Invalider les tuiles de positions (lat, lon)"""
+    invalidate_bboxes([_point_bbox(lat, lon) for lat, lon in points])
+
+
+def _point_bbox(lat, lon):
+    if lat is None or lon is None:
+        return None
+    return (float(lon), float(lat), float(lon), float(lat))
+
+
+def _geometry_bbox(geojson, lat, lon):
+    polygon = CompiledPolygon.from_geojson(geojson)
+    return polygon.bbox if polygon is not None else _point_bbox(lat, lon)
+
+
+def _previous_values(instance, *fields):
+    """Valeurs enregistrées avant modification (None à la création)"""
+    if instance.pk is None:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+# Anciennes emprises relues en base avant l'écriture (pas de reconstruction
+# du registre dans la transaction en cours)
+
+@receiver(pre_save, sender=MiningSite)
+def _remember_site_bbox(sender, instance, **kwargs):
+    previous = _previous_values(instance, 'concession_geojson', 'latitude', 'longitude')
+    instance._tile_previous_bbox = previous and _geometry_bbox(*previous)
+
+
+@receiver(post_save, sender=MiningSite)
+@receiver(post_delete, sender=MiningSite)
+def _invalidate_site_tiles(sender, instance, **kwargs):
+    bboxes = [
+        getattr(instance, '_tile_previous_bbox', None),
+        _geometry_bbox(instance.concession_geojson, instance.latitude, instance.longitude),
+    ]
+    transaction.on_commit(lambda: invalidate_bboxes(bboxes))
+
+
+@receiver(pre_save, sender=WorkZone)
+def _remember_zone_bbox(sender, instance, **kwargs):
+    previous = _previous_values(instance, 'zone_geojson', 'gps_latitude', 'gps_longitude')
+    instance._tile_previous_bbox = previous and _geometry_bbox(*previous)
+
+
+@receiver(post_save, sender=WorkZone)
+@receiver(post_delete, sender=WorkZone)
+def _invalidate_zone_tiles(sender, instance, **kwargs):
+    bboxes = [
+        getattr(instance, '_tile_previous_bbox', None),
+        _geometry_bbox(instance.zone_geojson, instance.gps_latitude, instance.gps_longitude),
+    ]
+    transaction.on_commit(lambda: invalidate_bboxes(bboxes))
+
+
+@receiver(pre_save, sender=Incident)
+def _remember_incident_position(sender, instance, **kwargs):
+    # Position avant modification, pour invalider aussi l'ancienne tuile
+    instance._tile_previous_position = _previous_values(instance, 'gps_latitude', 'gps_longitude')
+
+
+@receiver(post_save, sender=Incident)
+@receiver(post_delete, sender=Incident)
+def _invalidate_incident_tiles(sender, instance, **kwargs):
+    points = [(instance.gps_latitude, instance.gps_longitude)]
+    previous = getattr(instance, '_tile_previous_position', None)
+    if previous:
+        points.append(previous)
+    transaction.on_commit(lambda: invalidate_points(points))
+
@@ -1,13 +1,26 @@
+import json
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.http import HttpResponse
 from rest_framework import viewsets, permissions, filters, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import get_user_model
+from .geofences import locate, nearest_sites, points_in_concession
+from .sync import (
+    CursorError, acknowledge, apply_uploads, changes_since, decode_cursor, encode_cursor, ndjson,
+)
+from .tiles import equipment_features, is_valid_tile, tile_features
 from .models import MiningSite, DistributedNode
 from .serializers import MiningSiteSerializer, MiningSiteListSerializer, DistributedNodeSerializer
 from accounts.permissions import CanManageSites, IsAdmin
 from accounts.mixins import SiteScopedMixin
 from accounts.serializers import UserSerializer
+from operations.models import WorkZone
 
 User = get_user_model()
 
@@ -113,12 +126,235 @@ class MiningSiteViewSet(SiteScopedMixin, viewsets.ModelViewSet):
             )
 
 
+    @action(
+        detail=True, methods=['post'], url_path='points-in-concession',
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def points_in_concession(self, request, pk=None):
+        """
+        Contrôle en lot de points GPS contre la concession du site.
+        
+        Corps: {"points": [[lat, lon], ...]} ou
+        {"latitudes": [...], "longitudes": [...]}.
+        Retourne les décomptes et les indices des points hors concession.
+        """
+        site = self.get_object()
+        data = request.data
+        try:
+            if 'points' in data:
+                points = np.asarray(data['points'], dtype=float)
+                if points.size and (points.ndim != 2 or points.shape[1] != 2):
+                    raise ValueError(points.shape)
+                points = points.reshape(-1, 2)
+                lats, lons = points[:, 0], points[:, 1]
+            else:
+                lats = np.asarray(data.get('latitudes', []), dtype=float).ravel()
+                lons = np.asarray(data.get('longitudes', []), dtype=float).ravel()
+                if lats.shape != lons.shape:
+                    raise ValueError(lats.shape)
+        except (TypeError, ValueError):
+            raise ValidationError({
+                'points': 'Liste de [latitude, longitude] attendue (ou latitudes et longitudes de même longueur)'
+            })
+        if not (np.isfinite(lats).all() and np.isfinite(lons).all()):
+            raise ValidationError({'points': 'Coordonnées numériques attendues'})
+        max_points = getattr(settings, 'SITE_MAX_CONCESSION_POINTS', 200000)
+        if len(lats) > max_points:
+            raise ValidationError({'points': f'{max_points} points au plus par requête'})
+        
+        inside = points_in_concession(site, lats, lons)
+        outside = np.flatnonzero(~inside)
+        return Response({
+            'site': site.pk,
+            'has_concession': bool(site.concession_geojson),
+            'count': len(inside),
+            'inside_count': len(inside) - len(outside),
+            'outside_count': len(outside),
+            'outside_indices': outside.tolist(),
+        })
+
+
+    @action(detail=False, methods=['get'])
+    def locate(self, request):
+        """
+        Site et zone de chantier d'un point GPS, et sites les plus proches.
+        
+        Paramètres: lat, lon, k (sites proches, défaut 5).
+        Seuls les sites visibles par l'utilisateur sont considérés.
+        """
+        params = request.query_params
+        try:
+            lat = float(params['lat'])
+            lon = float(params['lon'])
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise ValueError(lat, lon)
+        except (KeyError, ValueError):
+            raise ValidationError({'lat': 'Paramètres lat et lon (degrés décimaux) requis'})
+        try:
+            k = min(max(int(params.get('k', 5)), 1), 50)
+        except ValueError:
+            raise ValidationError({'k': 'Nombre entier attendu'})
+        
+        site_ids = request.user.get_site_ids()
+        location = locate(lat, lon, site_ids)
+        nearest = nearest_sites(lat, lon, k, site_ids)
+        
+        sites = MiningSite.objects.in_bulk(
+            {site_id for site_id, _ in nearest} | ({location.site_id} - {None})
+        )
+        zone = WorkZone.objects.filter(pk=location.zone_id).first() if location.zone_id else None
+        
+        def site_summary(site_id):
+            site = sites.get(site_id)
+            return site and {'id': site.pk, 'code': site.code, 'name': site.name}
+        
+        return Response({
+            'latitude': lat,
+            'longitude': lon,
+            'site': site_summary(location.site_id),
+            'work_zone': zone and {'id': zone.pk, 'code': zone.code, 'name': zone.name},
+            'nearest_sites': [
+                {**site_summary(site_id), 'distance_m': distance}
+                for site_id, distance in nearest if site_id in sites
+            ],
+        })
+
+
 class DistributedNodeViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Vue pour monitorer l'état de l'architecture IA distribuée.
     ReadOnly à ce stade pour simulation.
+    
+    Synchronisation différentielle des nœuds (voir mining_sites.sync):
+    GET changes/ (réception) et POST upload/ (envoi).
     """
     site_field = 'site'
     queryset = DistributedNode.objects.all()
     serializer_class = DistributedNodeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    def _sync_node(self):
+        """Nœud de la requête, s'il est rattaché à un site de l'utilisateur"""
+        node = self.get_object()
+        site_ids = self.request.user.get_site_ids()
+        if site_ids is not None and node.site_id not in site_ids:
+            raise PermissionDenied("Ce nœud n'est pas rattaché à vos sites.")
+        return node
+    
+    @action(detail=True, methods=['get'])
+    def changes(self, request, pk=None):
+        """
+        Changements du site du nœud depuis un curseur, en NDJSON compressé.
+        
+        Paramètres: cursor (jeton de la réponse précédente, vide au premier
+        appel), limit. Une ligne par changement
+        ({"table", "seq", "op": "upsert"|"delete", "id", "data"}), puis
+        {"cursor", "has_more"}. Le curseur présenté est acquitté
+        (last_sync du nœud).
+        """
+        node = self._sync_node()
+        try:
+            cursor = decode_cursor(request.query_params.get('cursor', ''))
+        except CursorError:
+            raise ValidationError({'cursor': 'Curseur illisible'})
+        max_changes = getattr(settings, 'SYNC_MAX_CHANGES', 5000)
+        try:
+            limit = min(max(int(request.query_params.get('limit', max_changes)), 1), max_changes)
+        except ValueError:
+            raise ValidationError({'limit': 'Nombre entier attendu'})
+        
+        if 'cursor' in request.query_params:
+            acknowledge(node, cursor)
+        lines, next_cursor, has_more = changes_since(node.site_id, cursor, limit)
+        token = encode_cursor(next_cursor)
+        lines.append({'cursor': token, 'has_more': has_more})
+        
+        compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+        response = HttpResponse(ndjson(lines, compress), content_type='application/x-ndjson')
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        response['Vary'] = 'Accept-Encoding'
+        response['X-Sync-Cursor'] = token
+        response['X-Sync-Has-More'] = 'true' if has_more else 'false'
+        return response
+    
+    @action(detail=True, methods=['post'])
+    def upload(self, request, pk=None):
+        """
+        Envoi des changements locaux du nœud.
+        
+        Corps: {"changes": [...]} (JSON) ou NDJSON, éventuellement
+        compressé (Content-Encoding: gzip, SYNC_MAX_UPLOAD_BYTES au plus
+        une fois décompressé); un changement par élément:
+        {"key", "table", "op": "upsert"|"delete", "id", "base_seq", "data"}.
+        Une clé déjà traitée renvoie son résultat sans rien réappliquer.
+        Un changement appliqué renvoie sa séquence (`seq`), séquence de
+        base des modifications suivantes du même enregistrement.
+        Chaque changement est soumis aux rôles de l'API de sa table
+        (statut "forbidden" sinon).
+        200: tout est appliqué (ou déjà traité), 207: application
+        partielle, 400: rien n'est appliqué.
+        """
+        node = self._sync_node()
+        try:
+            items = self._upload_items(request)
+        except (ValueError, OSError, EOFError, zlib.error):
+            raise ValidationError({'changes': 'NDJSON illisible'})
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'changes': 'Une liste non vide de changements est attendue'})
+        max_changes = getattr(settings, 'SYNC_MAX_CHANGES', 5000)
+        if len(items) > max_changes:
+            raise ValidationError({'changes': f'{max_changes} changements au plus par envoi'})
+        
+        results = apply_uploads(node, items, request)
+        applied = sum(1 for result in results if result['status'] in ('created', 'updated', 'deleted'))
+        if applied == len(results):
+            response_status = status.HTTP_200_OK
+        elif applied:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'applied': applied,
+            'failed': len(results) - applied,
+            'results': results,
+        }, status=response_status)
+    
+    @staticmethod
+    def _upload_items(request):
+        if request.content_type.startswith('application/x-ndjson'):
+            body = request.body
+            if request.headers.get('Content-Encoding', '') == 'gzip':
+                # Décompression bornée: un petit corps peut en produire des Go
+                limit = getattr(settings, 'SYNC_MAX_UPLOAD_BYTES', 20 * 1024 * 1024)
+                decompressor = zlib.decompressobj(wbits=31)
+                body = decompressor.decompress(body, limit)
+                if decompressor.unconsumed_tail:
+                    raise ValidationError({'changes': f'{limit} octets au plus une fois décompressé'})
+                if not decompressor.eof:
+                    raise EOFError
+            return [json.loads(line) for line in body.decode().splitlines() if line.strip()]
+        data = request.data
+        return data.get('changes') if isinstance(data, dict) else data
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def map_tile(request, z, x, y):
+    """
+    Tuile de la carte des sites (XYZ): FeatureCollection GeoJSON des
+    concessions, zones de chantier, incidents ouverts et équipements,
+    limitée aux sites visibles par l'utilisateur.
+    """
+    z, x, y = int(z), int(x), int(y)
+    if not is_valid_tile(z, x, y):
+        return Response({'detail': 'Tuile hors du découpage.'}, status=status.HTTP_404_NOT_FOUND)
+    # Couches en cache, puis positions des équipements lues à chaque requête
+    features = tile_features(z, x, y) + equipment_features(z, x, y)
+    site_ids = request.user.get_site_ids()
+    if site_ids is not None:
+        site_ids = set(site_ids)
+        features = [feature for feature in features if feature['properties']['site'] in site_ids]
+    response = Response({'type': 'FeatureCollection', 'features': features})
+    response['Cache-Control'] = 'private, max-age=%d' % getattr(settings, 'TILES_CLIENT_MAX_AGE', 30)
+    return response
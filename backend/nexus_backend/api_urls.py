@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -9,7 +9,7 @@ from accounts.views import UserViewSet
 from accounts.audit_views import AuditLogViewSet, LockedStatusViewSet
 from accounts.password_reset import password_reset_request, password_reset_confirm
 from nexus_backend.chatbot import chatbot_message
-from mining_sites.views import MiningSiteViewSet, DistributedNodeViewSet
+from mining_sites.views import MiningSiteViewSet, DistributedNodeViewSet, map_tile
 from personnel.views import PersonnelViewSet
 from equipment.views import EquipmentViewSet, MaintenanceRecordViewSet
 from operations.views import OperationViewSet, WorkZoneViewSet, ShiftViewSet
@@ -19,6 +19,7 @@ from analytics.views import IndicatorViewSet
 from alerts.views import AlertViewSet, AlertRuleViewSet
 from reports.views import ReportViewSet
 from stock.views import StockLocationViewSet, StockMovementViewSet, StockSummaryViewSet
+from exports.views import ExportJobViewSet
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -44,6 +45,8 @@ router.register(r'stock-summary', StockSummaryViewSet)
 # Audit & Conformité (MMG)
 router.register(r'audit-logs', AuditLogViewSet, basename='auditlog')
 router.register(r'locked-statuses', LockedStatusViewSet, basename='lockedstatus')
+# Exports en arrière-plan
+router.register(r'export-jobs', ExportJobViewSet, basename='exportjob')
 
 urlpatterns = [
     # JWT Authentication
@@ -55,6 +58,8 @@ urlpatterns = [
     path('password-reset/confirm/', password_reset_confirm, name='password_reset_confirm'),
     # Chatbot IA
     path('chatbot/', chatbot_message, name='chatbot_message'),
+    # Tuiles de la carte des sites (XYZ)
+    re_path(r'^tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)/?$', map_tile, name='map_tile'),
     # API endpoints
     path('', include(router.urls)),
 ]
@@ -8,8 +8,10 @@ from django.urls import path, re_path
 
 # Import du consumer de notifications
 from alerts.consumers import NotificationConsumer
+from equipment.consumers import TrackingConsumer
 
 # Websocket URL patterns
 websocket_urlpatterns = [
     path('ws/notifications/', NotificationConsumer.as_asgi()),
+    path('ws/tracking/', TrackingConsumer.as_asgi()),
 ]
@@ -1,14 +1,65 @@
 import csv
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import action
 from django.utils.text import slugify
 from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+from .export_projection import default_export_fields, iter_rows
+
+
+class Echo:
+    """Pseudo-fichier: csv.writer écrit une ligne, on la renvoie telle quelle"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, fields):
+    """Lignes CSV (en-tête compris) produites en flux"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in iter_rows(queryset, fields):
+        yield writer.writerow(row)
+
+
+def _next_batch(iterator, size):
+    batch = []
+    for line in iterator:
+        batch.append(line)
+        if len(batch) >= size:
+            break
+    return ''.join(batch)
+
+
+def stream_content(request, lines, batch_size=500):
+    """
+    Adapter un générateur synchrone au serveur.
+
+    Sous ASGI (daphne), Django consommerait entièrement un itérateur
+    synchrone avant d'envoyer la réponse: on le lit donc par lots dans le
+    thread synchrone (même connexion base, même curseur serveur).
+    """
+    if isinstance(request, ASGIRequest):
+        async def agen():
+            while True:
+                chunk = await sync_to_async(_next_batch, thread_sensitive=True)(lines, batch_size)
+                if not chunk:
+                    break
+                yield chunk
+        return agen()
+    return lines
+
 
 class CSVExportMixin:
     """
     Mixin pour exporter les données d'un ViewSet en CSV
+
+    L'export est projeté en SQL (voir export_projection) et envoyé en flux:
+    la mémoire reste constante quel que soit le nombre de lignes.
     """
-    
+
     @action(detail=False, methods=['get'])
     def export_csv(self, request):
         """
@@ -16,44 +67,14 @@ class CSVExportMixin:
         """
         # Appliquer les filtres du ViewSet au queryset
         queryset = self.filter_queryset(self.get_queryset())
-        
-        # Créer la réponse HTTP avec les headers CSV
-        filename = f"export_{slugify(self.get_queryset().model._meta.verbose_name_plural)}_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        # Initialiser le writer CSV
-        writer = csv.writer(response)
-        
+
         # Récupérer les champs à exporter (soit définis, soit tous les champs simples)
-        if hasattr(self, 'export_fields'):
-            fields = self.export_fields
-        else:
-            fields = [f.name for f in queryset.model._meta.fields]
-            
-        # Écrire l'en-tête
-        writer.writerow(fields)
-        
-        # Écrire les données
-        for obj in queryset:
-            row = []
-            for field in fields:
-                try:
-                    val = getattr(obj, field)
-                    # Gérer les ManyToMany (Managers)
-                    if hasattr(val, 'all') and callable(val.all):
-                        val = ", ".join([str(item) for item in val.all()])
-                    # Gérer les dates
-                    elif isinstance(val, (datetime, date)) or hasattr(val, 'strftime'):
-                        val = val.strftime('%Y-%m-%d %H:%M:%S') if isinstance(val, datetime) else val.strftime('%Y-%m-%d')
-                    # Gérer les relations Foreign Key (objets simples)
-                    elif hasattr(val, 'email'): # User/Personnel
-                        val = val.email
-                    elif hasattr(val, 'name'): # Site/Zone
-                        val = val.name
-                except Exception:
-                    val = ""
-                row.append(str(val) if val is not None else "")
-            writer.writerow(row)
-            
+        fields = default_export_fields(self, queryset.model)
+
+        filename = f"export_{slugify(queryset.model._meta.verbose_name_plural)}_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+        response = StreamingHttpResponse(
+            stream_content(request._request, iter_csv(queryset, fields)),
+            content_type='text/csv'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
@@ -0,0 +1,160 @@
+"""
+Projection SQL des colonnes d'export (CSV, PDF, Excel)
+
+Traduit une liste de champs d'export (`export_fields` d'un ViewSet) en
+colonnes `values_list()` calculées par la base:
+- champ simple           -> la colonne elle-même
+- ForeignKey            -> email, sinon name, sinon libellé connu, sinon id
+- ManyToMany            -> libellés agrégés en SQL (sous-requête corrélée)
+- lookup 'site__code'   -> jointure directe
+
+Aucune instance n'est construite: les lignes sont des tuples, lus par
+lots avec `iterator(chunk_size=...)`.
+"""
+
+from datetime import date, datetime
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Aggregate, CharField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat
+
+
+EXPORT_CHUNK_SIZE = 2000
+M2M_SEPARATOR = ', '
+
+# Reproduction SQL du __str__ des modèles listés dans les ManyToMany exportés
+LABEL_PARTS = {
+    'personnel.Personnel': ('employee_id', ' - ', 'last_name', ' ', 'first_name'),
+    'equipment.Equipment': ('equipment_code', ' - ', 'name'),
+}
+
+
+class StringConcat(Aggregate):
+    """Concaténation de chaînes agrégée (STRING_AGG / GROUP_CONCAT)"""
+
+    function = 'GROUP_CONCAT'
+    template = "%(function)s(%(expressions)s, '" + M2M_SEPARATOR + "')"
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            function='STRING_AGG',
+            template="%(function)s((%(expressions)s)::text, '" + M2M_SEPARATOR + "')",
+            **extra_context,
+        )
+
+
+def _field_names(model):
+    return {f.name for f in model._meta.get_fields()}
+
+
+def label_expression(model, prefix='', as_str=False):
+    """
+    Expression SQL du libellé lisible d'un modèle lié.
+
+    ForeignKey: email, puis name (convention de l'export historique).
+    ManyToMany (`as_str`): équivalent SQL de __str__ quand il est connu.
+    """
+    names = _field_names(model)
+    parts = LABEL_PARTS.get(model._meta.label)
+    if not (as_str and parts):
+        if 'email' in names:
+            return F(f'{prefix}email')
+        if 'name' in names:
+            return F(f'{prefix}name')
+    if parts:
+        expressions = [
+            Value(part) if part not in names else Cast(F(f'{prefix}{part}'), CharField())
+            for part in parts
+        ]
+        if len(expressions) == 1:
+            return expressions[0]
+        return Concat(*expressions, output_field=CharField())
+    for name in ('code',) + tuple(sorted(n for n in names if n.endswith('_code'))):
+        if name in names:
+            return F(f'{prefix}{name}')
+    return F(f'{prefix}pk')
+
+
+def _m2m_subquery(model, field):
+    """Libellés d'un ManyToMany agrégés en une sous-requête corrélée"""
+    target = field.related_model
+    reverse_name = field.related_query_name()
+    related = (
+        target._default_manager.filter(**{reverse_name: OuterRef('pk')})
+        .order_by()
+        .values(reverse_name)
+        .annotate(labels=StringConcat(label_expression(target, as_str=True)))
+        .values('labels')
+    )
+    return Subquery(related, output_field=CharField())
+
+
+def resolve_columns(queryset, fields):
+    """
+    Construire (queryset annoté, colonnes values_list) pour `fields`.
+
+    Les noms inconnus du modèle produisent une colonne vide, comme l'ancien
+    export qui ignorait les attributs introuvables.
+    """
+    model = queryset.model
+    annotations = {}
+    columns = []
+    for name in fields:
+        alias = f'_export_{len(columns)}'
+        if '__' in name:
+            columns.append(name)
+            continue
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            annotations[alias] = Value('', output_field=CharField())
+            columns.append(alias)
+            continue
+
+        if field.many_to_many and not field.auto_created:
+            annotations[alias] = _m2m_subquery(model, field)
+            columns.append(alias)
+        elif field.concrete and (field.many_to_one or field.one_to_one):
+            annotations[alias] = label_expression(field.related_model, prefix=f'{name}__')
+            columns.append(alias)
+        elif field.concrete:
+            columns.append(field.attname)
+        else:
+            annotations[alias] = Value('', output_field=CharField())
+            columns.append(alias)
+
+    if annotations:
+        queryset = queryset.annotate(**annotations)
+    return queryset, columns
+
+
+def format_value(value):
+    """Format texte d'une cellule (mêmes conventions que l'export historique)"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+def default_export_fields(view, model):
+    """Champs exportés: `export_fields` du ViewSet, sinon tous les champs concrets"""
+    fields = getattr(view, 'export_fields', None)
+    if fields:
+        return list(fields)
+    return [f.name for f in model._meta.fields]
+
+
+def iter_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE, limit=None, formatter=format_value):
+    """Lignes formatées (listes de str), lues en flux, au plus `limit` lignes"""
+    # prefetch/select_related n'ont pas de sens sur une projection values_list
+    queryset, columns = resolve_columns(queryset.prefetch_related(None), fields)
+    rows = queryset.values_list(*columns)
+    if limit is not None:
+        rows = rows[:limit]
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield [formatter(value) for value in row]
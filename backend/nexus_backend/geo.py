@@ -0,0 +1,15 @@
+"""
+Outils géographiques partagés (SIG MG)
+"""
+
+from math import asin, cos, radians, sin, sqrt
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance orthodromique entre deux points GPS, en kilomètres"""
+    lat1, lon1, lat2, lon2 = (radians(float(v)) for v in (lat1, lon1, lat2, lon2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
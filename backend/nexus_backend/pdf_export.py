@@ -1,42 +1,309 @@
+import hashlib
+import json
+import tempfile
+from functools import lru_cache
 from io import BytesIO
+from xml.sax.saxutils import escape
 import qrcode
-from datetime import datetime
-from django.http import FileResponse
-from reportlab.lib.pagesizes import A4
+from datetime import datetime, date
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, mm
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
 from reportlab.lib import colors
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils.text import slugify
 from accounts.audit import AuditLog
-from django.contrib.contenttypes.models import ContentType
+
+from .export_projection import EXPORT_CHUNK_SIZE, iter_rows
+
+
+# PDF détaillé: à incrémenter à chaque changement de mise en page (invalide le cache)
+PDF_TEMPLATE_VERSION = 2
+PDF_CACHE_DIR = 'pdf_cache'
+
+# PDF liste: un tableau par page environ, en-tête répété
+PDF_ROWS_PER_TABLE = 30
+PDF_PORTRAIT_MAX_COLUMNS = 8
+PDF_CELL_FONT = 'Helvetica'
+PDF_CELL_FONT_SIZE = 7
+
+
+@lru_cache(maxsize=None)
+def _list_styles():
+    """Styles du PDF liste, construits une fois par processus"""
+    styles = getSampleStyleSheet()
+    premium_indigo = colors.HexColor('#4F46E5')
+    border_light = colors.HexColor('#E2E8F0')
+    dark_text = colors.HexColor('#0F172A')
+    return {
+        'normal': styles['Normal'],
+        'title': ParagraphStyle(
+            'ListTitle',
+            fontSize=18,
+            textColor=premium_indigo,
+            spaceAfter=20,
+            fontName='Helvetica-Bold',
+        ),
+        'header': ParagraphStyle(
+            'TableHeader',
+            fontSize=8,
+            textColor=colors.whitesmoke,
+            fontName='Helvetica-Bold',
+        ),
+        'cell': ParagraphStyle(
+            'TableCell',
+            fontSize=PDF_CELL_FONT_SIZE,
+            fontName=PDF_CELL_FONT,
+            textColor=dark_text,
+        ),
+        'footer': ParagraphStyle('Footer', fontSize=8, textColor=colors.grey, alignment=1),
+        'table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), premium_indigo),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('FONTNAME', (0, 1), (-1, -1), PDF_CELL_FONT),
+            ('FONTSIZE', (0, 1), (-1, -1), PDF_CELL_FONT_SIZE),
+            ('TEXTCOLOR', (0, 1), (-1, -1), dark_text),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#F8FAFC')),
+            ('GRID', (0, 0), (-1, -1), 0.5, border_light),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]),
+    }
+
+
+@lru_cache(maxsize=256)
+def _qr_png(data):
+    """PNG du QR code de `data` (mémorisé par contenu)"""
+    qr = qrcode.QRCode(version=1, box_size=10, border=4)
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    img_buffer = BytesIO()
+    img.save(img_buffer, format='PNG')
+    return img_buffer.getvalue()
+
+
+def audit_content_types(obj):
+    """
+    Valeurs de AuditLog.content_type désignant le modèle de `obj`: les
+    signaux enregistrent le nom du modèle ('report'), log_action le libellé
+    ('reports.Report').
+    """
+    return [obj._meta.model_name, obj._meta.label]
+
+
+def pdf_cache_name(obj, key):
+    return f"{PDF_CACHE_DIR}/{obj._meta.label_lower}/{obj.pk}/{key}.pdf"
+
+
+def prune_pdf_cache(obj, keep):
+    """Supprimer les rendus périmés d'un objet (versions précédentes)"""
+    directory = f"{PDF_CACHE_DIR}/{obj._meta.label_lower}/{obj.pk}"
+    try:
+        _dirs, files = default_storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for filename in files:
+        name = f"{directory}/{filename}"
+        if name != keep:
+            default_storage.delete(name)
+
+
+def _pdf_value(value):
+    """Format d'une cellule du PDF liste (dates au format français)"""
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%d/%m/%Y')
+    return str(value)
+
+
+def _list_table(header, rows, col_width):
+    table = Table([header] + rows, colWidths=[col_width] * len(header), repeatRows=1)
+    table.setStyle(_list_styles()['table'])
+    return table
+
+
+class _FlowableStream(list):
+    """
+    Liste de flowables alimentée à la demande par un générateur.
+
+    doc.build() consomme sa liste par la tête (flowables[0], del
+    flowables[0]): seuls quelques tableaux existent à la fois au lieu de
+    tout le document.
+    """
+
+    def __init__(self, source, lookahead=2):
+        super().__init__()
+        self._source = iter(source)
+        self._lookahead = lookahead
+
+    def _fill(self):
+        while self._source is not None and super().__len__() < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return super().__len__()
+
+    def __getitem__(self, index):
+        self._fill()
+        return super().__getitem__(index)
+
 
 class PDFExportMixin:
     """Mixin pour exporter les données en PDF avec audit trail et QR Code"""
 
     def _get_qr_code(self, data, size=1.5*inch):
-        """Génère un QR code pour le PDF"""
-        qr = qrcode.QRCode(version=1, box_size=10, border=4)
-        qr.add_data(data)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        img_buffer = BytesIO()
-        img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        return Image(img_buffer, width=size, height=size)
+        """Génère un QR code pour le PDF (PNG mémorisé par contenu)"""
+        return Image(BytesIO(_qr_png(data)), width=size, height=size)
+
+    # Champs du détail non repris dans le tableau d'informations
+    PDF_SKIPPED_FIELDS = ['id', 'created_at', 'updated_at', 'file', 'content', 'summary', 'site', 'generated_by', 'validated_by', 'report_type', 'status', 'is_locked']
+
+    def _pdf_detail_rows(self, obj):
+        """Lignes (libellé, valeur) du tableau d'informations détaillées"""
+        # Sérialiser les données de l'objet
+        serializer = self.get_serializer(obj)
+        obj_data = serializer.data
+        if not isinstance(obj_data, dict):
+            return []
+
+        obj_data = dict(obj_data)
+        # Traduction des champs en français
+        field_translations = {
+            'title': 'TITRE DU RAPPORT',
+            'report_type': 'TYPE DE RAPPORT',
+            'report_type_display': 'TYPE (AFFICHAGE)',
+            'status': 'STATUT',
+            'status_display': 'STATUT (AFFICHAGE)',
+            'site': 'ID SITE',
+            'site_name': 'NOM DU SITE',
+            'period_start': 'DÉBUT DE PÉRIODE',
+            'period_end': 'FIN DE PÉRIODE',
+            'generated_by': 'GÉNÉRÉ PAR (ID)',
+            'generated_by_name': 'GÉNÉRÉ PAR',
+            'validated_by': 'VALIDÉ PAR (ID)',
+            'validated_by_name': 'VALIDÉ PAR',
+        }
+
+        # Corriger la date si inversée
+        try:
+            if 'period_start' in obj_data and 'period_end' in obj_data:
+                start_date = datetime.strptime(obj_data['period_start'], '%Y-%m-%d').date()
+                end_date = datetime.strptime(obj_data['period_end'], '%Y-%m-%d').date()
+                if start_date > end_date:
+                    obj_data['period_start'], obj_data['period_end'] = obj_data['period_end'], obj_data['period_start']
+        except (ValueError, TypeError):
+            pass
+
+        rows = []
+        for key, value in obj_data.items():
+            if key not in self.PDF_SKIPPED_FIELDS:
+                if value and value != "":
+                    french_key = field_translations.get(key, str(key).replace('_', ' ').upper())
+                    rows.append((french_key, str(value)))
+        return rows
+
+    def _pdf_audit_logs(self, obj):
+        """Journal d'audit de l'objet (libellé 'app.Model' ou nom de modèle)"""
+        return AuditLog.objects.filter(
+            content_type__in=audit_content_types(obj),
+            object_id=obj.id
+        )
+
+    def _pdf_issuer(self, obj):
+        """Émetteur imprimé: l'auteur de l'objet, indépendant du demandeur"""
+        author = getattr(obj, 'generated_by', None)
+        if author is not None:
+            return author.get_full_name() or author.email
+        return "NexusMine"
+
+    def _pdf_issued_at(self, obj):
+        """
+        Date imprimée du document: dernière modification de l'objet (et non
+        l'heure du rendu), pour qu'une copie en cache reste exacte
+        """
+        issued_at = getattr(obj, 'updated_at', None) or getattr(obj, 'created_at', None)
+        if issued_at is None:
+            issued_at = self._pdf_audit_logs(obj).aggregate(last=Max('timestamp'))['last']
+        return timezone.localtime(issued_at) if issued_at else None
+
+    def pdf_cache_key(self, obj, base_url, detail_rows):
+        """
+        Empreinte du document: version du gabarit, contenu imprimé (dont la
+        date d'émission), point haut du journal d'audit et URL de
+        vérification du QR code.
+        """
+        audit = self._pdf_audit_logs(obj).aggregate(last_id=Max('id'), count=Count('id'))
+        payload = json.dumps({
+            'template': PDF_TEMPLATE_VERSION,
+            'object': [obj._meta.label, obj.pk],
+            'status': str(getattr(obj, 'status', '')),
+            'issuer': self._pdf_issuer(obj),
+            'title': getattr(obj, 'title', '') if hasattr(obj, 'report_type') else '',
+            'rows': detail_rows,
+            'summary': getattr(obj, 'summary', '') or '',
+            'content': getattr(obj, 'content', '') or '',
+            'audit': [audit['last_id'], audit['count']],
+            'issued_at': self._pdf_issued_at(obj),
+            'base_url': base_url,
+        }, sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
     @action(detail=True, methods=['get'])
     def export_pdf(self, request, pk=None):
         """
         Exporte l'objet et son audit trail complet en PDF avec design premium
+
+        Le document rendu est conservé dans le stockage des médias sous son
+        empreinte (pdf_cache_key): les téléchargements suivants d'un objet
+        inchangé le relisent sans nouveau rendu (ETag / If-None-Match -> 304).
         """
         obj = self.get_object()
-        
-        # Créer le buffer PDF
-        buffer = BytesIO()
+        base_url = request.build_absolute_uri('/')[:-1]
+        detail_rows = self._pdf_detail_rows(obj)
+        key = self.pdf_cache_key(obj, base_url, detail_rows)
+        etag = f'"{key}"'
+
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+            return response
+
+        name = pdf_cache_name(obj, key)
+        if not default_storage.exists(name):
+            buffer = BytesIO()
+            self.render_pdf_document(obj, buffer, base_url, detail_rows)
+            saved = default_storage.save(name, ContentFile(buffer.getvalue()))
+            if saved != name:
+                # Rendu concurrent: le stockage a renommé notre copie
+                default_storage.delete(saved)
+            prune_pdf_cache(obj, keep=name)
+
+        filename = f"{slugify(obj.__class__.__name__)}_{obj.id}.pdf"
+        response = FileResponse(default_storage.open(name, 'rb'), as_attachment=True, filename=filename, content_type='application/pdf')
+        response['ETag'] = etag
+        return response
+
+    def render_pdf_document(self, obj, buffer, base_url, detail_rows):
+        """Écrit le PDF détaillé de `obj` (avec QR code et audit) dans `buffer`"""
         doc = SimpleDocTemplate(
             buffer, 
             pagesize=A4,
@@ -111,8 +378,10 @@ class PDFExportMixin:
         if hasattr(obj, 'report_type'):
             title_text = obj.title.upper()
             
-        elements.append(Paragraph(title_text, title_style))
-        elements.append(Paragraph(f"Généré le {datetime.now().strftime('%d %B %Y à %H:%M')}", subtitle_style))
+        elements.append(Paragraph(escape(title_text), title_style))
+        issued_at = self._pdf_issued_at(obj)
+        if issued_at:
+            elements.append(Paragraph(f"Généré le {issued_at.strftime('%d %B %Y à %H:%M')}", subtitle_style))
         
         # HR
         elements.append(Table([['']], colWidths=[7.2*inch], style=[('LINEBELOW', (0,0), (-1,-1), 0.5, BORDER_LIGHT)]))
@@ -121,15 +390,14 @@ class PDFExportMixin:
         # --- QR CODE & METADATA SECTION ---
         # QR Code deeply linked to mobile app or dashboard
         # Format: base_url/api/reports/{id}/verify/
-        base_url = request.build_absolute_uri('/')[:-1]
         qr_data = f"{base_url}/api/reports/{obj.id}/verify/"
         qr_img = self._get_qr_code(qr_data, size=1.2*inch)
         
         meta_table_data = [
             [Paragraph("<b>RÉFÉRENCE</b>", label_style), Paragraph(str(obj.id), value_style), qr_img],
-            [Paragraph("<b>ÉMIS PAR</b>", label_style), Paragraph(request.user.get_full_name() or request.user.email, value_style), ''],
-            [Paragraph("<b>STATUT</b>", label_style), Paragraph(getattr(obj, 'status', 'N/A'), value_style), ''],
-            [Paragraph("<b>DATE D'ÉMISSION</b>", label_style), Paragraph(datetime.now().strftime('%d/%m/%Y'), value_style), ''],
+            [Paragraph("<b>ÉMIS PAR</b>", label_style), Paragraph(escape(self._pdf_issuer(obj)), value_style), ''],
+            [Paragraph("<b>STATUT</b>", label_style), Paragraph(str(getattr(obj, 'status', 'N/A')), value_style), ''],
+            [Paragraph("<b>DATE D'ÉMISSION</b>", label_style), Paragraph(issued_at.strftime('%d/%m/%Y') if issued_at else 'N/A', value_style), ''],
         ]
         
         meta_table = Table(meta_table_data, colWidths=[1.5*inch, 3.5*inch, 1.5*inch])
@@ -146,48 +414,11 @@ class PDFExportMixin:
         # --- MAIN CONTENT ---
         elements.append(Paragraph("INFORMATIONS DÉTAILLÉES", heading_style))
         
-        # Sérialiser les données de l'objet
-        serializer = self.get_serializer(obj)
-        obj_data = serializer.data
-        
-        if isinstance(obj_data, dict):
-            obj_rows = []
-            # Traduction des champs en français
-            field_translations = {
-                'title': 'TITRE DU RAPPORT',
-                'report_type': 'TYPE DE RAPPORT',
-                'report_type_display': 'TYPE (AFFICHAGE)',
-                'status': 'STATUT',
-                'status_display': 'STATUT (AFFICHAGE)',
-                'site': 'ID SITE',
-                'site_name': 'NOM DU SITE',
-                'period_start': 'DÉBUT DE PÉRIODE',
-                'period_end': 'FIN DE PÉRIODE',
-                'generated_by': 'GÉNÉRÉ PAR (ID)',
-                'generated_by_name': 'GÉNÉRÉ PAR',
-                'validated_by': 'VALIDÉ PAR (ID)',
-                'validated_by_name': 'VALIDÉ PAR',
-            }
-
-            # Corriger la date si inversée
-            try:
-                if 'period_start' in obj_data and 'period_end' in obj_data:
-                    start_date = datetime.strptime(obj_data['period_start'], '%Y-%m-%d').date()
-                    end_date = datetime.strptime(obj_data['period_end'], '%Y-%m-%d').date()
-                    if start_date > end_date:
-                        obj_data['period_start'], obj_data['period_end'] = obj_data['period_end'], obj_data['period_start']
-            except (ValueError, TypeError):
-                pass
-                
-            for key, value in obj_data.items():
-                if key not in ['id', 'created_at', 'updated_at', 'file', 'content', 'summary', 'site', 'generated_by', 'validated_by', 'report_type', 'status']:
-                    if value and value != "":
-                        french_key = field_translations.get(key, str(key).replace('_', ' ').upper())
-                        obj_rows.append([
-                            Paragraph(french_key, label_style),
-                            Paragraph(str(value), value_style)
-                        ])
-            
+        if detail_rows:
+            obj_rows = [
+                [Paragraph(label, label_style), Paragraph(escape(value), value_style)]
+                for label, value in detail_rows
+            ]
             obj_table = Table(obj_rows, colWidths=[2.5*inch, 4.5*inch])
             obj_table.setStyle(TableStyle([
                 ('LINEBELOW', (0, 0), (-1, -1), 0.25, BORDER_LIGHT),
@@ -200,27 +431,23 @@ class PDFExportMixin:
         # Content/Summary specific fields
         if hasattr(obj, 'summary') and obj.summary:
             elements.append(Paragraph("RÉSUMÉ EXÉCUTIF", heading_style))
-            elements.append(Paragraph(obj.summary, value_style))
+            elements.append(Paragraph(escape(obj.summary), value_style))
             
         if hasattr(obj, 'content') and obj.content:
             elements.append(Paragraph("CONTENU DU RAPPORT", heading_style))
             # Split by lines to maintain paragraphs
             for line in obj.content.split('\n'):
                 if line.strip():
-                    elements.append(Paragraph(line, value_style))
+                    elements.append(Paragraph(escape(line), value_style))
                     elements.append(Spacer(1, 0.1*inch))
         
         # --- AUDIT TRAIL PAGE ---
         elements.append(PageBreak())
         elements.append(Paragraph("HISTORIQUE D'AUDIT & TRAÇABILITÉ", heading_style))
         
-        content_type = ContentType.objects.get_for_model(obj.__class__)
-        audit_logs = AuditLog.objects.filter(
-            content_type=content_type,
-            object_id=obj.id
-        ).order_by('-timestamp')
+        audit_logs = self._pdf_audit_logs(obj).select_related('user').order_by('-timestamp')[:30]
         
-        if audit_logs.exists():
+        if audit_logs:
             audit_rows = [[
                 Paragraph("DATE", label_style),
                 Paragraph("ACTEUR", label_style),
@@ -228,12 +455,12 @@ class PDFExportMixin:
                 Paragraph("MODIFICATION", label_style),
             ]]
             
-            for log in audit_logs[:30]:
+            for log in audit_logs:
                 audit_rows.append([
                     Paragraph(log.timestamp.strftime('%d/%m/%Y %H:%M'), value_style),
-                    Paragraph(log.user.email, value_style),
+                    Paragraph(escape(log.user.email) if log.user else "Système", value_style),
                     Paragraph(log.get_action_display(), value_style),
-                    Paragraph(log.field_changed or "-", value_style),
+                    Paragraph(escape(log.field_changed or "-"), value_style),
                 ])
             
             audit_table = Table(audit_rows, colWidths=[1*inch, 1.8*inch, 1*inch, 3.2*inch])
@@ -256,110 +483,93 @@ class PDFExportMixin:
         
         # Construire le PDF
         doc.build(elements)
-        buffer.seek(0)
-        
-        filename = f"{slugify(model_name)}_{obj.id}.pdf"
-        return FileResponse(buffer, as_attachment=True, filename=filename, content_type='application/pdf')
         
     @action(detail=False, methods=['get'])
     def export_pdf_list(self, request):
         """
         Exporte les données filtrées en format PDF (Tableau Premium)
+
+        Au-delà de EXPORT_PDF_MAX_ROWS lignes, le document est tronqué:
+        les exports en arrière-plan (/api/export-jobs/) acceptent davantage.
         """
         queryset = self.filter_queryset(self.get_queryset())
-        model_name = self.get_queryset().model._meta.verbose_name_plural.upper()
-        
-        buffer = BytesIO()
+        model_name = queryset.model._meta.verbose_name_plural.upper()
+
+        # Fichier temporaire: le PDF n'est jamais entièrement en mémoire
+        output = tempfile.TemporaryFile()
+        self.render_pdf_list(queryset, output, max_rows=getattr(settings, 'EXPORT_PDF_MAX_ROWS', 5000))
+        output.seek(0)
+
+        filename = f"export_{slugify(model_name)}_{datetime.now().strftime('%Y%m%d')}.pdf"
+        return FileResponse(output, as_attachment=True, filename=filename, content_type='application/pdf')
+
+    def get_pdf_list_fields(self, model):
+        """Colonnes du PDF liste: `export_fields`, sinon les champs hors id/horodatages"""
+        if hasattr(self, 'export_fields'):
+            return list(self.export_fields)
+        return [f.name for f in model._meta.fields if f.name not in ['id', 'created_at', 'updated_at']]
+
+    def render_pdf_list(self, queryset, output, max_rows=None, progress=None):
+        """
+        Écrit le PDF liste de `queryset` dans `output` (fichier binaire).
+        Utilisé par l'action export_pdf_list et par les exports en arrière-plan.
+
+        Les colonnes sont projetées en SQL (values_list) et lues en flux; les
+        lignes sont découpées en tableaux d'une page (en-tête répété) produits
+        au fur et à mesure de la mise en page. `progress(n)` est appelé toutes
+        les EXPORT_CHUNK_SIZE lignes.
+        Retourne le nombre de lignes exportées.
+        """
+        model_name = queryset.model._meta.verbose_name_plural.upper()
+        fields = self.get_pdf_list_fields(queryset.model)
+        styles = _list_styles()
+
+        # Paysage au-delà de quelques colonnes
+        pagesize = landscape(A4) if len(fields) > PDF_PORTRAIT_MAX_COLUMNS else A4
         doc = SimpleDocTemplate(
-            buffer, 
-            pagesize=A4, # A4 par défaut, ou paysage si beaucoup de colonnes?
+            output,
+            pagesize=pagesize,
             rightMargin=30, leftMargin=30,
-            topMargin=50, bottomMargin=50
-        )
-        elements = []
-        
-        # Couleurs Premium
-        PREMIUM_INDIGO = colors.HexColor('#4F46E5')
-        BORDER_LIGHT = colors.HexColor('#E2E8F0')
-        DARK_TEXT = colors.HexColor('#0F172A')
-        
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'ListTitle',
-            fontSize=18,
-            textColor=PREMIUM_INDIGO,
-            spaceAfter=20,
-            fontName='Helvetica-Bold',
+            topMargin=50, bottomMargin=50,
+            pageCompression=1,
         )
-        
-        header_style = ParagraphStyle(
-            'TableHeader',
-            fontSize=8,
-            textColor=colors.whitesmoke,
-            fontName='Helvetica-Bold',
-        )
-        
-        cell_style = ParagraphStyle(
-            'TableCell',
-            fontSize=7,
-            textColor=DARK_TEXT,
-        )
-        
-        # Header
-        elements.append(Paragraph(f"RAPPORT DES {model_name}", title_style))
-        elements.append(Paragraph(f"Généré le {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Déterminer les colonnes
-        if hasattr(self, 'export_fields'):
-            fields = self.export_fields
-        else:
-            fields = [f.name for f in queryset.model._meta.fields if not f.name in ['id', 'created_at', 'updated_at']]
-            
-        # Préparer les données du tableau
-        table_data = [[Paragraph(f.replace('_', ' ').upper(), header_style) for f in fields]]
-        
-        for obj in queryset:
-            row = []
-            for field in fields:
-                try:
-                    val = getattr(obj, field)
-                    if hasattr(val, 'all') and callable(val.all): # M2M
-                        val = ", ".join([str(item) for item in val.all()])
-                    elif isinstance(val, (datetime, date)) or hasattr(val, 'strftime'):
-                        val = val.strftime('%d/%m/%Y')
-                    elif hasattr(val, 'email'): val = val.email
-                    elif hasattr(val, 'name'): val = val.name
-                except Exception:
-                    val = ""
-                row.append(Paragraph(str(val) if val is not None else "", cell_style))
-            table_data.append(row)
-        
-        # Créer le tableau (auto-size)
-        table = Table(table_data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), PREMIUM_INDIGO),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#F8FAFC')),
-            ('GRID', (0, 0), (-1, -1), 0.5, BORDER_LIGHT),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        elements.append(table)
-        
-        # Footer
-        elements.append(Spacer(1, 0.5*inch))
-        elements.append(Paragraph(
-            f"Extraction NexusMine - {queryset.count()} éléments exportés.",
-            ParagraphStyle('Footer', fontSize=8, textColor=colors.grey, alignment=1)
-        ))
-        
-        doc.build(elements)
-        buffer.seek(0)
-        
-        filename = f"export_{slugify(model_name)}_{datetime.now().strftime('%Y%m%d')}.pdf"
-        return FileResponse(buffer, as_attachment=True, filename=filename, content_type='application/pdf')
+        col_width = doc.width / max(len(fields), 1)
+        header = [Paragraph(escape(f.replace('_', ' ').upper()), styles['header']) for f in fields]
+        counter = {'rows': 0, 'truncated': False}
+
+        def cell(text):
+            # Paragraph (coûteux) seulement si le texte doit passer à la ligne
+            if stringWidth(text, PDF_CELL_FONT, PDF_CELL_FONT_SIZE) <= col_width - 6:
+                return text
+            return Paragraph(escape(text), styles['cell'])
+
+        def flowables():
+            yield Paragraph(f"RAPPORT DES {model_name}", styles['title'])
+            yield Paragraph(f"Généré le {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['normal'])
+            yield Spacer(1, 0.3*inch)
+
+            limit = max_rows + 1 if max_rows else None
+            chunk = []
+            for values in iter_rows(queryset, fields, limit=limit, formatter=_pdf_value):
+                if max_rows and counter['rows'] >= max_rows:
+                    counter['truncated'] = True
+                    break
+                chunk.append([cell(value) for value in values])
+                counter['rows'] += 1
+                if progress and counter['rows'] % EXPORT_CHUNK_SIZE == 0:
+                    progress(counter['rows'])
+                if len(chunk) >= PDF_ROWS_PER_TABLE:
+                    yield _list_table(header, chunk, col_width)
+                    chunk = []
+            if chunk or not counter['rows']:
+                yield _list_table(header, chunk, col_width)
+
+            # Footer
+            yield Spacer(1, 0.5*inch)
+            footer = f"Extraction NexusMine - {counter['rows']} éléments exportés."
+            if counter['truncated']:
+                footer += f" Export limité aux {max_rows} premières lignes: utiliser l'export en arrière-plan pour la liste complète."
+            yield Paragraph(footer, styles['footer'])
 
+        doc.build(_FlowableStream(flowables()))
+        return counter['rows']
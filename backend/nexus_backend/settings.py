@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     'equipment',
     'environment',
     'stock',
+    'exports',
 ]
 # settings.py
 
@@ -114,6 +115,24 @@ else:
         },
     }
 
+# Cache partagé (registre des verrous, etc.): Redis en production,
+# mémoire locale du processus en développement
+if redis_url:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': redis_url,
+            'KEY_PREFIX': 'nexus',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'nexus-default',
+        },
+    }
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -284,3 +303,77 @@ EMAIL_BACKEND = os.getenv(
     'django.core.mail.backends.console.EmailBackend',
 )
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@nexusmine.com')
+
+# ── Journal d'audit ────────────────────────────────────────────────────
+# Mois conservés dans la table active avant archivage (archive_audit_partitions)
+AUDIT_RETENTION_MONTHS = int(os.getenv('AUDIT_RETENTION_MONTHS', '12'))
+AUDIT_ARCHIVE_DIR = Path(os.getenv('AUDIT_ARCHIVE_DIR', BASE_DIR / 'archives' / 'audit'))
+
+# ── Exports en arrière-plan (run_export_jobs) ─────────────────────────
+# Réutilisation d'un export identique terminé depuis moins de N secondes
+EXPORT_JOB_FRESHNESS_SECONDS = int(os.getenv('EXPORT_JOB_FRESHNESS_SECONDS', '900'))
+# Durée de conservation des fichiers produits
+EXPORT_JOB_TTL_HOURS = int(os.getenv('EXPORT_JOB_TTL_HOURS', '24'))
+# Export démarré depuis plus de N secondes (worker arrêté): remis en file
+EXPORT_JOB_TIMEOUT_SECONDS = int(os.getenv('EXPORT_JOB_TIMEOUT_SECONDS', '3600'))
+# PDF liste: lignes au plus (synchrone / exports en arrière-plan), le reste est tronqué
+EXPORT_PDF_MAX_ROWS = int(os.getenv('EXPORT_PDF_MAX_ROWS', '5000'))
+EXPORT_JOB_PDF_MAX_ROWS = int(os.getenv('EXPORT_JOB_PDF_MAX_ROWS', '100000'))
+
+# ── Stocks ─────────────────────────────────────────────────────────────
+# Mouvements au plus par lot (POST /api/stock-movements/bulk/)
+STOCK_BULK_MAX_ROWS = int(os.getenv('STOCK_BULK_MAX_ROWS', '5000'))
+
+# ── Télémétrie des équipements ─────────────────────────────────────────
+# Relevés GPS au plus par lot (POST /api/equipment/telemetry/)
+TELEMETRY_MAX_FIXES = int(os.getenv('TELEMETRY_MAX_FIXES', '10000'))
+# Rétention de l'historique GPS (compact_tracking): positions brutes, puis
+# agrégats par minute; les agrégats par heure sont conservés
+TRACKING_RAW_RETENTION_DAYS = int(os.getenv('TRACKING_RAW_RETENTION_DAYS', '7'))
+TRACKING_MINUTE_RETENTION_DAYS = int(os.getenv('TRACKING_MINUTE_RETENTION_DAYS', '90'))
+TRACKING_PRUNE_BATCH_SIZE = int(os.getenv('TRACKING_PRUNE_BATCH_SIZE', '5000'))
+# Compaction par le planificateur (run_equipment_jobs)
+TRACKING_COMPACT_INTERVAL_HOURS = float(os.getenv('TRACKING_COMPACT_INTERVAL_HOURS', '24'))
+# Points au plus d'une trajectoire quand la résolution n'est pas précisée
+TRACKING_MAX_POINTS = int(os.getenv('TRACKING_MAX_POINTS', '2000'))
+# Équipements au plus par requête de trajectoires (GET /api/equipment/trajectories/)
+TRACKING_MAX_TRAJECTORIES = int(os.getenv('TRACKING_MAX_TRAJECTORIES', '50'))
+# Diffusion des positions (ws/tracking/): une position par équipement au plus
+# toutes les N secondes et s'il a bougé de M mètres (ou après le battement);
+# trames envoyées aux clients au plus toutes les F secondes
+TRACKING_STREAM_MIN_INTERVAL_SECONDS = float(os.getenv('TRACKING_STREAM_MIN_INTERVAL_SECONDS', '1'))
+TRACKING_STREAM_MIN_DISTANCE_M = float(os.getenv('TRACKING_STREAM_MIN_DISTANCE_M', '5'))
+TRACKING_STREAM_HEARTBEAT_SECONDS = float(os.getenv('TRACKING_STREAM_HEARTBEAT_SECONDS', '30'))
+TRACKING_STREAM_FRAME_SECONDS = float(os.getenv('TRACKING_STREAM_FRAME_SECONDS', '1'))
+
+# ── Maintenance prédictive ─────────────────────────────────────────────
+# Intervalle d'entretien de référence (score_equipment_health)
+EQUIPMENT_SERVICE_INTERVAL_HOURS = float(os.getenv('EQUIPMENT_SERVICE_INTERVAL_HOURS', '250'))
+EQUIPMENT_SERVICE_INTERVAL_DAYS = float(os.getenv('EQUIPMENT_SERVICE_INTERVAL_DAYS', '90'))
+# Recalcul des scores par le planificateur (run_equipment_jobs)
+EQUIPMENT_SCORE_INTERVAL_HOURS = float(os.getenv('EQUIPMENT_SCORE_INTERVAL_HOURS', '24'))
+
+# ── Géofences ──────────────────────────────────────────────────────────
+# Points au plus par contrôle en lot (POST /api/sites/{id}/points-in-concession/)
+SITE_MAX_CONCESSION_POINTS = int(os.getenv('SITE_MAX_CONCESSION_POINTS', '200000'))
+# Taille des cellules de l'index spatial des sites et zones (degrés, ~5 km)
+GEOFENCE_GRID_CELL_DEGREES = float(os.getenv('GEOFENCE_GRID_CELL_DEGREES', '0.05'))
+
+# ── Tuiles de la carte ─────────────────────────────────────────────────
+# Zooms servis par /api/tiles/{z}/{x}/{y} et points au plus par couche et par tuile
+TILES_MIN_ZOOM = int(os.getenv('TILES_MIN_ZOOM', '0'))
+TILES_MAX_ZOOM = int(os.getenv('TILES_MAX_ZOOM', '20'))
+TILES_MAX_POINTS = int(os.getenv('TILES_MAX_POINTS', '5000'))
+# Durée de vie des tuiles en cache (filet de sécurité: elles sont invalidées
+# à chaque modification) et cache navigateur
+TILES_CACHE_SECONDS = int(os.getenv('TILES_CACHE_SECONDS', '3600'))
+TILES_CLIENT_MAX_AGE = int(os.getenv('TILES_CLIENT_MAX_AGE', '30'))
+# Au-delà de ce nombre de tuiles touchées à un zoom, tout le zoom est invalidé
+TILES_INVALIDATE_MAX_TILES = int(os.getenv('TILES_INVALIDATE_MAX_TILES', '256'))
+
+# ── Synchronisation des nœuds distribués ───────────────────────────────
+# Changements au plus par réception ou par envoi
+# (/api/distributed-nodes/{id}/changes/ et upload/)
+SYNC_MAX_CHANGES = int(os.getenv('SYNC_MAX_CHANGES', '5000'))
+# Taille au plus d'un envoi NDJSON une fois décompressé (octets)
+SYNC_MAX_UPLOAD_BYTES = int(os.getenv('SYNC_MAX_UPLOAD_BYTES', str(20 * 1024 * 1024)))
@@ -2,6 +2,8 @@ from rest_framework import serializers
 from .models import Operation, WorkZone, Shift, OperationPhoto
 from personnel.serializers import PersonnelListSerializer
 from equipment.serializers import EquipmentListSerializer
+from accounts.lock_registry import LockStatusSerializerMixin
+from mining_sites.geofences import locate
 
 
 class WorkZoneSerializer(serializers.ModelSerializer):
@@ -68,7 +70,7 @@ class OperationPhotoSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class OperationSerializer(serializers.ModelSerializer):
+class OperationSerializer(LockStatusSerializerMixin, serializers.ModelSerializer):
     """Serializer complet pour le modèle Operation"""
     operation_type_display = serializers.CharField(
         source='get_operation_type_display', read_only=True
@@ -117,7 +119,7 @@ class OperationSerializer(serializers.ModelSerializer):
             'equipment', 'equipment_details',
             'created_by', 'created_by_name',
             'validated_by', 'validated_by_name',
-            'created_at', 'updated_at'
+            'is_locked', 'created_at', 'updated_at'
         ]
         read_only_fields = [
             'id', 'validation_date', 'validated_by',
@@ -166,10 +168,16 @@ class OperationSerializer(serializers.ModelSerializer):
                     'gps_latitude': "Alerte SIG MG : Les coordonnées GPS de l'opération se trouvent en dehors de la concession autorisée pour ce site minier."
                 })
 
+            # Zone de chantier déduite de la position si elle n'est pas saisie
+            if not self.instance and 'work_zone' not in data:
+                zone_id = locate(lat, lon, site_ids=[site.pk]).zone_id
+                if zone_id:
+                    data['work_zone'] = WorkZone.objects.filter(pk=zone_id).first()
+
         return data
 
 
-class OperationListSerializer(serializers.ModelSerializer):
+class OperationListSerializer(LockStatusSerializerMixin, serializers.ModelSerializer):
     """Serializer simplifié pour les listes"""
     site_name = serializers.CharField(source='site.name', read_only=True)
     work_zone_name = serializers.CharField(source='work_zone.name', read_only=True)
@@ -184,7 +192,7 @@ class OperationListSerializer(serializers.ModelSerializer):
             'id', 'operation_code', 'operation_type', 'site_name',
             'work_zone_name', 'date', 'status', 'status_display',
             'validation_status', 'validation_status_display',
-            'quantity_extracted'
+            'quantity_extracted', 'is_locked'
         ]
 
 
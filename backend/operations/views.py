@@ -2,10 +2,11 @@ from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum
+from django.db.models import Prefetch, Sum
 from django.db.models.functions import TruncMonth, TruncDate
 from django.utils import timezone
 from datetime import date, timedelta
+from equipment.models import Equipment, with_last_maintenance
 from .models import Operation, WorkZone, Shift, OperationPhoto
 from .serializers import (
     OperationSerializer, OperationListSerializer, OperationValidationSerializer,
@@ -14,6 +15,7 @@ from .serializers import (
 )
 from accounts.permissions import CanManageOperations
 from accounts.mixins import SiteScopedMixin
+from accounts.lock_registry import LockGuardMixin
 
 
 class WorkZoneViewSet(SiteScopedMixin, viewsets.ModelViewSet):
@@ -56,7 +58,7 @@ from nexus_backend.csv_export import CSVExportMixin
 from nexus_backend.pdf_export import PDFExportMixin
 
 
-class OperationViewSet(CSVExportMixin, PDFExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
+class OperationViewSet(CSVExportMixin, PDFExportMixin, LockGuardMixin, SiteScopedMixin, viewsets.ModelViewSet):
     """ViewSet pour la gestion des opérations
 
     Permissions:
@@ -69,7 +71,10 @@ class OperationViewSet(CSVExportMixin, PDFExportMixin, SiteScopedMixin, viewsets
     site_field = 'site'
     queryset = Operation.objects.select_related(
         'site', 'work_zone', 'shift', 'created_by', 'validated_by'
-    ).prefetch_related('personnel', 'equipment', 'photos').all()
+    ).prefetch_related(
+        'personnel', 'photos',
+        Prefetch('equipment', queryset=with_last_maintenance(Equipment.objects.select_related('site'))),
+    ).all()
     permission_classes = [permissions.IsAuthenticated, CanManageOperations]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = {
@@ -0,0 +1,273 @@
+"""
+Lots de rapports réglementaires (un rapport par site et par période)
+
+Chaque site est rendu (PDF de synthèse et/ou classeur Excel) dans un
+processus d'un pool dimensionné sur les cœurs disponibles; les fichiers
+sont ajoutés à une archive ZIP au fur et à mesure de leur achèvement,
+avec un manifeste (manifest.json): empreintes, tailles, durées et échecs
+par site.
+
+Utilisé par la commande generate_report_bundle et par les exports en
+arrière-plan (POST /api/reports/bundle/).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .excel import report_sheet_querysets, write_report_workbook
+from .models import Report
+
+
+BUNDLE_FORMATS = ('pdf', 'xlsx')
+MANIFEST_NAME = 'manifest.json'
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def default_workers(task_count):
+    """Processus du pool: cœurs utilisables, sans dépasser le nombre de sites"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return max(1, min(cores, task_count))
+
+
+def site_report(site, period_start, period_end):
+    """Rapport (non enregistré) d'un site sur la période"""
+    return Report(
+        title=f"Rapport réglementaire {site.code} - {period_start} au {period_end}",
+        report_type=Report.ReportType.CUSTOM,
+        status=Report.ReportStatus.GENERATED,
+        site=site,
+        period_start=period_start,
+        period_end=period_end,
+    )
+
+
+def site_indicators(report):
+    """Indicateurs de synthèse par domaine: [(section, [(libellé, valeur)])]"""
+    querysets = {title: queryset for title, _m, _c, queryset in report_sheet_querysets(report)}
+
+    operations = querysets['Opérations'].aggregate(
+        count=Count('pk'),
+        extracted=Sum('quantity_extracted'),
+        transported=Sum('quantity_transported'),
+        processed=Sum('quantity_processed'),
+    )
+    incidents = querysets['Incidents'].aggregate(
+        count=Count('pk'),
+        critical=Count('pk', filter=Q(severity='CRITICAL')),
+        high=Count('pk', filter=Q(severity='HIGH')),
+        injuries=Sum('injuries_count'),
+        fatalities=Sum('fatalities_count'),
+        lost_days=Sum('lost_work_days'),
+    )
+    environment = querysets['Environnement'].aggregate(
+        count=Count('pk'),
+        non_compliant=Count('pk', filter=Q(is_compliant=False)),
+    )
+    stock = querysets['Mouvements de stock'].values('movement_type').annotate(
+        total=Sum('quantity'), count=Count('pk'),
+    ).order_by('movement_type')
+
+    return [
+        ('Opérations', [
+            ("Opérations", operations['count']),
+            ("Quantité extraite (t)", operations['extracted'] or 0),
+            ("Quantité transportée (t)", operations['transported'] or 0),
+            ("Quantité traitée (t)", operations['processed'] or 0),
+        ]),
+        ('Incidents', [
+            ("Incidents", incidents['count']),
+            ("dont critiques", incidents['critical']),
+            ("dont graves", incidents['high']),
+            ("Blessés", incidents['injuries'] or 0),
+            ("Décès", incidents['fatalities'] or 0),
+            ("Jours de travail perdus", incidents['lost_days'] or 0),
+        ]),
+        ('Environnement', [
+            ("Mesures", environment['count']),
+            ("Mesures non conformes", environment['non_compliant']),
+        ]),
+        ('Mouvements de stock', [
+            (f"{row['movement_type']} ({row['count']})", row['total'] or 0)
+            for row in stock
+        ] or [("Mouvements", 0)]),
+    ]
+
+
+@lru_cache(maxsize=None)
+def _pdf_styles():
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'BundleTitle', parent=styles['Heading1'], fontSize=18,
+            textColor=colors.HexColor('#4F46E5'), fontName='Helvetica-Bold',
+        ),
+        'heading': ParagraphStyle(
+            'BundleHeading', parent=styles['Heading2'], fontSize=12,
+            textColor=colors.HexColor('#0F172A'), spaceBefore=14, spaceAfter=6,
+        ),
+        'normal': styles['Normal'],
+    }
+
+
+def write_site_pdf(report, output):
+    """PDF de synthèse réglementaire d'un site sur la période"""
+    from xml.sax.saxutils import escape
+
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = _pdf_styles()
+    doc = SimpleDocTemplate(output, pagesize=A4, rightMargin=50, leftMargin=50, topMargin=50, bottomMargin=50)
+    elements = [
+        Paragraph("NEXUSMINE - RAPPORT RÉGLEMENTAIRE", styles['title']),
+        Paragraph(escape(str(report.site)), styles['normal']),
+        Paragraph(f"Période du {report.period_start:%d/%m/%Y} au {report.period_end:%d/%m/%Y}", styles['normal']),
+        Paragraph(f"Généré le {timezone.localtime():%d/%m/%Y %H:%M}", styles['normal']),
+        Spacer(1, 0.2*inch),
+    ]
+    for section, rows in site_indicators(report):
+        elements.append(Paragraph(section.upper(), styles['heading']))
+        table = Table([[label, str(value)] for label, value in rows], colWidths=[4*inch, 2.5*inch])
+        table.setStyle(TableStyle([
+            ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.HexColor('#E2E8F0')),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ]))
+        elements.append(table)
+    doc.build(elements)
+
+
+# ── Rendu d'un site (exécuté dans un processus du pool) ────────────────
+
+def _init_worker():
+    import django
+
+    django.setup()
+    # Les connexions héritées du parent ne doivent pas être partagées
+    connections.close_all()
+
+
+def render_site(site_id, period_start, period_end, formats, directory):
+    """
+    Rendre les fichiers d'un site dans `directory`.
+
+    Retourne un dict sérialisable: site, fichiers produits, durée, erreur.
+    """
+    from mining_sites.models import MiningSite
+
+    started = time.monotonic()
+    result = {'site_id': site_id, 'code': None, 'name': None, 'files': [], 'error': None}
+    try:
+        site = MiningSite.objects.get(pk=site_id)
+        result['code'], result['name'] = site.code, site.name
+        report = site_report(site, period_start, period_end)
+        stem = f"{slugify(site.code)}_{period_start:%Y%m%d}_{period_end:%Y%m%d}"
+        for export_format in formats:
+            path = os.path.join(directory, f"{site_id}_{stem}.{export_format}")
+            with open(path, 'wb') as output:
+                if export_format == 'pdf':
+                    write_site_pdf(report, output)
+                else:
+                    write_report_workbook(report, output)
+            result['files'].append({'path': path, 'name': f"{slugify(site.code)}/{stem}.{export_format}"})
+    except Exception as exc:
+        result['error'] = f"{exc.__class__.__name__}: {exc}"
+    result['seconds'] = round(time.monotonic() - started, 3)
+    return result
+
+
+def _add_to_zip(archive, path, arcname):
+    """Copier un fichier dans l'archive en calculant son empreinte"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as source, archive.open(arcname, 'w') as target:
+        while True:
+            chunk = source.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            target.write(chunk)
+            size += len(chunk)
+    os.remove(path)
+    return {'name': arcname, 'size': size, 'sha256': digest.hexdigest()}
+
+
+def build_bundle(output, period_start, period_end, site_ids, formats=BUNDLE_FORMATS, workers=None, progress=None):
+    """
+    Écrire l'archive ZIP du lot dans `output` (fichier binaire).
+
+    `progress(sites traités, sites à traiter)` est appelé à chaque site.
+    Retourne le manifeste (dict), également écrit dans l'archive.
+    """
+    site_ids = list(site_ids)
+    formats = [f for f in BUNDLE_FORMATS if f in formats]
+    workers = workers or default_workers(len(site_ids))
+    started = time.monotonic()
+    manifest = {
+        'generated_at': timezone.now(),
+        'period_start': period_start,
+        'period_end': period_end,
+        'formats': formats,
+        'workers': workers,
+        'sites': [],
+    }
+
+    directory = tempfile.mkdtemp(prefix='report_bundle_')
+    try:
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            def collect(result):
+                files = result.pop('files')
+                result['files'] = [_add_to_zip(archive, f['path'], f['name']) for f in files]
+                manifest['sites'].append(result)
+                if progress:
+                    progress(len(manifest['sites']), len(site_ids))
+
+            args = (period_start, period_end, formats, directory)
+            if workers == 1:
+                for site_id in site_ids:
+                    collect(render_site(site_id, *args))
+            else:
+                # Pas de connexion ouverte au moment de créer les processus
+                connections.close_all()
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                    futures = {pool.submit(render_site, site_id, *args): site_id for site_id in site_ids}
+                    for future in as_completed(futures):
+                        try:
+                            result = future.result()
+                        except Exception as exc:
+                            # Processus perdu (mémoire, signal...): le site est en échec
+                            result = {
+                                'site_id': futures[future], 'code': None, 'name': None,
+                                'files': [], 'error': f"{exc.__class__.__name__}: {exc}", 'seconds': None,
+                            }
+                        collect(result)
+
+            manifest['sites'].sort(key=lambda site: site['site_id'])
+            manifest['succeeded'] = sum(1 for site in manifest['sites'] if not site['error'])
+            manifest['failed'] = len(manifest['sites']) - manifest['succeeded']
+            manifest['seconds'] = round(time.monotonic() - started, 3)
+            archive.writestr(MANIFEST_NAME, json.dumps(manifest, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return manifest
@@ -0,0 +1,144 @@
+"""
+Génération Excel des rapports
+
+Classeur en mode write-only d'openpyxl: une feuille de synthèse puis une
+feuille de données par domaine (opérations, incidents, environnement,
+mouvements de stock) pour le site et la période du rapport. Les lignes
+sont lues par lots (`values_list().iterator()`) et écrites au fil de l'eau:
+la mémoire reste stable quelle que soit la taille du classeur.
+
+Partagé entre l'action `generate_excel` (synchrone) et les exports en
+arrière-plan (application exports).
+"""
+
+from django.apps import apps
+from django.core.files import File
+from django.utils import timezone
+
+from nexus_backend.export_projection import EXPORT_CHUNK_SIZE
+
+from .models import Report
+
+
+# Limite d'une feuille Excel, en-tête compris
+EXCEL_MAX_ROWS = 1048576
+
+# (titre de feuille, modèle, champ date, lookup du site, colonnes)
+REPORT_SHEETS = [
+    ('Opérations', 'operations.Operation', 'date', 'site', [
+        'operation_code', 'operation_type', 'work_zone__name', 'date',
+        'start_time', 'end_time', 'status', 'validation_status',
+        'quantity_extracted', 'quantity_transported', 'quantity_processed',
+    ]),
+    ('Incidents', 'incidents.Incident', 'date', 'site', [
+        'incident_code', 'incident_type', 'date', 'time', 'severity', 'status',
+        'injuries_count', 'fatalities_count', 'lost_work_days', 'estimated_cost',
+    ]),
+    ('Environnement', 'environment.EnvironmentalData', 'measurement_date', 'site', [
+        'data_type', 'measurement_date', 'measurement_time', 'value', 'unit',
+        'is_compliant', 'location_details',
+    ]),
+    ('Mouvements de stock', 'stock.StockMovement', 'date', 'location__site', [
+        'movement_code', 'movement_type', 'location__name',
+        'destination_location__name', 'mineral_type', 'quantity', 'grade', 'date',
+    ]),
+]
+
+
+def _column(model, lookup):
+    """(en-tête, libellés des choix) d'une colonne: verbose_name du champ"""
+    field = model._meta.get_field(lookup.split('__')[0])
+    choices = dict(field.flatchoices) if field.choices and '__' not in lookup else None
+    return str(field.verbose_name).capitalize(), choices
+
+
+def report_sheet_querysets(report):
+    """(titre, modèle, colonnes, queryset) de chaque feuille de données"""
+    sheets = []
+    for title, label, date_field, site_lookup, columns in REPORT_SHEETS:
+        model = apps.get_model(label)
+        queryset = model._default_manager.filter(**{
+            f'{date_field}__gte': report.period_start,
+            f'{date_field}__lte': report.period_end,
+        })
+        if report.site_id:
+            queryset = queryset.filter(**{site_lookup: report.site_id})
+        sheets.append((title, model, columns, queryset.order_by(date_field, 'pk')))
+    return sheets
+
+
+def _header_row(ws, headers):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    bold = Font(bold=True)
+    row = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = bold
+        row.append(cell)
+    return row
+
+
+def write_report_workbook(report, output, progress=None):
+    """
+    Écrire le classeur du rapport dans `output` (fichier binaire).
+
+    `progress(lignes écrites, lignes à écrire)` est appelé tous les
+    EXPORT_CHUNK_SIZE lignes. Retourne le nombre de lignes de données.
+    """
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    sheets = report_sheet_querysets(report)
+    counts = [min(queryset.count(), EXCEL_MAX_ROWS - 1) for _t, _m, _c, queryset in sheets]
+    total = sum(counts)
+
+    # Synthèse (écrite en premier: les comptes sont connus d'avance)
+    ws = wb.create_sheet("Rapport")
+    ws.append(["Titre", report.title])
+    ws.append(["Type", report.get_report_type_display()])
+    ws.append(["Période", f"{report.period_start} -> {report.period_end}"])
+    ws.append(["Site", report.site.name if report.site else "-"])
+    ws.append([])
+    ws.append(["Résumé"])
+    for line in (report.summary or "").splitlines():
+        ws.append([line])
+    ws.append([])
+    ws.append(["Contenu"])
+    for line in (report.content or "").splitlines():
+        ws.append([line])
+    ws.append([])
+    ws.append(["Données", "Lignes"])
+    for (title, _model, _columns, _queryset), count in zip(sheets, counts):
+        ws.append([title, count])
+
+    written = 0
+    for (title, model, columns, queryset), count in zip(sheets, counts):
+        ws = wb.create_sheet(title)
+        described = [_column(model, lookup) for lookup in columns]
+        ws.append(_header_row(ws, [header for header, _choices in described]))
+        choice_columns = [(i, choices) for i, (_h, choices) in enumerate(described) if choices]
+
+        rows = queryset.values_list(*columns)[:count]
+        for values in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            if choice_columns:
+                values = list(values)
+                for i, choices in choice_columns:
+                    values[i] = choices.get(values[i], values[i])
+            ws.append(values)
+            written += 1
+            if progress and written % EXPORT_CHUNK_SIZE == 0:
+                progress(written, total)
+
+    wb.save(output)
+    return written
+
+
+def attach_report_file(report, fileobj):
+    """Joindre le classeur au rapport et le passer au statut GENERATED"""
+    filename = f"report_{report.id}_{timezone.now().strftime('%Y%m%d_%H%M')}.xlsx"
+    fileobj.seek(0)
+    report.file.save(filename, File(fileobj), save=False)
+    report.status = Report.ReportStatus.GENERATED
+    report.save(update_fields=['file', 'status', 'updated_at'])
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from mining_sites.models import MiningSite
+from reports.bundle import BUNDLE_FORMATS, build_bundle
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère le lot de rapports réglementaires d'une période "
+        "(un PDF et/ou un classeur par site) dans une archive ZIP avec manifeste"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='Début de période (AAAA-MM-JJ)')
+        parser.add_argument('--end', required=True, help='Fin de période (AAAA-MM-JJ)')
+        parser.add_argument('--sites', default='',
+                            help='Codes ou ids des sites, séparés par des virgules (défaut: tous)')
+        parser.add_argument('--formats', default=','.join(BUNDLE_FORMATS),
+                            help='Formats produits par site: pdf, xlsx (défaut: pdf,xlsx)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processus en parallèle (défaut: cœurs disponibles)')
+        parser.add_argument('--output', default=None,
+                            help='Fichier ZIP produit (défaut: archives/bundles/rapports_<période>.zip)')
+
+    def handle(self, *args, **options):
+        try:
+            period_start, period_end = parse_date(options['start']), parse_date(options['end'])
+        except ValueError:
+            period_start = period_end = None
+        if not period_start or not period_end or period_start > period_end:
+            raise CommandError("Période invalide (AAAA-MM-JJ, début <= fin).")
+
+        formats = [f.strip() for f in options['formats'].split(',') if f.strip()]
+        unknown = set(formats) - set(BUNDLE_FORMATS)
+        if not formats or unknown:
+            raise CommandError(f"Formats non gérés: {', '.join(sorted(unknown)) or '-'}")
+
+        sites = MiningSite.objects.order_by('code')
+        wanted = [s.strip() for s in options['sites'].split(',') if s.strip()]
+        if wanted:
+            ids = [int(s) for s in wanted if s.isdigit()]
+            sites = sites.filter(pk__in=ids) | sites.filter(code__in=wanted)
+        site_ids = list(sites.values_list('pk', flat=True).distinct())
+        if not site_ids:
+            raise CommandError("Aucun site à traiter.")
+
+        output = Path(options['output'] or (
+            Path(settings.BASE_DIR) / 'archives' / 'bundles'
+            / f"rapports_{period_start:%Y%m%d}_{period_end:%Y%m%d}.zip"
+        ))
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+        def progress(done, total):
+            self.stdout.write(f"  {done}/{total} sites")
+
+        with open(output, 'wb') as fileobj:
+            manifest = build_bundle(
+                fileobj, period_start, period_end, site_ids,
+                formats=formats, workers=options['workers'], progress=progress,
+            )
+
+        for site in manifest['sites']:
+            label = site['code'] or f"#{site['site_id']}"
+            if site['error']:
+                self.stdout.write(self.style.ERROR(f"{label}: échec ({site['error']})"))
+            else:
+                self.stdout.write(f"{label}: {len(site['files'])} fichier(s) en {site['seconds']} s")
+        style = self.style.SUCCESS if not manifest['failed'] else self.style.WARNING
+        self.stdout.write(style(
+            f"{manifest['succeeded']} site(s) générés, {manifest['failed']} en échec, "
+            f"{manifest['workers']} processus, {manifest['seconds']} s -> {output}"
+        ))
@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import Report
+from accounts.lock_registry import LockStatusSerializerMixin
 
 
-class ReportSerializer(serializers.ModelSerializer):
+class ReportSerializer(LockStatusSerializerMixin, serializers.ModelSerializer):
     """Serializer pour le modèle Report"""
     report_type_display = serializers.CharField(source='get_report_type_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -17,15 +18,28 @@ class ReportSerializer(serializers.ModelSerializer):
             'status', 'status_display', 'site', 'site_name',
             'period_start', 'period_end', 'content', 'summary', 'file',
             'generated_by', 'generated_by_name', 'validated_by', 'validated_by_name',
-            'created_at', 'updated_at'
+            'is_locked', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class ReportListSerializer(serializers.ModelSerializer):
+class ReportListSerializer(LockStatusSerializerMixin, serializers.ModelSerializer):
     """Serializer simplifié pour les listes"""
     site_name = serializers.CharField(source='site.name', read_only=True)
     
     class Meta:
         model = Report
-        fields = ['id', 'title', 'report_type', 'status', 'site_name', 'period_start', 'period_end']
+        fields = ['id', 'title', 'report_type', 'status', 'site_name', 'period_start', 'period_end', 'is_locked']
+
+
+class ReportBundleSerializer(serializers.Serializer):
+    """Demande de lot réglementaire: période, sites (défaut: tous les sites visibles), formats"""
+    period_start = serializers.DateField()
+    period_end = serializers.DateField()
+    sites = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    formats = serializers.MultipleChoiceField(choices=['pdf', 'xlsx'], required=False, default=['pdf', 'xlsx'])
+
+    def validate(self, data):
+        if data['period_start'] > data['period_end']:
+            raise serializers.ValidationError("La date de début doit précéder la date de fin.")
+        return data
@@ -1,19 +1,33 @@
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
+from django.core.cache import cache
 from django.core.files.base import ContentFile
 from django.http import FileResponse
-from io import BytesIO
+from django.utils.html import escape
+import tempfile
 from .models import Report
-from .serializers import ReportSerializer, ReportListSerializer
+from .serializers import ReportSerializer, ReportListSerializer, ReportBundleSerializer
+from .excel import write_report_workbook, attach_report_file
+from .bundle import build_bundle
 from accounts.permissions import CanManageReports
 from accounts.mixins import SiteScopedMixin
+from mining_sites.models import MiningSite
+from accounts.lock_registry import LockGuardMixin, content_type_label, locked_set
 from nexus_backend.pdf_export import PDFExportMixin
 
 
-class ReportViewSet(PDFExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
+# Rôles autorisés à produire un lot de rapports réglementaires
+BUNDLE_ROLES = ['ADMIN', 'MMG', 'ANALYST', 'SITE_MANAGER']
+
+# Page de vérification (QR code): durée de vie en cache, invalidée par updated_at
+VERIFY_CACHE_TIMEOUT = 60 * 60
+
+
+class ReportViewSet(PDFExportMixin, LockGuardMixin, SiteScopedMixin, viewsets.ModelViewSet):
     """ViewSet pour la gestion des rapports
 
     Permissions:
@@ -23,6 +37,7 @@ class ReportViewSet(PDFExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
     - ANALYST: Création rapports d'analyse
     - MMG: Lecture seule
     Filtrage: Données filtrées par sites assignés
+    Verrouillage: un rapport inscrit dans LockedStatus n'est plus modifiable
     """
     site_field = 'site'
     queryset = Report.objects.select_related('site', 'generated_by', 'validated_by').all()
@@ -42,8 +57,19 @@ class ReportViewSet(PDFExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
         """Allow public access to verification endpoint AND pdf download."""
         if self.action in ['verify', 'export_pdf']:
             return [permissions.AllowAny()]
+        if self.action == 'bundle':
+            # Lot réglementaire: rôle vérifié par check_bundle_allowed (MMG compris)
+            return [permissions.IsAuthenticated()]
         return super().get_permissions()
     
+    def get_queryset(self):
+        """Accès public (QR code) limité aux rapports verrouillés, donc certifiés"""
+        if self.action in ['verify', 'export_pdf'] and not self.request.user.is_authenticated:
+            return Report.objects.select_related('site', 'generated_by', 'validated_by').filter(
+                pk__in=locked_set(content_type_label(Report))
+            )
+        return super().get_queryset()
+
     def perform_create(self, serializer):
         """
         Logique de création:
@@ -97,10 +123,31 @@ class ReportViewSet(PDFExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def verify(self, request, pk=None):
-        """Web view for report verification via QR Code"""
+        """Web view for report verification via QR Code
+
+        La page ne dépend que de l'état du rapport: elle est mise en cache et
+        servie avec un ETag (304 si inchangée).
+        """
         from django.http import HttpResponse
         report = self.get_object()
-        
+
+        version = f"{report.pk}-{int(report.updated_at.timestamp() * 1000)}-{report.status}"
+        etag = f'"verify-{version}"'
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+            return response
+
+        cache_key = f"reports:verify:{version}"
+        html = cache.get(cache_key)
+        if html is None:
+            html = self._render_verify_page(report)
+            cache.set(cache_key, html, timeout=VERIFY_CACHE_TIMEOUT)
+        response = HttpResponse(html)
+        response['ETag'] = etag
+        return response
+
+    def _render_verify_page(self, report):
         status_color = "#10B981" if report.status in ['VALIDATED', 'PUBLISHED', 'GENERATED'] else "#F59E0B"
         
         html = f"""
@@ -140,7 +187,7 @@ class ReportViewSet(PDFExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
                     </div>
                     <div class="info-item">
                         <div class="info-label">Titre</div>
-                        <div class="info-value">{report.title}</div>
+                        <div class="info-value">{escape(report.title)}</div>
                     </div>
                     <div class="info-item">
                         <div class="info-label">Type de Rapport</div>
@@ -152,11 +199,11 @@ class ReportViewSet(PDFExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
                     </div>
                     <div class="info-item">
                         <div class="info-label">Site concerné</div>
-                        <div class="info-value">{report.site.name if report.site else 'Tous sites'}</div>
+                        <div class="info-value">{escape(report.site.name) if report.site else 'Tous sites'}</div>
                     </div>
                     <div class="info-item">
                         <div class="info-label">Auteur (Email)</div>
-                        <div class="info-value">{report.generated_by.email if report.generated_by else 'Système'}</div>
+                        <div class="info-value">{escape(report.generated_by.email) if report.generated_by else 'Système'}</div>
                     </div>
                 </div>
                 
@@ -165,7 +212,7 @@ class ReportViewSet(PDFExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
         </body>
         </html>
         """
-        return HttpResponse(html)
+        return html
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -218,23 +265,35 @@ class ReportViewSet(PDFExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
         
         return Response(ReportSerializer(report).data)
 
-    @action(detail=True, methods=['post'])
-    def generate_excel(self, request, pk=None):
-        """Générer un fichier Excel pour le rapport"""
-        report = self.get_object()
-
+    def check_excel_allowed(self, report):
+        """Conditions de génération Excel (action synchrone et exports en arrière-plan)"""
         # Sécurité : Un rapport en attente d'approbation ne peut pas être généré
         if report.status == Report.ReportStatus.PENDING_APPROVAL:
-            return Response(
-                {'error': 'Ce rapport doit être approuvé par un gestionnaire avant d\'être généré.'},
-                status=status.HTTP_403_FORBIDDEN
+            raise PermissionDenied(
+                'Ce rapport doit être approuvé par un gestionnaire avant d\'être généré.'
             )
+        if self.request.user.role not in ['ADMIN', 'SITE_MANAGER', 'ANALYST']:
+            raise PermissionDenied('Permission insuffisante pour générer un rapport.')
 
-        if request.user.role not in ['ADMIN', 'SITE_MANAGER', 'ANALYST']:
-            return Response(
-                {'error': 'Permission insuffisante pour générer un rapport.'},
-                status=status.HTTP_403_FORBIDDEN
-            )
+    def render_excel(self, report, output, progress=None):
+        """Écrire le classeur dans `output` et le joindre au rapport"""
+        rows = write_report_workbook(report, output, progress=progress)
+        attach_report_file(report, output)
+        return rows
+
+    @action(detail=True, methods=['post'])
+    def generate_excel(self, request, pk=None):
+        """Générer un fichier Excel pour le rapport
+
+        `background=true` (paramètre ou corps): la génération est confiée au
+        worker d'exports; la réponse 202 contient l'export à suivre.
+        """
+        report = self.get_object()
+
+        try:
+            self.check_excel_allowed(report)
+        except PermissionDenied as exc:
+            return Response({'error': exc.detail}, status=status.HTTP_403_FORBIDDEN)
 
         try:
             import openpyxl
@@ -244,30 +303,83 @@ class ReportViewSet(PDFExportMixin, SiteScopedMixin, viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Rapport"
-
-        ws.append(["Titre", report.title])
-        ws.append(["Type", report.get_report_type_display()])
-        ws.append(["Période", f"{report.period_start} -> {report.period_end}"])
-        ws.append(["Site", report.site.name if report.site else "-"])
-        ws.append([])
-        ws.append(["Résumé"])
-        for line in (report.summary or "").splitlines():
-            ws.append([line])
-        ws.append([])
-        ws.append(["Contenu"])
-        for line in (report.content or "").splitlines():
-            ws.append([line])
-
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        filename = f"report_{report.id}_{timezone.now().strftime('%Y%m%d_%H%M')}.xlsx"
-        report.file.save(filename, ContentFile(output.read()), save=False)
-        report.status = Report.ReportStatus.GENERATED
-        report.save(update_fields=['file', 'status', 'updated_at'])
+        background = request.data.get('background', request.query_params.get('background'))
+        if str(background).lower() in ('1', 'true', 'yes'):
+            from exports.services import enqueue
+            from exports.serializers import ExportJobSerializer
+
+            job, _reused = enqueue(request.user, 'reports', 'xlsx', object_id=report.pk)
+            return Response(
+                ExportJobSerializer(job, context={'request': request}).data,
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        with tempfile.TemporaryFile() as output:
+            self.render_excel(report, output)
 
         return Response(ReportSerializer(report).data)
+
+    def check_bundle_allowed(self):
+        if self.request.user.role not in BUNDLE_ROLES:
+            raise PermissionDenied('Permission insuffisante pour générer un lot de rapports.')
+
+    def render_bundle(self, params, output, progress=None):
+        """
+        Écrire le lot réglementaire décrit par `params` (période, sites,
+        formats) dans `output`; les sites sont restreints à ceux de
+        l'utilisateur. Retourne le nombre de sites générés.
+        """
+        params = dict(params)
+        for key in ('sites', 'formats'):
+            # Un paramètre répété une seule fois est stocké comme une valeur simple
+            if isinstance(params.get(key), str):
+                params[key] = [params[key]]
+        serializer = ReportBundleSerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        sites = MiningSite.objects.all()
+        site_ids = self.request.user.get_site_ids()
+        if site_ids is not None:
+            sites = sites.filter(pk__in=site_ids)
+        if data['sites']:
+            sites = sites.filter(pk__in=data['sites'])
+
+        manifest = build_bundle(
+            output, data['period_start'], data['period_end'],
+            sites.order_by('code').values_list('pk', flat=True),
+            formats=data['formats'], progress=progress,
+        )
+        return manifest['succeeded']
+
+    @action(detail=False, methods=['post'])
+    def bundle(self, request):
+        """
+        Lot de rapports réglementaires (un par site) en arrière-plan.
+
+        Corps: period_start, period_end, sites (optionnel), formats (pdf/xlsx).
+        Réponse 202: l'export ZIP à suivre sur /api/export-jobs/.
+        """
+        try:
+            self.check_bundle_allowed()
+        except PermissionDenied as exc:
+            return Response({'error': exc.detail}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = ReportBundleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        from exports.services import enqueue
+        from exports.serializers import ExportJobSerializer
+
+        params = {
+            'period_start': data['period_start'].isoformat(),
+            'period_end': data['period_end'].isoformat(),
+            'sites': [str(pk) for pk in sorted(set(data['sites']))],
+            'formats': sorted(data['formats']),
+        }
+        job, _reused = enqueue(request.user, 'reports', 'zip', filters=params)
+        return Response(
+            ExportJobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED
+        )
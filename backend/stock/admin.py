@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import StockLocation, StockMovement, StockSummary
+from .models import StockBalanceCheckpoint, StockLocation, StockLocationBalance, StockMovement, StockSummary
 
 
 @admin.register(StockLocation)
@@ -23,3 +23,17 @@ class StockSummaryAdmin(admin.ModelAdmin):
 	list_display = ('site', 'mineral_type', 'current_stock', 'last_updated')
 	list_filter = ('site', 'mineral_type')
 	ordering = ('-last_updated',)
+
+
+@admin.register(StockLocationBalance)
+class StockLocationBalanceAdmin(admin.ModelAdmin):
+	list_display = ('location', 'mineral_type', 'quantity', 'last_updated')
+	list_filter = ('mineral_type',)
+	ordering = ('location',)
+
+
+@admin.register(StockBalanceCheckpoint)
+class StockBalanceCheckpointAdmin(admin.ModelAdmin):
+	list_display = ('location', 'mineral_type', 'date', 'balance')
+	list_filter = ('mineral_type', 'date')
+	ordering = ('-date', 'location')
@@ -0,0 +1,172 @@
+"""
+Saisie en lot des mouvements de stock (ponts-bascules, expéditions camions)
+
+Le lot est validé ligne par ligne, les références (emplacements, opérations,
+codes existants) étant résolues en une requête par table. Les lignes valides
+sont écrites en une transaction (bulk_create), avec les transferts entrants
+appariés à chaque TRANSFER_OUT, puis les deltas de synthèse et de solde
+sont appliqués une fois par (site, minerai) et (emplacement, minerai). Les
+lignes invalides sont rapportées sans interrompre le lot.
+"""
+
+from django.db import transaction
+
+from accounts.audit import AuditLog
+
+from .ledger import add_movement, apply_pending, new_pending
+from .models import StockLocation, StockMovement
+from .serializers import StockMovementBulkItemSerializer
+
+
+TRANSFER_IN_SUFFIX = '-IN'
+CODE_MAX_LENGTH = StockMovement._meta.get_field('movement_code').max_length
+
+
+def paired_transfer_in(movement):
+    """Mouvement entrant à destination d'un TRANSFER_OUT (comme StockMovement.save)"""
+    return StockMovement(
+        movement_code=f"{movement.movement_code}{TRANSFER_IN_SUFFIX}",
+        movement_type=StockMovement.MovementType.TRANSFER_IN,
+        location=movement.destination_location,
+        mineral_type=movement.mineral_type,
+        quantity=movement.quantity,
+        grade=movement.grade,
+        date=movement.date,
+        operation=movement.operation,
+        notes=f"Transfert depuis {movement.location.code}",
+        created_by=movement.created_by,
+    )
+
+
+def _is_paired(data):
+    return data['movement_type'] == StockMovement.MovementType.TRANSFER_OUT and data.get('destination_location')
+
+
+def _audit_entries(user, movements):
+    """Entrées d'audit équivalentes au signal de création (accounts.signals)"""
+    if not (user and user.is_authenticated):
+        return []
+    return [
+        AuditLog(
+            user=user,
+            action=AuditLog.ActionType.CREATE,
+            content_type=StockMovement._meta.model_name,
+            object_id=movement.pk,
+            object_label=str(movement),
+            new_value={field.name: str(getattr(movement, field.name)) for field in StockMovement._meta.fields},
+            reason="Création en lot (mouvements de stock)",
+        )
+        for movement in movements
+    ]
+
+
+def ingest_movements(rows, user):
+    """
+    Valider et écrire un lot de mouvements.
+
+    Retourne un résultat par ligne, dans l'ordre du lot:
+    {'index', 'status': 'created', 'id', 'movement_code'[, 'transfer_in_id']}
+    ou {'index', 'status': 'error', 'errors'}.
+    """
+    results = [None] * len(rows)
+    items = []
+    for index, row in enumerate(rows):
+        serializer = StockMovementBulkItemSerializer(data=row)
+        if serializer.is_valid():
+            items.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+    # Références du lot: une requête par table
+    location_ids = {data['location'] for _i, data in items}
+    location_ids |= {data['destination_location'] for _i, data in items if data.get('destination_location')}
+    locations = StockLocation.objects.in_bulk(location_ids)
+    site_ids = user.get_site_ids()
+    allowed_sites = None if site_ids is None else set(site_ids)
+
+    operation_model = StockMovement._meta.get_field('operation').related_model
+    operations = operation_model.objects.in_bulk({data['operation'] for _i, data in items if data.get('operation')})
+
+    codes = {data['movement_code'] for _i, data in items}
+    codes |= {f"{data['movement_code']}{TRANSFER_IN_SUFFIX}" for _i, data in items if _is_paired(data)}
+    taken = set(StockMovement.objects.filter(movement_code__in=codes).values_list('movement_code', flat=True))
+
+    accepted = []
+    for index, data in items:
+        errors = {}
+        location = locations.get(data['location'])
+        if location is None or (allowed_sites is not None and location.site_id not in allowed_sites):
+            errors['location'] = ["Emplacement introuvable ou hors de vos sites."]
+
+        destination = None
+        if data.get('destination_location'):
+            destination = locations.get(data['destination_location'])
+            if destination is None or (allowed_sites is not None and destination.site_id not in allowed_sites):
+                errors['destination_location'] = ["Emplacement destination introuvable ou hors de vos sites."]
+            elif destination.pk == data['location']:
+                errors['destination_location'] = ["La destination doit différer de l'emplacement."]
+
+        operation = None
+        if data.get('operation'):
+            operation = operations.get(data['operation'])
+            if operation is None or (allowed_sites is not None and operation.site_id not in allowed_sites):
+                errors['operation'] = ["Opération introuvable ou hors de vos sites."]
+
+        own_codes = [data['movement_code']]
+        if _is_paired(data):
+            own_codes.append(f"{data['movement_code']}{TRANSFER_IN_SUFFIX}")
+            if len(own_codes[1]) > CODE_MAX_LENGTH:
+                errors['movement_code'] = [
+                    f"{CODE_MAX_LENGTH - len(TRANSFER_IN_SUFFIX)} caractères au plus pour un transfert."
+                ]
+        if any(code in taken for code in own_codes):
+            errors['movement_code'] = ["Code mouvement déjà utilisé."]
+
+        if errors:
+            results[index] = {'index': index, 'status': 'error', 'errors': errors}
+            continue
+
+        taken.update(own_codes)
+        movement = StockMovement(
+            movement_code=data['movement_code'],
+            movement_type=data['movement_type'],
+            location=location,
+            destination_location=destination,
+            mineral_type=data['mineral_type'],
+            quantity=data['quantity'],
+            grade=data.get('grade'),
+            date=data['date'],
+            operation=operation,
+            destination=data['destination'],
+            transport_reference=data['transport_reference'],
+            notes=data['notes'],
+            created_by=user,
+        )
+        pair = paired_transfer_in(movement) if _is_paired(data) else None
+        accepted.append((index, movement, pair))
+
+    if accepted:
+        created = []
+        for _index, movement, pair in accepted:
+            created.append(movement)
+            if pair is not None:
+                created.append(pair)
+
+        with transaction.atomic():
+            StockMovement.objects.bulk_create(created, batch_size=1000)
+            pending = new_pending()
+            for movement in created:
+                add_movement(pending, (
+                    movement.location_id, movement.location.site_id, movement.mineral_type,
+                    movement.movement_type, movement.quantity, movement.date,
+                ))
+            apply_pending(pending)
+            AuditLog.log_bulk(_audit_entries(user, created))
+
+        for index, movement, pair in accepted:
+            result = {'index': index, 'status': 'created', 'id': movement.pk, 'movement_code': movement.movement_code}
+            if pair is not None:
+                result['transfer_in_id'] = pair.pk
+            results[index] = result
+
+    return results
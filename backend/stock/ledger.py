@@ -0,0 +1,312 @@
+"""
+Synthèses de stock tenues comme un grand livre
+
+Chaque écriture de StockMovement (création, modification, suppression)
+applique un delta signé à la ligne StockSummary (site, minerai) concernée,
+dans la même transaction: UPDATE ... SET champ = champ + delta (F()),
+sur une ligne verrouillée (select_for_update).
+
+Règle de calcul (identique à StockSummary.recalculate):
+    stock actuel = initial + extraction - expédition
+
+Le solde de chaque emplacement par minerai (StockLocationBalance) est tenu
+de la même façon: entrées (initial, extraction, transfert entrant) moins
+sorties (expédition, transfert sortant, perte), comme
+StockLocation.get_current_stock. Un mouvement daté d'un jour déjà clos
+corrige aussi les points de reprise (StockBalanceCheckpoint) suivants.
+
+Les écritures en masse qui contournent les signaux (queryset.update,
+bulk_create) appellent apply_pending() elles-mêmes; verify_stock_ledger
+compare synthèses et soldes à l'agrégation complète.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    StockBalanceCheckpoint, StockLocation, StockLocationBalance, StockMovement, StockSummary,
+)
+
+
+ZERO = Decimal('0')
+SUMMARY_FIELDS = ('initial_stock', 'total_extracted', 'total_expedited', 'current_stock')
+
+# Type de mouvement -> (champ cumulé, signe sur le stock actuel)
+SUMMARY_EFFECTS = {
+    StockMovement.MovementType.INITIAL: ('initial_stock', 1),
+    StockMovement.MovementType.EXTRACTION: ('total_extracted', 1),
+    StockMovement.MovementType.EXPEDITION: ('total_expedited', -1),
+}
+
+# Sens des mouvements sur le solde d'un emplacement (ajustements exclus)
+LOCATION_INBOUND_TYPES = (
+    StockMovement.MovementType.INITIAL,
+    StockMovement.MovementType.EXTRACTION,
+    StockMovement.MovementType.TRANSFER_IN,
+)
+LOCATION_OUTBOUND_TYPES = (
+    StockMovement.MovementType.EXPEDITION,
+    StockMovement.MovementType.TRANSFER_OUT,
+    StockMovement.MovementType.LOSS,
+)
+
+
+def movement_deltas(movement_type, quantity, sign=1):
+    """Deltas des champs de synthèse pour un mouvement (sign=-1 pour l'annuler)"""
+    effect = SUMMARY_EFFECTS.get(movement_type)
+    if effect is None or not quantity:
+        return {}
+    field, direction = effect
+    quantity = Decimal(quantity) * sign
+    return {field: quantity, 'current_stock': quantity * direction}
+
+
+def add_deltas(pending, site_id, mineral_type, deltas):
+    """Cumuler des deltas de synthèse par (site, minerai) avant apply_deltas()"""
+    bucket = pending[(site_id, mineral_type)]
+    for field, value in deltas.items():
+        bucket[field] = bucket.get(field, ZERO) + value
+
+
+def location_delta(movement_type, quantity, sign=1):
+    """Delta du solde de l'emplacement pour un mouvement"""
+    if not quantity:
+        return ZERO
+    if movement_type in LOCATION_INBOUND_TYPES:
+        return Decimal(quantity) * sign
+    if movement_type in LOCATION_OUTBOUND_TYPES:
+        return -Decimal(quantity) * sign
+    return ZERO
+
+
+def new_pending():
+    """
+    Deltas en attente: synthèses (site, minerai), soldes (emplacement,
+    minerai) et points de reprise (emplacement, minerai, date)
+    """
+    return {
+        'summaries': defaultdict(dict),
+        'locations': defaultdict(Decimal),
+        'checkpoints': defaultdict(Decimal),
+    }
+
+
+def add_movement(pending, state, sign=1):
+    """Cumuler les effets d'un mouvement (état de movement_state(); sign=-1 pour l'annuler)"""
+    location_id, site_id, mineral_type, movement_type, quantity, day = state
+    add_deltas(pending['summaries'], site_id, mineral_type, movement_deltas(movement_type, quantity, sign))
+    delta = location_delta(movement_type, quantity, sign)
+    if delta:
+        pending['locations'][(location_id, mineral_type)] += delta
+        pending['checkpoints'][(location_id, mineral_type, day)] += delta
+
+
+def apply_deltas(pending):
+    """
+    Appliquer des deltas cumulés {(site_id, minerai): {champ: delta}}.
+
+    Une ligne verrouillée et un UPDATE par (site, minerai), dans l'ordre des
+    clés pour que deux transactions concurrentes ne s'interbloquent pas.
+    """
+    with transaction.atomic():
+        for (site_id, mineral_type) in sorted(pending):
+            deltas = {field: value for field, value in pending[(site_id, mineral_type)].items() if value}
+            if not deltas or site_id is None:
+                continue
+            summary, _created = StockSummary.objects.select_for_update().get_or_create(
+                site_id=site_id, mineral_type=mineral_type,
+            )
+            StockSummary.objects.filter(pk=summary.pk).update(
+                last_updated=timezone.now(),
+                **{field: F(field) + value for field, value in deltas.items()}
+            )
+
+
+def apply_location_deltas(pending):
+    """Appliquer des deltas de solde {(location_id, minerai): delta}, même verrouillage"""
+    with transaction.atomic():
+        for (location_id, mineral_type) in sorted(pending):
+            delta = pending[(location_id, mineral_type)]
+            if not delta or location_id is None:
+                continue
+            balance, _created = StockLocationBalance.objects.select_for_update().get_or_create(
+                location_id=location_id, mineral_type=mineral_type,
+            )
+            StockLocationBalance.objects.filter(pk=balance.pk).update(
+                last_updated=timezone.now(), quantity=F('quantity') + delta,
+            )
+
+
+def apply_checkpoint_deltas(pending):
+    """
+    Reporter des deltas {(location_id, minerai, date): delta} sur les points
+    de reprise de cette date et des suivantes (aucune ligne en temps normal:
+    le mouvement est daté d'un jour pas encore clos).
+    """
+    with transaction.atomic():
+        for (location_id, mineral_type, day) in sorted(pending, key=str):
+            delta = pending[(location_id, mineral_type, day)]
+            if not delta or location_id is None:
+                continue
+            StockBalanceCheckpoint.objects.filter(
+                location_id=location_id, mineral_type=mineral_type, date__gte=day,
+            ).update(balance=F('balance') + delta)
+
+
+def apply_pending(pending):
+    """Appliquer tous les deltas d'un new_pending() dans une transaction"""
+    with transaction.atomic():
+        apply_deltas(pending['summaries'])
+        apply_location_deltas(pending['locations'])
+        apply_checkpoint_deltas(pending['checkpoints'])
+
+
+# Colonnes de l'état d'un mouvement, dans l'ordre de movement_state()
+STATE_FIELDS = ('location_id', 'location__site_id', 'mineral_type', 'movement_type', 'quantity', 'date')
+
+
+def movement_state(movement):
+    """(location_id, site_id, minerai, type, quantité, date) d'un mouvement"""
+    site_id = StockLocation.objects.filter(pk=movement.location_id).values_list('site_id', flat=True).first()
+    return (
+        movement.location_id, site_id, movement.mineral_type,
+        movement.movement_type, movement.quantity, movement.date,
+    )
+
+
+def _total(movement_type):
+    return Coalesce(
+        Sum('quantity', filter=Q(movement_type=movement_type)),
+        Value(ZERO), output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def summary_totals():
+    """Totaux de synthèse en une seule agrégation conditionnelle (annotate/aggregate)"""
+    return {
+        'initial_stock': _total(StockMovement.MovementType.INITIAL),
+        'total_extracted': _total(StockMovement.MovementType.EXTRACTION),
+        'total_expedited': _total(StockMovement.MovementType.EXPEDITION),
+    }
+
+
+def location_flow_totals(mineral_type=None, prefix=''):
+    """
+    Entrées (stock_in) et sorties (stock_out) d'emplacement en une agrégation.
+
+    `prefix`: chemin vers les mouvements ('stock_movements__' pour annoter
+    des StockLocation).
+    """
+    scope = Q(**{f'{prefix}mineral_type': mineral_type}) if mineral_type else Q()
+    output = DecimalField(max_digits=14, decimal_places=2)
+    return {
+        'stock_in': Coalesce(
+            Sum(f'{prefix}quantity', filter=scope & Q(**{f'{prefix}movement_type__in': LOCATION_INBOUND_TYPES})),
+            Value(ZERO), output_field=output,
+        ),
+        'stock_out': Coalesce(
+            Sum(f'{prefix}quantity', filter=scope & Q(**{f'{prefix}movement_type__in': LOCATION_OUTBOUND_TYPES})),
+            Value(ZERO), output_field=output,
+        ),
+    }
+
+
+def grouped_totals(queryset, *extra):
+    """
+    Totaux de synthèse par (site, minerai) en une seule requête groupée.
+
+    `extra`: colonnes supplémentaires à grouper (ex. 'location__site__name').
+    Chaque ligne porte aussi current_stock (initial + extraction - expédition).
+    """
+    rows = (
+        queryset.order_by()
+        .values('location__site', 'mineral_type', *extra)
+        .annotate(**summary_totals())
+    )
+    for row in rows:
+        row['current_stock'] = row['initial_stock'] + row['total_extracted'] - row['total_expedited']
+        yield row
+
+
+def expected_summaries():
+    """
+    Synthèses recalculées depuis tous les mouvements, en une requête groupée:
+    {(site_id, minerai): {champ: valeur}}
+    """
+    return {
+        (row['location__site'], row['mineral_type']): {field: row[field] for field in SUMMARY_FIELDS}
+        for row in grouped_totals(StockMovement.objects.all())
+    }
+
+
+def ledger_discrepancies():
+    """
+    Écarts entre les synthèses tenues et l'agrégation complète:
+    liste de (site_id, minerai, {champ: (tenu, attendu)})
+    """
+    expected = expected_summaries()
+    stored = {
+        (row['site_id'], row['mineral_type']): row
+        for row in StockSummary.objects.values('site_id', 'mineral_type', *SUMMARY_FIELDS)
+    }
+    discrepancies = []
+    for key in sorted(set(expected) | set(stored)):
+        want = expected.get(key, dict.fromkeys(SUMMARY_FIELDS, ZERO))
+        have = stored.get(key, dict.fromkeys(SUMMARY_FIELDS, ZERO))
+        diff = {
+            field: (have[field], want[field])
+            for field in SUMMARY_FIELDS if Decimal(have[field]) != Decimal(want[field])
+        }
+        if diff:
+            discrepancies.append((key[0], key[1], diff))
+    return discrepancies
+
+
+def fix_discrepancies(discrepancies):
+    """Remettre les synthèses fautives aux valeurs agrégées"""
+    with transaction.atomic():
+        for site_id, mineral_type, diff in discrepancies:
+            StockSummary.objects.update_or_create(
+                site_id=site_id, mineral_type=mineral_type,
+                defaults={field: want for field, (_have, want) in diff.items()},
+            )
+
+
+def location_balance_discrepancies():
+    """
+    Écarts entre les soldes d'emplacement tenus et l'agrégation complète:
+    liste de (location_id, minerai, tenu, attendu)
+    """
+    expected = {
+        (row['location'], row['mineral_type']): row['stock_in'] - row['stock_out']
+        for row in (
+            StockMovement.objects.order_by()
+            .values('location', 'mineral_type')
+            .annotate(**location_flow_totals())
+        )
+    }
+    stored = {
+        (row['location_id'], row['mineral_type']): row['quantity']
+        for row in StockLocationBalance.objects.values('location_id', 'mineral_type', 'quantity')
+    }
+    discrepancies = []
+    for key in sorted(set(expected) | set(stored)):
+        have, want = stored.get(key, ZERO), expected.get(key, ZERO)
+        if Decimal(have) != Decimal(want):
+            discrepancies.append((key[0], key[1], have, want))
+    return discrepancies
+
+
+def fix_location_balances(discrepancies):
+    """Remettre les soldes fautifs aux valeurs agrégées"""
+    with transaction.atomic():
+        for location_id, mineral_type, _have, want in discrepancies:
+            StockLocationBalance.objects.update_or_create(
+                location_id=location_id, mineral_type=mineral_type,
+                defaults={'quantity': want},
+            )
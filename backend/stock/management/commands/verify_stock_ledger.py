@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from stock.ledger import (
+    fix_discrepancies, fix_location_balances,
+    ledger_discrepancies, location_balance_discrepancies,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les synthèses de stock et les soldes d'emplacement tenus "
+        "par les mouvements à une agrégation complète (requêtes groupées)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Corriger les synthèses et soldes en écart')
+
+    def handle(self, *args, **options):
+        discrepancies = ledger_discrepancies()
+        balances = location_balance_discrepancies()
+        if not discrepancies and not balances:
+            self.stdout.write(self.style.SUCCESS("Synthèses de stock cohérentes avec les mouvements."))
+            return
+
+        for site_id, mineral_type, diff in discrepancies:
+            details = ', '.join(f"{field}: {have} au lieu de {want}" for field, (have, want) in diff.items())
+            self.stdout.write(self.style.WARNING(f"Site #{site_id} {mineral_type}: {details}"))
+        for location_id, mineral_type, have, want in balances:
+            self.stdout.write(self.style.WARNING(
+                f"Emplacement #{location_id} {mineral_type}: solde {have} au lieu de {want}"
+            ))
+
+        count = len(discrepancies) + len(balances)
+        if options['fix']:
+            fix_discrepancies(discrepancies)
+            fix_location_balances(balances)
+            self.stdout.write(self.style.SUCCESS(f"{count} écart(s) corrigé(s)."))
+        else:
+            raise CommandError(f"{count} écart(s) (relancer avec --fix).")
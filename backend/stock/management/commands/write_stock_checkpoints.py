@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from stock.checkpoints import write_checkpoints
+
+
+class Command(BaseCommand):
+    help = (
+        "Écrit les points de reprise de stock (solde de fin de journée par "
+        "emplacement et minerai). À planifier chaque jour, après minuit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', default=None,
+                            help='Jour à clore, AAAA-MM-JJ (défaut: la veille)')
+        parser.add_argument('--from', dest='start', default=None,
+                            help="Reprise d'historique: clore chaque jour depuis cette date")
+
+    def handle(self, *args, **options):
+        end = self._parse(options['date'], '--date') if options['date'] else timezone.localdate() - timedelta(days=1)
+        start = self._parse(options['start'], '--from') if options['start'] else end
+        if start > end:
+            raise CommandError("--from doit précéder --date.")
+
+        day = start
+        while day <= end:
+            count = write_checkpoints(day)
+            self.stdout.write(f"{day}: {count} point(s) de reprise")
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS("Points de reprise écrits."))
+
+    @staticmethod
+    def _parse(value, name):
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f"{name}: date invalide (AAAA-MM-JJ attendu)")
+        return day
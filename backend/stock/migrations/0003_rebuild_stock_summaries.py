@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def total(movement_type):
+    return Coalesce(
+        Sum('quantity', filter=Q(movement_type=movement_type)),
+        Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def rebuild_summaries(apps, schema_editor):
+    """
+    Les synthèses sont désormais tenues par delta à chaque mouvement: on
+    repart de valeurs exactes (une agrégation groupée).
+    """
+    StockMovement = apps.get_model('stock', 'StockMovement')
+    StockSummary = apps.get_model('stock', 'StockSummary')
+
+    rows = (
+        StockMovement.objects.order_by()
+        .values('location__site_id', 'mineral_type')
+        .annotate(
+            initial_stock=total('INITIAL'),
+            total_extracted=total('EXTRACTION'),
+            total_expedited=total('EXPEDITION'),
+        )
+    )
+    seen = set()
+    for row in rows:
+        key = (row['location__site_id'], row['mineral_type'])
+        seen.add(key)
+        StockSummary.objects.update_or_create(
+            site_id=key[0], mineral_type=key[1],
+            defaults={
+                'initial_stock': row['initial_stock'],
+                'total_extracted': row['total_extracted'],
+                'total_expedited': row['total_expedited'],
+                'current_stock': row['initial_stock'] + row['total_extracted'] - row['total_expedited'],
+            },
+        )
+    for summary in StockSummary.objects.all():
+        if (summary.site_id, summary.mineral_type) not in seen:
+            StockSummary.objects.filter(pk=summary.pk).update(
+                initial_stock=0, total_extracted=0, total_expedited=0, current_stock=0,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0002_alter_stocklocation_capacity_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_summaries, migrations.RunPython.noop),
+    ]
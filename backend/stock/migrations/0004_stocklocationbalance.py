@@ -0,0 +1,64 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:38
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+INBOUND = ['INITIAL', 'EXTRACTION', 'TRANSFER_IN']
+OUTBOUND = ['EXPEDITION', 'TRANSFER_OUT', 'LOSS']
+
+
+def total(movement_types):
+    return Coalesce(
+        Sum('quantity', filter=Q(movement_type__in=movement_types)),
+        Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def build_balances(apps, schema_editor):
+    """Soldes initiaux par emplacement et minerai (une agrégation groupée)"""
+    StockMovement = apps.get_model('stock', 'StockMovement')
+    StockLocationBalance = apps.get_model('stock', 'StockLocationBalance')
+
+    rows = (
+        StockMovement.objects.order_by()
+        .values('location_id', 'mineral_type')
+        .annotate(stock_in=total(INBOUND), stock_out=total(OUTBOUND))
+    )
+    StockLocationBalance.objects.bulk_create([
+        StockLocationBalance(
+            location_id=row['location_id'], mineral_type=row['mineral_type'],
+            quantity=row['stock_in'] - row['stock_out'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0003_rebuild_stock_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLocationBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mineral_type', models.CharField(choices=[('BAUXITE', 'Bauxite'), ('IRON', 'Fer'), ('GOLD', 'Or'), ('DIAMOND', 'Diamant'), ('MANGANESE', 'Manganèse'), ('URANIUM', 'Uranium'), ('OTHER', 'Autre')], max_length=20, verbose_name='Type de minerai')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Solde (tonnes)')),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='stock.stocklocation', verbose_name='Emplacement')),
+            ],
+            options={
+                'verbose_name': 'Solde emplacement',
+                'verbose_name_plural': 'Soldes emplacements',
+                'unique_together': {('location', 'mineral_type')},
+            },
+        ),
+        migrations.RunPython(build_balances, migrations.RunPython.noop),
+    ]
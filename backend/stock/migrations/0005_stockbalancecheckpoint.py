@@ -0,0 +1,32 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0004_stocklocationbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mineral_type', models.CharField(choices=[('BAUXITE', 'Bauxite'), ('IRON', 'Fer'), ('GOLD', 'Or'), ('DIAMOND', 'Diamant'), ('MANGANESE', 'Manganèse'), ('URANIUM', 'Uranium'), ('OTHER', 'Autre')], max_length=20, verbose_name='Type de minerai')),
+                ('date', models.DateField(verbose_name='Date (fin de journée)')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Solde (tonnes)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to='stock.stocklocation', verbose_name='Emplacement')),
+            ],
+            options={
+                'verbose_name': 'Point de reprise de stock',
+                'verbose_name_plural': 'Points de reprise de stock',
+                'ordering': ['location', 'mineral_type', 'date'],
+                'indexes': [models.Index(fields=['date'], name='stock_stock_date_e77bee_idx')],
+                'unique_together': {('location', 'mineral_type', 'date')},
+            },
+        ),
+    ]
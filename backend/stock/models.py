@@ -1,5 +1,4 @@
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
 
@@ -71,20 +70,15 @@ class StockLocation(models.Model):
         return f"{self.code} - {self.name}"
     
     def get_current_stock(self, mineral_type=None):
-        """Calcule le stock actuel à cet emplacement"""
+        """Calcule le stock actuel à cet emplacement (une seule agrégation)"""
+        from .ledger import location_flow_totals
+
         movements = self.stock_movements.all()
         if mineral_type:
             movements = movements.filter(mineral_type=mineral_type)
         
-        incoming = movements.filter(
-            movement_type__in=['INITIAL', 'EXTRACTION', 'TRANSFER_IN']
-        ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
-        
-        outgoing = movements.filter(
-            movement_type__in=['EXPEDITION', 'TRANSFER_OUT', 'LOSS']
-        ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
-        
-        return incoming - outgoing
+        totals = movements.aggregate(**location_flow_totals())
+        return totals['stock_in'] - totals['stock_out']
 
 
 class StockMovement(models.Model):
@@ -203,7 +197,10 @@ class StockMovement(models.Model):
     def __str__(self):
         return f"{self.movement_code} - {self.get_movement_type_display()} - {self.quantity}t"
     
+    @transaction.atomic
     def save(self, *args, **kwargs):
+        # Mouvement, transfert entrant et deltas de synthèse (signaux) dans
+        # une même transaction
         # Si c'est un transfert, créer le mouvement entrant à destination
         is_new = self.pk is None
         super().save(*args, **kwargs)
@@ -223,11 +220,16 @@ class StockMovement(models.Model):
                 created_by=self.created_by
             )
 
+    @transaction.atomic
+    def delete(self, *args, **kwargs):
+        return super().delete(*args, **kwargs)
+
 
 class StockSummary(models.Model):
     """
     Vue agrégée du stock par site et type de minerai (lecture seule)
-    Mise à jour automatique par signal ou tâche périodique
+    Tenue à jour par les signaux des mouvements (stock.ledger), contrôlée
+    par la commande verify_stock_ledger
     """
     site = models.ForeignKey(
         'mining_sites.MiningSite',
@@ -271,28 +273,90 @@ class StockSummary(models.Model):
         return f"{self.site.name} - {self.get_mineral_type_display()}: {self.current_stock}t"
     
     def recalculate(self):
-        """Recalcule les totaux depuis les mouvements"""
-        from django.db.models import Sum
-        
-        movements = StockMovement.objects.filter(
+        """Recalcule les totaux depuis les mouvements (une seule agrégation)"""
+        from .ledger import summary_totals
+
+        totals = StockMovement.objects.filter(
             location__site=self.site,
             mineral_type=self.mineral_type
-        )
-        
-        self.initial_stock = movements.filter(
-            movement_type='INITIAL'
-        ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
-        
-        self.total_extracted = movements.filter(
-            movement_type='EXTRACTION'
-        ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
-        
-        self.total_expedited = movements.filter(
-            movement_type='EXPEDITION'
-        ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
+        ).aggregate(**summary_totals())
+
+        self.initial_stock = totals['initial_stock']
+        self.total_extracted = totals['total_extracted']
+        self.total_expedited = totals['total_expedited']
         
         # Stock = Initial + Extraction - Expédition
         self.current_stock = (
             self.initial_stock + self.total_extracted - self.total_expedited
         )
         self.save()
+
+
+class StockLocationBalance(models.Model):
+    """
+    Solde courant d'un emplacement par type de minerai (cache)
+    Tenu à jour par les signaux des mouvements (stock.ledger):
+    entrées (initial, extraction, transfert entrant) - sorties
+    (expédition, transfert sortant, perte)
+    """
+    location = models.ForeignKey(
+        StockLocation,
+        on_delete=models.CASCADE,
+        related_name='balances',
+        verbose_name="Emplacement"
+    )
+    mineral_type = models.CharField(
+        max_length=20,
+        choices=StockMovement.MineralType.choices,
+        verbose_name="Type de minerai"
+    )
+    quantity = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        verbose_name="Solde (tonnes)"
+    )
+    last_updated = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Solde emplacement"
+        verbose_name_plural = "Soldes emplacements"
+        unique_together = ['location', 'mineral_type']
+    
+    def __str__(self):
+        return f"{self.location.code} - {self.get_mineral_type_display()}: {self.quantity}t"
+
+
+class StockBalanceCheckpoint(models.Model):
+    """
+    Solde d'un emplacement par minerai en fin de journée (point de reprise)
+    Écrit chaque jour par la commande write_stock_checkpoints; le solde à
+    une date = dernier point de reprise + mouvements postérieurs
+    (stock.checkpoints). Les mouvements antidatés corrigent les points de
+    reprise suivants (signaux des mouvements).
+    """
+    location = models.ForeignKey(
+        StockLocation,
+        on_delete=models.CASCADE,
+        related_name='balance_checkpoints',
+        verbose_name="Emplacement"
+    )
+    mineral_type = models.CharField(
+        max_length=20,
+        choices=StockMovement.MineralType.choices,
+        verbose_name="Type de minerai"
+    )
+    date = models.DateField(verbose_name="Date (fin de journée)")
+    balance = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        verbose_name="Solde (tonnes)"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Point de reprise de stock"
+        verbose_name_plural = "Points de reprise de stock"
+        unique_together = ['location', 'mineral_type', 'date']
+        ordering = ['location', 'mineral_type', 'date']
+        indexes = [models.Index(fields=['date'])]
+    
+    def __str__(self):
+        return f"{self.location.code} - {self.get_mineral_type_display()} au {self.date}: {self.balance}t"
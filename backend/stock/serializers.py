@@ -1,5 +1,16 @@
 from rest_framework import serializers
-from .models import StockLocation, StockMovement, StockSummary
+from .models import StockLocation, StockLocationBalance, StockMovement, StockSummary
+
+
+class StockLocationBalanceSerializer(serializers.ModelSerializer):
+    """Solde d'un emplacement par type de minerai"""
+    mineral_type_display = serializers.CharField(
+        source='get_mineral_type_display', read_only=True
+    )
+    
+    class Meta:
+        model = StockLocationBalance
+        fields = ['mineral_type', 'mineral_type_display', 'quantity', 'last_updated']
 
 
 class StockLocationSerializer(serializers.ModelSerializer):
@@ -9,13 +20,14 @@ class StockLocationSerializer(serializers.ModelSerializer):
         source='get_location_type_display', read_only=True
     )
     current_stock = serializers.SerializerMethodField()
+    balances = StockLocationBalanceSerializer(many=True, read_only=True)
     
     class Meta:
         model = StockLocation
         fields = [
             'id', 'code', 'name', 'site', 'site_name',
             'location_type', 'location_type_display',
-            'capacity', 'current_stock',
+            'capacity', 'current_stock', 'balances',
             'gps_latitude', 'gps_longitude',
             'description', 'is_active',
             'created_at', 'updated_at'
@@ -23,7 +35,8 @@ class StockLocationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_current_stock(self, obj):
-        return float(obj.get_current_stock())
+        # Somme des soldes tenus par les mouvements (préchargés par le ViewSet)
+        return float(sum(balance.quantity for balance in obj.balances.all()))
 
 
 class StockLocationListSerializer(serializers.ModelSerializer):
@@ -39,6 +52,9 @@ class StockLocationListSerializer(serializers.ModelSerializer):
         ]
     
     def get_current_stock(self, obj):
+        # Entrées/sorties annotées par StockLocationViewSet
+        if hasattr(obj, 'stock_in'):
+            return float(obj.stock_in - obj.stock_out)
         return float(obj.get_current_stock())
 
 
@@ -121,3 +137,29 @@ class StockDashboardSerializer(serializers.Serializer):
     total_extracted = serializers.DecimalField(max_digits=14, decimal_places=2)
     total_expedited = serializers.DecimalField(max_digits=14, decimal_places=2)
     current_stock = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class StockMovementBulkItemSerializer(serializers.Serializer):
+    """
+    Ligne d'un lot de mouvements (POST /stock-movements/bulk/)
+    Les clés étrangères sont des identifiants, résolus pour tout le lot en
+    une requête par table (voir stock.bulk).
+    """
+    movement_code = serializers.CharField(max_length=50)
+    movement_type = serializers.ChoiceField(choices=StockMovement.MovementType.choices)
+    location = serializers.IntegerField()
+    destination_location = serializers.IntegerField(required=False, allow_null=True)
+    mineral_type = serializers.ChoiceField(
+        choices=StockMovement.MineralType.choices,
+        default=StockMovement.MineralType.BAUXITE
+    )
+    quantity = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    grade = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=100,
+        required=False, allow_null=True
+    )
+    date = serializers.DateField()
+    operation = serializers.IntegerField(required=False, allow_null=True)
+    destination = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    transport_reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
@@ -0,0 +1,60 @@
+"""
+Tenue incrémentale des synthèses de stock et des soldes d'emplacement
+(voir stock.ledger)
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .ledger import STATE_FIELDS, add_movement, apply_pending, movement_state, new_pending
+from .models import StockMovement
+
+
+def _locked_state(pk):
+    """
+    État enregistré d'un mouvement, ligne verrouillée jusqu'à la fin de la
+    transaction (save/delete sont atomiques): deux modifications
+    concurrentes annulent chacune l'état laissé par l'autre
+    """
+    return (
+        StockMovement.objects.select_for_update(of=('self',)).filter(pk=pk)
+        .values_list(*STATE_FIELDS)
+        .first()
+    )
+
+
+@receiver(pre_save, sender=StockMovement)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    """Mémoriser l'état enregistré avant modification, pour l'annuler"""
+    instance._ledger_previous = None
+    if raw or instance.pk is None:
+        return
+    instance._ledger_previous = _locked_state(instance.pk)
+
+
+@receiver(post_save, sender=StockMovement)
+def apply_movement_delta(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    pending = new_pending()
+    previous = getattr(instance, '_ledger_previous', None)
+    if previous:
+        add_movement(pending, previous, sign=-1)
+    add_movement(pending, movement_state(instance))
+    apply_pending(pending)
+    instance._ledger_previous = None
+
+
+@receiver(pre_delete, sender=StockMovement)
+def remember_deleted_state(sender, instance, **kwargs):
+    """État enregistré (et non celui de l'instance, peut-être périmée) à annuler"""
+    instance._ledger_previous = _locked_state(instance.pk)
+
+
+@receiver(post_delete, sender=StockMovement)
+def revert_movement_delta(sender, instance, **kwargs):
+    previous = getattr(instance, '_ledger_previous', None)
+    pending = new_pending()
+    add_movement(pending, previous or movement_state(instance), sign=-1)
+    apply_pending(pending)
+    instance._ledger_previous = None
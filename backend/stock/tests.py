@@ -1,3 +1,134 @@
+from datetime import date
+from decimal import Decimal
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from mining_sites.models import MiningSite
+from operations.models import Operation
+
+from .ledger import ledger_discrepancies, location_balance_discrepancies
+from .models import StockLocation, StockLocationBalance, StockMovement, StockSummary
+
+
+class StockLedgerTests(TestCase):
+    """Deltas des synthèses et soldes tenus par les mouvements"""
+
+    def setUp(self):
+        self.site = MiningSite.objects.create(name="Site Test", code="STK-1", location="Test")
+        self.pit = StockLocation.objects.create(code="STK-A", name="Stock A", site=self.site)
+        self.port = StockLocation.objects.create(code="STK-B", name="Stock B", site=self.site)
+
+    def movement(self, code, movement_type, quantity, location=None, **extra):
+        return StockMovement.objects.create(
+            movement_code=code, movement_type=movement_type, location=location or self.pit,
+            mineral_type='BAUXITE', quantity=Decimal(quantity), date=date(2026, 1, 5), **extra,
+        )
+
+    def summary(self):
+        return StockSummary.objects.get(site=self.site, mineral_type='BAUXITE')
+
+    def balance(self, location):
+        return StockLocationBalance.objects.get(location=location, mineral_type='BAUXITE').quantity
+
+    def assert_consistent(self):
+        self.assertEqual(ledger_discrepancies(), [])
+        self.assertEqual(location_balance_discrepancies(), [])
+
+    def test_create(self):
+        self.movement('M1', 'INITIAL', '50')
+        self.movement('M2', 'EXTRACTION', '100')
+        self.movement('M3', 'EXPEDITION', '30')
+        summary = self.summary()
+        self.assertEqual(summary.initial_stock, Decimal('50'))
+        self.assertEqual(summary.total_extracted, Decimal('100'))
+        self.assertEqual(summary.total_expedited, Decimal('30'))
+        self.assertEqual(summary.current_stock, Decimal('120'))
+        self.assertEqual(self.balance(self.pit), Decimal('120'))
+        self.assert_consistent()
+
+    def test_update_quantity_type_and_location(self):
+        movement = self.movement('M1', 'EXTRACTION', '100')
+        movement.quantity = Decimal('60')
+        movement.save()
+        self.assertEqual(self.summary().current_stock, Decimal('60'))
+
+        movement.movement_type = 'INITIAL'
+        movement.location = self.port
+        movement.save()
+        summary = self.summary()
+        self.assertEqual(summary.total_extracted, Decimal('0'))
+        self.assertEqual(summary.initial_stock, Decimal('60'))
+        self.assertEqual(self.balance(self.pit), Decimal('0'))
+        self.assertEqual(self.balance(self.port), Decimal('60'))
+        self.assert_consistent()
+
+    def test_delete(self):
+        self.movement('M1', 'EXTRACTION', '100')
+        self.movement('M2', 'EXTRACTION', '40').delete()
+        self.assertEqual(self.summary().current_stock, Decimal('100'))
+        self.assertEqual(self.balance(self.pit), Decimal('100'))
+        self.assert_consistent()
+
+    def test_stale_instances_revert_stored_state(self):
+        movement = self.movement('M1', 'EXTRACTION', '100')
+        stale = StockMovement.objects.get(pk=movement.pk)
+        movement.quantity = Decimal('30')
+        movement.save()
+
+        # Instance périmée: l'état enregistré (30) est annulé, pas 100
+        stale.quantity = Decimal('45')
+        stale.save()
+        self.assertEqual(self.summary().current_stock, Decimal('45'))
+        movement.delete()
+        self.assertEqual(self.summary().current_stock, Decimal('0'))
+        self.assert_consistent()
+
+    def test_transfer(self):
+        self.movement('M1', 'EXTRACTION', '100')
+        self.movement('T1', 'TRANSFER_OUT', '25', destination_location=self.port)
+        self.assertEqual(self.balance(self.pit), Decimal('75'))
+        self.assertEqual(self.balance(self.port), Decimal('25'))
+        self.assertEqual(self.summary().current_stock, Decimal('100'))
+        self.assert_consistent()
+
+
+class StockBulkTests(TestCase):
+    """Saisie en lot limitée aux sites de l'utilisateur"""
+
+    def setUp(self):
+        self.site = MiningSite.objects.create(name="Site A", code="BLK-A", location="A")
+        other_site = MiningSite.objects.create(name="Site B", code="BLK-B", location="B")
+        self.pit = StockLocation.objects.create(code="BLK-PIT", name="Fosse", site=self.site)
+        self.port = StockLocation.objects.create(code="BLK-PORT", name="Port", site=self.site)
+        self.foreign = StockLocation.objects.create(code="BLK-EXT", name="Autre site", site=other_site)
+        self.foreign_operation = Operation.objects.create(
+            operation_code="BLK-OP", site=other_site, date=date(2026, 1, 5),
+        )
+        self.technician = User.objects.create_user(email='bulk@example.com', password='x', role='TECHNICIEN')
+        self.technician.assigned_sites.add(self.site)
+
+    def post(self, rows):
+        client = APIClient()
+        client.force_authenticate(self.technician)
+        return client.post('/api/stock-movements/bulk/', {'movements': rows}, format='json')
+
+    def row(self, code, **extra):
+        return {
+            'movement_code': code, 'movement_type': 'TRANSFER_OUT', 'location': self.pit.pk,
+            'destination_location': self.port.pk, 'quantity': '10', 'date': '2026-01-05', **extra,
+        }
 
-# Create your tests here.
+    def test_references_outside_user_sites_are_refused(self):
+        response = self.post([
+            self.row('B1'),
+            self.row('B2', destination_location=self.foreign.pk),
+            self.row('B3', operation=self.foreign_operation.pk),
+        ])
+        self.assertEqual(response.status_code, 207)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'error', 'error'])
+        self.assertIn('destination_location', results[1]['errors'])
+        self.assertIn('operation', results[2]['errors'])
+        self.assertFalse(StockMovement.objects.filter(location=self.foreign).exists())
@@ -1,11 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum
-from decimal import Decimal
 
+from .bulk import ingest_movements
+from .checkpoints import MAX_SERIES_DAYS, balance_at, balance_series
 from .models import StockLocation, StockMovement, StockSummary
+from .ledger import (
+    fix_discrepancies, fix_location_balances, grouped_totals,
+    ledger_discrepancies, location_balance_discrepancies, location_flow_totals,
+)
 from .serializers import (
     StockLocationSerializer, StockLocationListSerializer,
     StockMovementSerializer, StockMovementListSerializer,
@@ -15,6 +26,39 @@ from accounts.permissions import CanManageStock
 from accounts.mixins import SiteScopedMixin
 
 
+MINERAL_NAMES = dict(StockMovement.MineralType.choices)
+MINERAL_ORDER = {code: index for index, code in enumerate(MINERAL_NAMES)}
+
+
+def _summary_rows(rows, with_site=False):
+    """
+    Lignes de synthèse (site, minerai) non vides, triées par site puis dans
+    l'ordre des types de minerai.
+    """
+    result = []
+    for row in rows:
+        if not (row['current_stock'] > 0 or row['total_extracted'] > 0):
+            continue
+        item = {}
+        if with_site:
+            item['site_id'] = row['location__site']
+            item['site_name'] = row['location__site__name']
+        item.update({
+            'mineral_type': row['mineral_type'],
+            'mineral_name': MINERAL_NAMES.get(row['mineral_type'], row['mineral_type']),
+            'initial_stock': float(row['initial_stock']),
+            'total_extracted': float(row['total_extracted']),
+            'total_expedited': float(row['total_expedited']),
+            'current_stock': float(row['current_stock']),
+        })
+        result.append(item)
+    result.sort(key=lambda item: (
+        item.get('site_name', ''), item.get('site_id', 0),
+        MINERAL_ORDER.get(item['mineral_type'], len(MINERAL_ORDER)),
+    ))
+    return result
+
+
 class StockLocationViewSet(SiteScopedMixin, viewsets.ModelViewSet):
     """ViewSet pour la gestion des emplacements de stockage
 
@@ -32,6 +76,71 @@ class StockLocationViewSet(SiteScopedMixin, viewsets.ModelViewSet):
         if self.action == 'list':
             return StockLocationListSerializer
         return StockLocationSerializer
+    
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related('site')
+        if self.action == 'list':
+            # Entrées/sorties annotées: une requête pour toute la page
+            # (?mineral=... pour le stock d'un seul minerai)
+            mineral_type = self.request.query_params.get('mineral')
+            return queryset.annotate(
+                **location_flow_totals(mineral_type, prefix='stock_movements__')
+            ).order_by(*StockLocation._meta.ordering)
+        # Détail: soldes tenus par les mouvements (StockLocationBalance)
+        return queryset.prefetch_related('balances')
+    
+    def _query_date(self, name, default):
+        value = self.request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({name: 'Date invalide (AAAA-MM-JJ attendu)'})
+        return day
+    
+    def _query_mineral(self):
+        mineral_type = self.request.query_params.get('mineral')
+        if mineral_type not in StockMovement.MineralType.values:
+            raise ValidationError({'mineral': 'Type de minerai requis'})
+        return mineral_type
+    
+    @action(detail=True, methods=['get'])
+    def balance_at(self, request, pk=None):
+        """Solde de fin de journée à une date (?mineral=...&date=AAAA-MM-JJ)"""
+        location = self.get_object()
+        mineral_type = self._query_mineral()
+        day = self._query_date('date', timezone.localdate())
+        balance, checkpoint_date = balance_at(location.pk, mineral_type, day)
+        return Response({
+            'location': location.pk,
+            'mineral_type': mineral_type,
+            'date': day,
+            'balance': float(balance),
+            'checkpoint_date': checkpoint_date,
+        })
+    
+    @action(detail=True, methods=['get'])
+    def balance_history(self, request, pk=None):
+        """Courbe des soldes de fin de journée (?mineral=...&start=...&end=..., un an par défaut)"""
+        location = self.get_object()
+        mineral_type = self._query_mineral()
+        end = self._query_date('end', timezone.localdate())
+        start = self._query_date('start', end - timedelta(days=365))
+        if start > end:
+            raise ValidationError({'start': 'La date de début doit précéder la date de fin'})
+        if (end - start).days >= MAX_SERIES_DAYS:
+            raise ValidationError({'start': f'Période limitée à {MAX_SERIES_DAYS} jours'})
+        series = balance_series(location.pk, mineral_type, start, end)
+        return Response({
+            'location': location.pk,
+            'mineral_type': mineral_type,
+            'start': start,
+            'end': end,
+            'points': [{'date': day, 'balance': float(balance)} for day, balance in series],
+        })
 
 
 class StockMovementViewSet(SiteScopedMixin, viewsets.ModelViewSet):
@@ -78,11 +187,53 @@ class StockMovementViewSet(SiteScopedMixin, viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
     
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Saisie en lot: liste de mouvements (ou {"movements": [...]}).
+        
+        Les lignes valides sont écrites en une transaction, transferts
+        entrants appariés compris; les lignes invalides sont rapportées.
+        201: tout est créé, 207: création partielle, 400: rien n'est créé.
+        """
+        rows = request.data.get('movements') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {"error": "Une liste non vide de mouvements est attendue"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_rows = getattr(settings, 'STOCK_BULK_MAX_ROWS', 5000)
+        if len(rows) > max_rows:
+            return Response(
+                {"error": f"{max_rows} mouvements au plus par lot"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            results = ingest_movements(rows, request.user)
+        except IntegrityError:
+            # Code mouvement inséré entre-temps par une autre requête
+            return Response(
+                {"error": "Conflit de codes mouvement, renvoyer le lot"},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        created = sum(1 for result in results if result['status'] == 'created')
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        }, status=response_status)
+    
     @action(detail=False, methods=['get'])
     def by_site(self, request):
         """Récupère les mouvements agrégés par site"""
-        from django.db.models import Q
-        
         site_id = request.query_params.get('site')
         if not site_id:
             return Response(
@@ -90,39 +241,9 @@ class StockMovementViewSet(SiteScopedMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        movements = StockMovement.objects.filter(location__site_id=site_id)
-        
-        # Agrégation par type de minerai
-        result = {}
-        for mineral in StockMovement.MineralType.choices:
-            mineral_code = mineral[0]
-            mineral_movements = movements.filter(mineral_type=mineral_code)
-            
-            initial = mineral_movements.filter(
-                movement_type='INITIAL'
-            ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
-            
-            extracted = mineral_movements.filter(
-                movement_type='EXTRACTION'
-            ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
-            
-            expedited = mineral_movements.filter(
-                movement_type='EXPEDITION'
-            ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
-            
-            current = initial + extracted - expedited
-            
-            if current > 0 or extracted > 0:
-                result[mineral_code] = {
-                    'mineral_type': mineral_code,
-                    'mineral_name': mineral[1],
-                    'initial_stock': float(initial),
-                    'total_extracted': float(extracted),
-                    'total_expedited': float(expedited),
-                    'current_stock': float(current)
-                }
-        
-        return Response(list(result.values()))
+        # Agrégation par type de minerai: une seule requête groupée
+        rows = grouped_totals(StockMovement.objects.filter(location__site_id=site_id))
+        return Response(_summary_rows(rows))
 
 
 class StockSummaryViewSet(viewsets.ReadOnlyModelViewSet):
@@ -146,38 +267,22 @@ class StockSummaryViewSet(viewsets.ReadOnlyModelViewSet):
                 {'error': 'Seul l\'administrateur peut recalculer les synthèses.'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        for summary in StockSummary.objects.all():
-            summary.recalculate()
-        return Response({"message": "Synthèses recalculées"})
+        # Une agrégation groupée, puis correction des seules lignes en écart
+        discrepancies = ledger_discrepancies()
+        balances = location_balance_discrepancies()
+        fix_discrepancies(discrepancies)
+        fix_location_balances(balances)
+        return Response({
+            "message": "Synthèses recalculées",
+            "corrected": len(discrepancies),
+            "balances_corrected": len(balances),
+        })
     
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
-        """Données pour le dashboard des stocks"""
-        from mining_sites.models import MiningSite
-        
-        result = []
-        for site in MiningSite.objects.filter(status='ACTIVE'):
-            for mineral in StockMovement.MineralType.choices:
-                summary, created = StockSummary.objects.get_or_create(
-                    site=site,
-                    mineral_type=mineral[0],
-                    defaults={
-                        'initial_stock': 0,
-                        'total_extracted': 0,
-                        'total_expedited': 0,
-                        'current_stock': 0
-                    }
-                )
-                if summary.current_stock > 0 or summary.total_extracted > 0:
-                    result.append({
-                        'site_id': site.id,
-                        'site_name': site.name,
-                        'mineral_type': mineral[0],
-                        'mineral_name': mineral[1],
-                        'initial_stock': float(summary.initial_stock),
-                        'total_extracted': float(summary.total_extracted),
-                        'total_expedited': float(summary.total_expedited),
-                        'current_stock': float(summary.current_stock)
-                    })
-        
-        return Response(result)
+        """Données pour le dashboard des stocks (lecture seule, une requête groupée)"""
+        rows = grouped_totals(
+            StockMovement.objects.filter(location__site__status='ACTIVE'),
+            'location__site__name',
+        )
+        return Response(_summary_rows(rows, with_site=True))